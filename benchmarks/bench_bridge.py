@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+#
+# Benchmark the end-of-speech latency of streamed audio against a loopback server
+#
+# Copyright (c) 2016, PullString, Inc.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+sys.path.insert(0, os.path.abspath('..'))
+sys.path.insert(0, os.path.abspath(os.path.join('..', 'tests')))
+import pullstring
+from webapi_server import WebAPIServer
+
+# 20 ms of 16-bit audio at 16000 samples per second
+FRAME = b"\0" * 640
+FRAME_SECONDS = 0.02
+
+def make_handler(latency):
+    # answer audio requests after the given processing time, e.g., for speech recognition
+    def handler(request):
+        if request.headers.get("Content-Type", "").startswith("audio/"):
+            time.sleep(latency)
+        return 200, {"conversation": "conv-1", "participant": "participant-1", "outputs": []}
+    return handler
+
+def percentile(latencies, percent):
+    latencies = sorted(latencies)
+    return latencies[min(len(latencies) - 1, int(len(latencies) * percent / 100.0))]
+
+def speak(loop, frames, on_frame):
+    # call on_frame with each frame in real time, as a microphone would, then
+    # with None; return the time at which the user stops talking
+    start = loop.time()
+    for index in range(frames):
+        loop.call_at(start + index * FRAME_SECONDS, on_frame, FRAME)
+    end = start + frames * FRAME_SECONDS
+    loop.call_at(end, on_frame, None)
+    return end
+
+def run_batch(loop, conv, frames):
+    # collect the whole utterance, then send it, as the audio example does
+    done = loop.create_future()
+    buffer = []
+    def on_frame(frame):
+        if frame is not None:
+            buffer.append(frame)
+            return
+        send = loop.run_in_executor(None, conv.send_audio, b"".join(buffer))
+        send.add_done_callback(lambda send: done.set_result(loop.time()))
+    end = speak(loop, frames, on_frame)
+    return loop.run_until_complete(done) - end
+
+def run_bridge(loop, bridge, frames):
+    # stream each frame as soon as it is captured
+    queue = asyncio.Queue()
+    end = speak(loop, frames, queue.put_nowait)
+    loop.run_until_complete(bridge.stream(queue))
+    return loop.time() - end
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark streamed audio with the asyncio bridge")
+    parser.add_argument("--utterances", type=int, default=20, help="Number of utterances for each test")
+    parser.add_argument("--seconds", type=float, default=1.0, help="Length of each utterance in seconds")
+    parser.add_argument("--latency", type=float, default=0.05, help="Server processing time in seconds")
+    parser.add_argument("--max_frames", type=int, default=50, help="Frames the bridge may queue")
+    args = parser.parse_args()
+
+    server = WebAPIServer(make_handler(args.latency)).start()
+    pullstring.VersionInfo().api_base_url = server.base_url
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    frames = int(args.seconds / FRAME_SECONDS)
+    try:
+        conv = pullstring.Conversation()
+        conv.start("project", pullstring.Request(api_key="key"))
+        tests = [("send_audio:", lambda: run_batch(loop, conv, frames))]
+        for policy in [pullstring.POLICY_BLOCK, pullstring.POLICY_DROP]:
+            bridge = pullstring.AudioBridge(conv, max_frames=args.max_frames, policy=policy)
+            tests.append(("bridge %s:" % policy, lambda bridge=bridge: run_bridge(loop, bridge, frames)))
+
+        for name, test in tests:
+            latencies = [test() for x in range(args.utterances)]
+            print("%-14s p50 %7.2f ms  p95 %7.2f ms  max %7.2f ms after the end of speech" %
+                  (name, percentile(latencies, 50) * 1000, percentile(latencies, 95) * 1000,
+                   max(latencies) * 1000))
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+        server.stop()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+#
+# Benchmark bytes on the wire and client CPU time with and without compression
+#
+# Copyright (c) 2016, PullString, Inc.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+import os
+import sys
+import time
+import argparse
+sys.path.insert(0, os.path.abspath('..'))
+sys.path.insert(0, os.path.abspath(os.path.join('..', 'tests')))
+import pullstring
+from pullstring.transport import HttpTransport
+from webapi_server import WebAPIServer
+
+# measure the CPU time of the client thread only, not the in-process server
+cpu_time = getattr(time, "thread_time", time.process_time)
+
+def make_handler(outputs, phonemes):
+    # answer every request with dialog lines that carry lip sync data
+    body = {"conversation": "conv-1", "participant": "participant-1", "outputs": []}
+    for x in range(outputs):
+        body["outputs"].append({"type": "dialog", "id": "line-%d" % x, "text": "Line %d" % x, "duration": 2.0,
+                                "uri": "https://example.com/%d.wav" % x,
+                                "phonemes": [{"name": "aa", "seconds_since_start": p * 0.05}
+                                             for p in range(phonemes)]})
+    return lambda request: (200, body)
+
+def run(server, transport, turns, text):
+    # return the response bytes, request bytes, wall time, and client CPU time per turn
+    conv = pullstring.Conversation()
+    conv.transport = transport
+    conv.start("project", pullstring.Request(api_key="key"))
+    del server.requests[:]
+    sent = server.bytes_sent
+    start_time = time.time()
+    start_cpu = cpu_time()
+    for x in range(turns):
+        conv.send_text(text)
+    wall = (time.time() - start_time) / turns
+    cpu = (cpu_time() - start_cpu) / turns
+    request_bytes = sum(len(r.body) if "Content-Encoding" not in r.headers else int(r.headers["Content-Length"])
+                        for r in server.requests) // turns
+    return (server.bytes_sent - sent) // turns, request_bytes, wall, cpu
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark gzip compression of requests and responses")
+    parser.add_argument("--turns", type=int, default=200, help="Number of turns for each test")
+    parser.add_argument("--outputs", type=int, default=3, help="Number of dialog lines per response")
+    parser.add_argument("--phonemes", type=int, default=40, help="Number of phonemes per dialog line")
+    parser.add_argument("--text_size", type=int, default=4000, help="Number of characters in each request")
+    args = parser.parse_args()
+
+    server = WebAPIServer(make_handler(args.outputs, args.phonemes)).start()
+    server.compress = True
+    pullstring.VersionInfo().api_base_url = server.base_url
+    text = ("lorem ipsum " * args.text_size)[:args.text_size]
+    try:
+        tests = [
+            ("uncompressed:", HttpTransport(accept_compression=False)),
+            ("gzip responses:", HttpTransport()),
+            ("gzip both ways:", HttpTransport(gzip_min_size=1024)),
+        ]
+        for name, transport in tests:
+            received, sent, wall, cpu = run(server, transport, args.turns, text)
+            print("%-17s %7d bytes received %7d bytes sent %7.3f ms/turn %7.3f ms CPU/turn" %
+                  (name, received, sent, wall * 1000, cpu * 1000))
+    finally:
+        server.stop()
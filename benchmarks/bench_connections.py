@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+#
+# Benchmark the connection setup cost of Web API requests against a local TLS server
+#
+# Copyright (c) 2016, PullString, Inc.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+import os
+import sys
+import time
+import argparse
+sys.path.insert(0, os.path.abspath('..'))
+sys.path.insert(0, os.path.abspath(os.path.join('..', 'tests')))
+import pullstring
+from pullstring.transport import ConnectionPool, HttpTransport
+from webapi_server import WebAPIServer
+
+def send_requests(pool_factory, count):
+    # return the average time of a request, using a pool from pool_factory for each one
+    total = 0.0
+    for x in range(count):
+        conv = pullstring.Conversation()
+        conv.transport = HttpTransport(pool_factory())
+        start = time.time()
+        conv.start("project", pullstring.Request(api_key="key"))
+        total += time.time() - start
+    return total / count
+
+def warm_pool(base_url):
+    pool = ConnectionPool()
+    pool.warm_up(base_url)
+    return pool
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark TLS handshakes, session resumption, and keep-alive")
+    parser.add_argument("--requests", type=int, default=200, help="Number of requests for each test")
+    args = parser.parse_args()
+
+    server = WebAPIServer().start()
+    pullstring.VersionInfo().api_base_url = server.base_url
+    try:
+        # a new pool for every request: full TCP and TLS handshake each time
+        full = send_requests(lambda: ConnectionPool(max_idle=0), args.requests)
+
+        # no keep-alive, but the TLS session is resumed for an abbreviated handshake
+        resumed_pool = ConnectionPool(max_idle=0)
+        resumed = send_requests(lambda: resumed_pool, args.requests)
+
+        # keep-alive connections from a shared pool
+        shared_pool = ConnectionPool()
+        keep_alive = send_requests(lambda: shared_pool, args.requests)
+
+        # the first request of a new worker, with and without warming up the pool
+        warm_pools = [warm_pool(server.base_url) for x in range(args.requests)]
+        warm = send_requests(lambda: warm_pools.pop(), args.requests)
+
+        print("full handshake per request:    %7.3f ms" % (full * 1000))
+        print("TLS session resumption:        %7.3f ms (%.3f ms saved)" % (resumed * 1000, (full - resumed) * 1000))
+        print("keep-alive connection:         %7.3f ms (%.3f ms saved)" % (keep_alive * 1000, (full - keep_alive) * 1000))
+        print("first request on warmed pool:  %7.3f ms (%.3f ms saved)" % (warm * 1000, (full - warm) * 1000))
+    finally:
+        server.stop()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+#
+# Benchmark the tail latency of get_entities() with and without request hedging
+#
+# Copyright (c) 2016, PullString, Inc.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+import os
+import sys
+import time
+import random
+import argparse
+sys.path.insert(0, os.path.abspath('..'))
+sys.path.insert(0, os.path.abspath(os.path.join('..', 'tests')))
+import pullstring
+from webapi_server import WebAPIServer
+
+def make_handler(latency, slow_latency, slow_fraction, seed):
+    # answer after a short delay, or a long one for a fraction of the requests
+    rand = random.Random(seed)
+    def handler(request):
+        slow = rand.random() < slow_fraction
+        time.sleep(slow_latency if slow else latency * (0.5 + rand.random()))
+        return 200, {"conversation": "conv-1", "participant": "participant-1", "outputs": [],
+                     "entities": {"NAME": "Jill"}}
+    return handler
+
+def percentile(latencies, percent):
+    latencies = sorted(latencies)
+    return latencies[min(len(latencies) - 1, int(len(latencies) * percent / 100.0))]
+
+def run(server, requests, hedger):
+    # return the latency of each get_entities() call, and the number of requests sent
+    conv = pullstring.Conversation()
+    conv.start("project", pullstring.Request(api_key="key"))
+    conv.hedger = hedger
+    del server.requests[:]
+    latencies = []
+    for x in range(requests):
+        start = time.time()
+        conv.get_entities([pullstring.Label("NAME")])
+        latencies.append(time.time() - start)
+    return latencies, len(server.requests)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark hedged get_entities() requests")
+    parser.add_argument("--requests", type=int, default=500, help="Number of requests for each test")
+    parser.add_argument("--latency", type=float, default=0.005, help="Typical server latency in seconds")
+    parser.add_argument("--slow_latency", type=float, default=0.2, help="Latency of a slow server in seconds")
+    parser.add_argument("--slow_fraction", type=float, default=0.02, help="Fraction of slow responses")
+    parser.add_argument("--budget", type=float, default=0.05, help="Hedges allowed per request")
+    args = parser.parse_args()
+
+    server = WebAPIServer().start()
+    pullstring.VersionInfo().api_base_url = server.base_url
+    try:
+        for name, hedger in [("no hedging:", None), ("hedging:", pullstring.RequestHedger(budget=args.budget))]:
+            server.handler = make_handler(args.latency, args.slow_latency, args.slow_fraction, seed=1)
+            latencies, sent = run(server, args.requests, hedger)
+            print("%-12s p50 %7.2f ms  p99 %7.2f ms  max %7.2f ms  %5.1f%% extra requests" %
+                  (name, percentile(latencies, 50) * 1000, percentile(latencies, 99) * 1000,
+                   max(latencies) * 1000, (sent - args.requests) * 100.0 / args.requests))
+    finally:
+        server.stop()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+#
+# Benchmark lip sync lookups for many characters at 60 and 120 fps
+#
+# Copyright (c) 2016, PullString, Inc.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+import os
+import sys
+import time
+import bisect
+import random
+import argparse
+sys.path.insert(0, os.path.abspath('..'))
+import pullstring
+
+PHONEMES = ["aa", "ae", "b", "d", "eh", "f", "iy", "k", "l", "m", "ow", "p", "s", "t", "uw", "v"]
+
+def make_output(duration, rate):
+    # create a dialog output with a random phoneme every 1/rate seconds
+    output = pullstring.DialogOutput()
+    output.duration = duration
+    seconds = 0.0
+    while seconds < duration:
+        output.phonemes.append(pullstring.Phoneme(random.choice(PHONEMES), seconds))
+        seconds += random.uniform(0.5, 1.5) / rate
+    return output
+
+def run_bisect(outputs, fps):
+    # the previous approach: binary search the phoneme list every frame
+    for output in outputs:
+        times = [p.seconds_since_start for p in output.phonemes]
+        for frame in range(int(output.duration * fps) + 1):
+            index = bisect.bisect_right(times, float(frame) / fps) - 1
+            if index >= 0:
+                output.phonemes[index].name
+
+def run_cursor(outputs, fps):
+    # advance a cursor for each character with the playback clock
+    cursors = [output.timeline.cursor() for output in outputs]
+    duration = max(output.duration for output in outputs)
+    for frame in range(int(duration * fps) + 1):
+        seconds = float(frame) / fps
+        for cursor in cursors:
+            cursor.seek(seconds)
+
+def run_sample(outputs, fps):
+    # precompute all frames for each character in one pass
+    for output in outputs:
+        output.timeline.sample(fps)
+
+def benchmark(name, func, outputs, fps):
+    for output in outputs:
+        output.timeline  # build the timelines outside of the timed section
+    start = time.time()
+    func(outputs, fps)
+    elapsed = time.time() - start
+    frames = sum(int(output.duration * fps) + 1 for output in outputs)
+    print("%-8s %4d fps %6d characters: %8.2f ms total, %6.3f us/frame" %
+          (name, fps, len(outputs), elapsed * 1000, elapsed * 1e6 / frames))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark phoneme lookups for lip sync")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of dialog per character")
+    parser.add_argument("--rate", type=float, default=12.0, help="Phonemes per second")
+    parser.add_argument("--characters", type=int, nargs="+", default=[1, 16, 256])
+    args = parser.parse_args()
+
+    random.seed(0)
+    for count in args.characters:
+        outputs = [make_output(args.duration, args.rate) for x in range(count)]
+        for fps in [60, 120]:
+            benchmark("bisect", run_bisect, outputs, fps)
+            benchmark("cursor", run_cursor, outputs, fps)
+            benchmark("sample", run_sample, outputs, fps)
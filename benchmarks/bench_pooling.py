@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+#
+# Benchmark building responses with and without a ResponsePool
+#
+# Copyright (c) 2016, PullString, Inc.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+import gc
+import os
+import sys
+import time
+import argparse
+import collections
+sys.path.insert(0, os.path.abspath('..'))
+import pullstring
+from pullstring import codec
+
+def make_body(outputs, phonemes, entities):
+    # a decoded response body with dialog lines, lip sync data, and entities
+    body = {"conversation": "conv-1", "participant": "participant-1", "outputs": [], "entities": {}}
+    for x in range(outputs):
+        body["outputs"].append({"type": "dialog", "id": "line-%d" % x, "text": "Line %d" % x, "duration": 2.0,
+                                "uri": "https://example.com/%d.wav" % x,
+                                "phonemes": [{"name": "aa", "seconds_since_start": p * 0.05}
+                                             for p in range(phonemes)]})
+    body["outputs"].append({"type": "behavior", "behavior": "wave", "parameters": {"hand": "left"}})
+    for x in range(entities):
+        body["entities"]["Counter %d" % x] = x
+    return body
+
+def count_objects(response):
+    # the number of model objects in a response
+    return 1 + 1 + len(response.outputs) + len(response.entities) + \
+        sum(len(getattr(output, "phonemes", [])) for output in response.outputs)
+
+def run(body, turns, keep, pool):
+    # build responses, keeping the last few alive as an application would,
+    # and return the time per turn, objects allocated per turn, and gc collections
+    collections_by_gen = [0, 0, 0]
+
+    def on_gc(phase, info):
+        if phase == "start":
+            collections_by_gen[info["generation"]] += 1
+
+    live = collections.deque()
+    allocated = 0
+    gc.collect()
+    gc.callbacks.append(on_gc)
+    start = time.time()
+    try:
+        for x in range(turns):
+            created = pool.created if pool else 0
+            response = codec.json_to_response(body, pool=pool)
+            allocated += pool.created - created if pool else count_objects(response)
+            live.append(response)
+            if len(live) > keep:
+                old = live.popleft()
+                if pool:
+                    pool.release(old)
+        elapsed = time.time() - start
+    finally:
+        gc.callbacks.remove(on_gc)
+    return elapsed / turns, float(allocated) / turns, collections_by_gen
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark response allocation with and without pooling")
+    parser.add_argument("--turns", type=int, default=20000, help="Number of responses to build")
+    parser.add_argument("--keep", type=int, default=50, help="Number of recent responses kept alive")
+    parser.add_argument("--outputs", type=int, default=3, help="Dialog outputs per response")
+    parser.add_argument("--phonemes", type=int, default=30, help="Phonemes per dialog output")
+    parser.add_argument("--entities", type=int, default=20, help="Entities per response")
+    args = parser.parse_args()
+
+    body = make_body(args.outputs, args.phonemes, args.entities)
+    pool = pullstring.ResponsePool(max_size=args.keep * count_objects(codec.json_to_response(body)))
+
+    print("%-10s %12s %18s %22s" % ("path", "us/turn", "objects/turn", "gc collections 0/1/2"))
+    for name, turn_pool in [("plain", None), ("pooled", pool)]:
+        seconds, allocated, counts = run(body, args.turns, args.keep, turn_pool)
+        print("%-10s %12.1f %18.1f %22s" % (name, seconds * 1e6, allocated, "%d/%d/%d" % tuple(counts)))
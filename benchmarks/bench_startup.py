@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+#
+# Benchmark the cold start cost of the SDK: import time and first request latency
+#
+# Copyright (c) 2016, PullString, Inc.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+import os
+import sys
+import argparse
+import subprocess
+sys.path.insert(0, os.path.abspath(os.path.join('..', 'tests')))
+from webapi_server import WebAPIServer
+
+ROOT = os.path.abspath('..')
+
+# each snippet runs in a fresh interpreter and prints the elapsed seconds
+IMPORT = """
+import time
+start = time.time()
+import pullstring
+print(time.time() - start)
+"""
+
+CONVERSATION = """
+import time
+start = time.time()
+import pullstring
+pullstring.Conversation()
+print(time.time() - start)
+"""
+
+FIRST_REQUEST = """
+import time
+start = time.time()
+import pullstring
+pullstring.VersionInfo().api_base_url = "%s"
+pullstring.Conversation().start("project", pullstring.Request(api_key="key"))
+print(time.time() - start)
+"""
+
+def run(snippet, runs):
+    # return the fastest time for the snippet over a number of fresh processes
+    times = []
+    for x in range(runs):
+        output = subprocess.check_output([sys.executable, "-c", snippet], cwd=ROOT)
+        times.append(float(output.decode("utf-8").strip().splitlines()[-1]))
+    return min(times)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the SDK import time and first request latency")
+    parser.add_argument("--runs", type=int, default=10, help="Number of processes to start for each test")
+    args = parser.parse_args()
+
+    server = WebAPIServer().start()
+    try:
+        print("import pullstring:         %7.2f ms" % (run(IMPORT, args.runs) * 1000))
+        print("create Conversation:       %7.2f ms" % (run(CONVERSATION, args.runs) * 1000))
+        print("import + first request:    %7.2f ms" % (run(FIRST_REQUEST % server.base_url, args.runs) * 1000))
+    finally:
+        server.stop()
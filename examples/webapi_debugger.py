@@ -13,9 +13,159 @@ import os
 import sys
 import time
 import argparse
+import collections
 sys.path.insert(0, os.path.abspath('..'))
 import pullstring
 
+# the CPU time used by this process, i.e., the SDK's own share of a call
+_cpu_clock = getattr(time, "process_time", getattr(time, "clock", time.time))
+
+# the phases of a Web API call, as reported by /stats and /bench
+PHASES = ["connect", "upload", "wait", "download", "sdk", "total", "cpu"]
+
+def parse_event_params(event_args):
+    # parse the "<param-name>=<value> ..." arguments of an /event command
+    params = {}
+
+    # support space or semicolon separating of event params
+    if len(event_args) == 1 and ";" in event_args[0]:
+        event_args = event_args[0].split(";")
+
+    for arg in event_args:
+        key, value = arg.split("=")
+        key = key.strip()
+        value = value.strip()
+
+        # set the type of the variable implicitly
+        if value in ["true", "false"]:
+            params[key] = (value == "true")
+        elif any(c.isdigit() for c in value):
+            params[key] = int(value)
+        elif any(c.isdigit() or c == "." for c in value):
+            params[key] = float(value)
+        else:
+            params[key] = value
+
+    return params
+
+def make_entity(entity_type, name, values):
+    # create an entity for the "/set <type> <name> <value>" command
+    entity_type = entity_type.lower()
+    if entity_type == "label":
+        return pullstring.Label(name, values[0])
+    elif entity_type == "counter":
+        return pullstring.Counter(name, float(values[0]))
+    elif entity_type == "flag":
+        return pullstring.Flag(name, values[0].lower() in ["true", "yes", "1"])
+    elif entity_type == "list":
+        return pullstring.ListEntity(name, values)
+    return None
+
+def percentile(values, pct):
+    # return the nearest-rank percentile of a sorted list
+    if not values:
+        return 0.0
+    index = int(round(pct / 100.0 * len(values) + 0.5)) - 1
+    return values[max(0, min(index, len(values) - 1))]
+
+class LatencyStats(object):
+    """
+    The time spent in each phase of the most recent Web API calls:
+    opening a connection, uploading a streamed body, waiting for the
+    first byte of the response (which includes sending a body that is
+    not streamed), downloading the rest, and the time left over in the
+    SDK, e.g., to build the request and parse the JSON. The CPU time is
+    that of the whole process, which is mostly the SDK.
+    """
+    def __init__(self, window=1000):
+        self.calls = 0
+        self.samples = dict((phase, collections.deque(maxlen=window)) for phase in PHASES)
+
+    def add(self, timings):
+        self.calls += 1
+        for phase in timings:
+            self.samples[phase].append(timings[phase])
+
+    def report(self):
+        print("%-10s %7s %9s %9s %9s %9s %9s" % ("phase", "count", "mean ms", "p50 ms", "p95 ms", "p99 ms", "max ms"))
+        for phase in PHASES:
+            times = sorted(seconds * 1000 for seconds in self.samples[phase])
+            if times:
+                print("%-10s %7d %9.1f %9.1f %9.1f %9.1f %9.1f" %
+                      (phase, len(times), sum(times) / len(times), percentile(times, 50),
+                       percentile(times, 95), percentile(times, 99), times[-1]))
+
+class TimedExchange(object):
+    """
+    Pass one Web API exchange through, timing each of its phases.
+    """
+    def __init__(self, exchange, connect):
+        self.url = exchange.url
+        self.chunked = exchange.chunked
+        self.exchange = exchange
+        self.timings = {"connect": connect, "upload": 0.0, "wait": 0.0, "download": 0.0}
+
+    def send(self, data):
+        start = time.time()
+        self.exchange.send(data)
+        self.timings["upload"] += time.time() - start
+
+    def finish(self, on_data=None):
+        start = time.time()
+        first = []
+        def on_block(data):
+            if not first:
+                first.append(time.time())
+            if on_data is not None:
+                on_data(data)
+        try:
+            return self.exchange.finish(on_block)
+        finally:
+            end = time.time()
+            first = first[0] if first else end
+            self.timings["wait"] = first - start
+            self.timings["download"] = end - first
+
+    def cancel(self):
+        cancel = getattr(self.exchange, "cancel", None)
+        if cancel is not None:
+            cancel()
+
+class TimingTransport(object):
+    """
+    Wrap the transport of a conversation to time the phases of its calls.
+    The last exchange that was opened is kept in last.
+    """
+    def __init__(self, transport):
+        self.transport = transport
+        self.last = None
+
+    def open(self, url, query_params, headers, deadline=None):
+        start = time.time()
+        if deadline is None:
+            exchange = self.transport.open(url, query_params, headers)
+        else:
+            exchange = self.transport.open(url, query_params, headers, deadline=deadline)
+        self.last = TimedExchange(exchange, time.time() - start)
+        return self.last
+
+def timed_call(conv, stats, func, *args):
+    # make a Web API call with a conversation that has a TimingTransport,
+    # and add the time spent in each phase to stats
+    conv.transport.last = None
+    start = time.time()
+    cpu = _cpu_clock()
+    response = func(*args)
+    timings = {"total": time.time() - start, "cpu": _cpu_clock() - cpu}
+
+    # calls answered from a cache do not open an exchange
+    exchange = conv.transport.last
+    if exchange is not None:
+        timings.update(exchange.timings)
+        timings["sdk"] = max(0.0, timings["total"] - sum(exchange.timings.values()))
+    stats.add(timings)
+    return response
+
 class Debugger(object):
     """
     A text chat client that provides in-depth debugging information
@@ -26,6 +176,8 @@ class Debugger(object):
     def __init__(self, api_key, project_id, build_type, base_url):
         self.ps = pullstring.Conversation()
         self.ps.debug_mode = True
+        self.ps.transport = TimingTransport(self.ps.transport)
+        self.stats = LatencyStats()
         self.build_type = build_type
         self.api_key = api_key
         self.project_id = project_id
@@ -64,6 +216,58 @@ class Debugger(object):
         # reset the timestamp of the last output
         self.last_response_time = self.get_current_time()
 
+    def new_request(self):
+        request = pullstring.Request(api_key=self.api_key)
+        request.build_type = self.build_type
+        return request
+
+    def call(self, func, *args):
+        # make a Web API call with the debugged conversation, timing it for /stats
+        return timed_call(self.ps, self.stats, func, *args)
+
+    def bench(self, count, text):
+        # send a burst of turns in a new conversation, which shares the pool of
+        # connections of the debugged one, without any debugging output
+        conv = pullstring.Conversation()
+        conv.transport = TimingTransport(conv.transport)
+        conv.profiler = self.ps.profiler
+        response = conv.start(self.project_id, self.new_request())
+        if not response.status.success:
+            print("ERROR: %s" % response.status.error_message)
+            return
+
+        stats = LatencyStats(window=count)
+        errors = 0
+        start = time.time()
+        cpu = _cpu_clock()
+        for x in range(count):
+            response = timed_call(conv, stats, conv.send_text, text)
+            if not response.status.success:
+                errors += 1
+        elapsed = time.time() - start
+        cpu = _cpu_clock() - cpu
+
+        stats.report()
+        print("")
+        print("%d turns in %.2f seconds (%.1f turns/sec), %d errors, %.2f ms CPU per turn" %
+              (count, elapsed, count / elapsed if elapsed else 0.0, errors, cpu * 1000 / count))
+
+    def profile(self, args):
+        # turn the profiling of each call on or off, or print the stats so far
+        action = args[0].lower() if args else "dump"
+        if action == "on":
+            if self.ps.profiler is None:
+                self.ps.profiler = pullstring.TurnProfiler(output=sys.stdout)
+            print("Profiling every Web API call, use /profile to see the results")
+        elif action == "off":
+            self.ps.profiler = None
+        elif action == "reset" and self.ps.profiler is not None:
+            self.ps.profiler.reset()
+        elif self.ps.profiler is not None and self.ps.profiler.profiled:
+            self.ps.profiler.dump()
+        else:
+            print("No calls have been profiled, use /profile on to start")
+
     def debugger_command(self, user_input):
         if not user_input.startswith("/"):
             return False
@@ -75,68 +279,62 @@ class Debugger(object):
         if name == "event" and args:
             # send an event to the Web API, plus optional parameters
             event_name = args[0]
-            params = {}
-
-            # support space or semicolon separating of event params
-            event_args = args[1:]
-            if len(event_args) == 1 and ";" in event_args[0]:
-                event_args = event_args[0].split(";")
-            
-            for arg in event_args:
-                try:
-                    key, value = arg.split("=")
-                except Exception as e:
-                    print("ERROR: cannot parse /event command line: %s" % e)
-                    return True
-                
-                key = key.strip()
-                value = value.strip()
-
-                # set the type of the variable implicitly
-                if value in ["true", "false"]:
-                    params[key] = (value == "true")
-                elif any(c.isdigit() for c in value):
-                    params[key] = int(value)
-                elif any(c.isdigit() or c == "." for c in value):
-                    params[key] = float(value)
-                else:
-                    params[key] = value
-                    
-            self.ps.send_event(event_name, params)
+            try:
+                params = parse_event_params(args[1:])
+            except Exception as e:
+                print("ERROR: cannot parse /event command line: %s" % e)
+                return True
+
+            self.call(self.ps.send_event, event_name, params)
 
         elif name == "intent" and args:
             # send a named intent to the Web API
-            self.ps.send_intent(" ".join(args))
+            self.call(self.ps.send_intent, " ".join(args))
 
         elif name == "activity" and args:
             # send a named acitivity to the Web API
-            self.ps.send_activity(" ".join(args))
+            self.call(self.ps.send_activity, " ".join(args))
 
         elif name == "goto" and args:
             # jump to the line with the given GUID
-            self.ps.goto(args[0])
+            self.call(self.ps.goto, args[0])
 
         elif name == "get" and args:
             # return the value of the specified entities
             entities = [pullstring.Entity(x, "") for x in args]
-            self.ps.get_entities(entities)
+            self.call(self.ps.get_entities, entities)
 
         elif name == "set" and len(args) > 2:
             # set the value of a single entity
-            entity_type = args[0].lower()
-            entity = None
-            if entity_type == "label":
-                entity = pullstring.Label(args[1], args[2])
-            elif entity_type == "counter":
-                entity = pullstring.Counter(args[1], float(args[2]))
-            elif entity_type == "flag":
-                entity = pullstring.Flag(args[1], args[2].lower() in ["true", "yes", "1"])
-            elif entity_type == "list":
-                entity = pullstring.List(args[1], args[2:])
+            entity = make_entity(args[0], args[1], args[2:])
+            if entity is None:
+                print("Unknown entity type: %s" % args[0])
             else:
-                print("Unknown entity type: %s" % entity_type)
-            if entity:
-                self.ps.set_entities([entity])
+                self.call(self.ps.set_entities, [entity])
+
+        elif name == "stats":
+            # display the latency of the recent calls, by phase
+            if args and args[0].lower() == "reset":
+                self.stats = LatencyStats()
+            elif not self.stats.calls:
+                print("No Web API calls yet")
+            else:
+                print("Last %d of %d calls (with debug output):" %
+                      (len(self.stats.samples["total"]), self.stats.calls))
+                self.stats.report()
+
+        elif name == "bench" and len(args) > 1:
+            # measure the latency and throughput of a burst of turns
+            try:
+                count = int(args[0])
+            except ValueError:
+                print("ERROR: the number of turns must be an integer: %s" % args[0])
+                return True
+            if count > 0:
+                self.bench(count, " ".join(args[1:]))
+
+        elif name == "profile":
+            self.profile(args)
 
         elif name == "help":
             # display the script's usage information
@@ -147,6 +345,9 @@ class Debugger(object):
             print("  /get <entity-name1> [<entity-name2> ...]")
             print("  /set [label|counter|flag|list] <entity-name> <entity-value>")
             print("  /goto <response-id>")
+            print("  /stats [reset]")
+            print("  /bench <turns> <text>")
+            print("  /profile [on|off|reset]")
             print("  /help")
 
         else:
@@ -158,9 +359,7 @@ class Debugger(object):
         print("Starting conversation... (%s). Type '/help' for options." % self.build_type)
 
         # start a new conversation
-        request = pullstring.Request(api_key=self.api_key)
-        request.build_type = self.build_type
-        response = self.ps.start(self.project_id, request)
+        response = self.call(self.ps.start, self.project_id, self.new_request())
 
         while True:
             # display any outputs from the last API request
@@ -172,12 +371,12 @@ class Debugger(object):
                 # handle debugger commands
                 if not self.debugger_command(user_input):
                     # other send the user input to the conversation
-                    response = self.ps.send_text(user_input)
+                    response = self.call(self.ps.send_text, user_input)
                 else:
                     response = None
             else:
                 # if no input text, then check for a timed response
-                response = self.ps.check_for_timed_responses()
+                response = self.call(self.ps.check_for_timed_responses)
 
 if __name__ == "__main__":
     # parse the command line arguments
@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+#
+# Replay recorded session scripts against the PullString Web API in parallel
+#
+# Copyright (c) 2016, PullString, Inc.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import multiprocessing
+sys.path.insert(0, os.path.abspath('..'))
+import pullstring
+from webapi_debugger import parse_event_params, make_entity, percentile
+
+def read_script(filename):
+    # return the commands in a session script, skipping blank lines and comments
+    with open(filename) as f:
+        lines = [line.strip() for line in f]
+    return [line for line in lines if line and not line.startswith("#")]
+
+def command_name(line):
+    # return the name of the command on a script line, or "text" for user input
+    if not line.startswith("/"):
+        return "text"
+    return line.lstrip("/").split(" ")[0].lower()
+
+def run_command(conv, line, last_response):
+    # run one script line using the same syntax as webapi_debugger.py
+    # and return the Web API response, if any
+    name = command_name(line)
+    args = line.split(" ")[1:]
+
+    if name == "text":
+        return conv.send_text(line)
+    elif name == "event" and args:
+        return conv.send_event(args[0], parse_event_params(args[1:]))
+    elif name == "intent" and args:
+        return conv.send_intent(" ".join(args))
+    elif name == "activity" and args:
+        return conv.send_activity(" ".join(args))
+    elif name == "goto" and args:
+        return conv.goto(args[0])
+    elif name == "get" and args:
+        return conv.get_entities([pullstring.Entity(x, "") for x in args])
+    elif name == "set" and len(args) > 2:
+        entity = make_entity(args[0], args[1], args[2:])
+        if entity is None:
+            raise ValueError("Unknown entity type: %s" % args[0])
+        return conv.set_entities([entity])
+    elif name == "timed":
+        return conv.check_for_timed_responses()
+    elif name == "expect" and args:
+        # replay only: check the dialog text of the previous response
+        text = " ".join(args)
+        if last_response is None or text.lower() not in last_response.dialog_text.lower():
+            raise ValueError("Expected \"%s\" in response" % text)
+        return last_response
+
+    raise ValueError("Unhandled command: %s" % line)
+
+# the transport used by all conversations of a worker process
+TRANSPORT = None
+
+def init_worker(base_url, record, replay, latency_scale):
+    # each worker process has its own copy of the global Web API settings
+    global TRANSPORT
+    if base_url:
+        pullstring.VersionInfo().api_base_url = base_url
+    if replay:
+        TRANSPORT = pullstring.ReplayTransport(replay, latency_scale=latency_scale, loop=True)
+    elif record:
+        # each worker appends to a file of its own, which are merged at the end
+        TRANSPORT = pullstring.RecordingTransport("%s.%d" % (record, os.getpid()), audio_dir=record + ".audio")
+
+def merge_recordings(record):
+    # append the recordings of all worker processes to the record file
+    directory, prefix = os.path.split(os.path.abspath(record))
+    prefix += "."
+    names = [name for name in os.listdir(directory)
+             if name.startswith(prefix) and name[len(prefix):].isdigit()]
+    with open(record, "a") as out:
+        for name in sorted(names):
+            path = os.path.join(directory, name)
+            with open(path) as f:
+                shutil.copyfileobj(f, out)
+            os.remove(path)
+
+def run_session(job):
+    # play through one script in a new conversation, timing every command
+    api_key, project_id, build_type, script_name, lines = job
+    results = []
+
+    conv = pullstring.Conversation()
+    if TRANSPORT is not None:
+        conv.transport = TRANSPORT
+    request = pullstring.Request(api_key=api_key)
+    request.build_type = build_type
+
+    # the first command of every session is to start the conversation
+    response = None
+    for line in [None] + lines:
+        name = "start" if line is None else command_name(line)
+        start = time.time()
+        error = None
+        try:
+            if line is None:
+                response = conv.start(project_id, request)
+            else:
+                response = run_command(conv, line, response)
+            if response is not None and not response.status.success:
+                error = "%s: %s" % (response.status.status_code, response.status.error_message)
+        except Exception as e:
+            error = str(e)
+        results.append((script_name, name, time.time() - start, error, line))
+
+        # give up on the session if the conversation could not be started
+        if error and line is None:
+            break
+
+    return results
+
+# commands that are checked locally rather than sent to the Web API,
+# which are left out of the latency statistics
+LOCAL_COMMANDS = ["expect"]
+
+def report(results, elapsed):
+    # print aggregate latency and error statistics per command type
+    requests = [r for r in results if r[1] not in LOCAL_COMMANDS]
+    by_command = {}
+    for script_name, name, seconds, error, line in requests:
+        by_command.setdefault(name, []).append((seconds, error))
+
+    print("%-10s %7s %7s %9s %9s %9s %9s" % ("command", "count", "errors", "p50 ms", "p95 ms", "p99 ms", "max ms"))
+    for name in sorted(by_command.keys()):
+        entries = by_command[name]
+        times = sorted(seconds * 1000 for seconds, error in entries)
+        errors = len([error for seconds, error in entries if error])
+        print("%-10s %7d %7d %9.1f %9.1f %9.1f %9.1f" %
+              (name, len(entries), errors, percentile(times, 50), percentile(times, 95),
+               percentile(times, 99), times[-1]))
+
+    errors = [r for r in results if r[3]]
+    print("")
+    print("%d requests in %.2f seconds (%.1f requests/sec), %d errors" %
+          (len(requests), elapsed, len(requests) / elapsed if elapsed else 0.0, len(errors)))
+    for script_name, name, seconds, error, line in errors[:20]:
+        print("ERROR: %s: %s: %s" % (script_name, line or "start", error))
+
+if __name__ == "__main__":
+    # parse the command line arguments
+    parser = argparse.ArgumentParser(description="Replay PullString Web API session scripts in parallel")
+    parser.add_argument("api_key", help="The API key for the PullString Account")
+    parser.add_argument("project_id", help="The Project ID for the content to access")
+    parser.add_argument("scripts", nargs="+", help="Session scripts, one debugger command or text input per line")
+    parser.add_argument("--build_type", help="Use staging, sandbox, or production content",
+                        dest="build_type", default="production")
+    parser.add_argument("--base_url", help="Change the base URL for the PullString Web API",
+                        dest="base_url", default="")
+    parser.add_argument("--processes", help="Number of worker processes",
+                        dest="processes", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--sessions", help="Number of conversations to run for each script",
+                        dest="sessions", type=int, default=1)
+    parser.add_argument("--record", help="Record all Web API exchanges to a JSON lines file",
+                        dest="record", default="")
+    parser.add_argument("--replay", help="Answer requests from a recording instead of the Web API",
+                        dest="replay", default="")
+    parser.add_argument("--latency_scale", help="Multiply the recorded latencies when replaying",
+                        dest="latency_scale", type=float, default=1.0)
+
+    args = parser.parse_args()
+    if len(args.api_key) != 36 or len(args.project_id) != 36:
+        sys.exit("ERROR: keys are 36-character long GUIDs")
+
+    if args.build_type not in [pullstring.BUILD_PRODUCTION,
+                               pullstring.BUILD_STAGING,
+                               pullstring.BUILD_SANDBOX]:
+        sys.exit("ERROR: unsupported build type: %s" % args.build_type)
+
+    jobs = []
+    for filename in args.scripts:
+        lines = read_script(filename)
+        for session in range(args.sessions):
+            jobs.append((args.api_key, args.project_id, args.build_type, filename, lines))
+
+    # run all of the conversations across the process pool
+    print("Replaying %d sessions over %d processes (%s)..." % (len(jobs), args.processes, args.build_type))
+    pool = multiprocessing.Pool(args.processes, init_worker,
+                                (args.base_url, args.record, args.replay, args.latency_scale))
+    try:
+        start = time.time()
+        results = []
+        for session_results in pool.imap_unordered(run_session, jobs):
+            results.extend(session_results)
+        elapsed = time.time() - start
+    except KeyboardInterrupt:
+        pool.terminate()
+        sys.exit("Aborting...")
+    pool.close()
+    pool.join()
+    if args.record and not args.replay:
+        merge_recordings(args.record)
+
+    report(results, elapsed)
+    if any(r[3] for r in results):
+        sys.exit(1)
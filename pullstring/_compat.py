@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+#
+# Helpers shared by the modules of the PullString SDK.
+#
+# Copyright (c) 2016 PullString, Inc.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+"""
+Python 2 and 3 compatibility helpers, kept free of heavy imports.
+"""
+
+import time
+
+# use a clock that does not jump with the time of day where available
+clock = getattr(time, "monotonic", time.time)
+
+# handle Python2 vs Python3 string types
+try:
+    string_types = (str, unicode)  # Python2
+except NameError:
+    string_types = (str,)          # Python3
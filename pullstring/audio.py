@@ -0,0 +1,776 @@
+# -*- coding: utf-8 -*-
+#
+# Audio helpers for PullString's Web API.
+#
+# Copyright (c) 2016 PullString, Inc.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+"""
+Helpers to prepare audio input and to fetch dialog audio output.
+"""
+
+import os
+import struct
+import threading
+import collections
+
+from ._compat import clock as _clock
+from .models import OUTPUT_DIALOG
+
+
+def strip_wav_header(bytes):
+    """
+    Read a WAV header, check it's valid, and return the data section.
+    Raises a ValueError if the data is not mono 16-bit 16000 Hz WAV data.
+    """
+    # check the RIFF header
+    if len(bytes) < 36 or bytes[0:4] != b"RIFF":
+        raise ValueError("Data is not a WAV file")
+
+    # check that we have 16-bit mono at 16000 samples/sec
+    channels = struct.unpack('<H', bytes[22:24])[0]
+    sample_rate = struct.unpack('<L', bytes[24:28])[0]
+    bits_per_sample = struct.unpack('<H', bytes[34:36])[0]
+    if bits_per_sample != 16 or sample_rate != 16000 or channels != 1:
+        raise ValueError("WAV data is not mono 16-bit data at 16000 sample rate")
+
+    # find the data chunk in the WAV file by iterating through the
+    # subchunks looking for a chunk called 'data' (don't assume 44
+    # bytes). First chunk at 12 bytes (4 bytes name, 4 bytes size).
+    offset = 12
+    chunk_name = bytes[offset:offset+4]
+    chunk_size = struct.unpack('<L', bytes[offset+4:offset+8])[0]
+    file_size = struct.unpack('<L', bytes[4:8])[0]
+    while chunk_name != b'data':
+        if offset > file_size:
+            raise ValueError("Cannot find data segment in WAV data")
+        offset += chunk_size + 8
+        chunk_name = bytes[offset:offset+4]
+        chunk_size = struct.unpack('<L', bytes[offset+4:offset+8])[0]
+
+    data_start = offset + 8
+    return bytes[data_start:]
+
+class AudioCache(object):
+    """
+    A size-bounded, on-disk cache of audio assets, keyed by URI and ETag.
+
+    When the total size of the cached files exceeds max_bytes, the least
+    recently used files are removed. A temporary directory is used if no
+    directory is specified.
+    """
+    def __init__(self, directory=None, max_bytes=64 * 1024 * 1024):
+        import tempfile
+
+        self.directory = directory or tempfile.mkdtemp(prefix="pullstring-audio-")
+        self.max_bytes = max_bytes
+        self.__lock = threading.Lock()
+        self.__files = collections.OrderedDict()
+        self.__size = 0
+
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+        # pick up files cached by a previous process, oldest first
+        files = []
+        for filename in os.listdir(self.directory):
+            path = os.path.join(self.directory, filename)
+            if filename.endswith(".audio") and os.path.isfile(path):
+                files.append((os.path.getmtime(path), filename, os.path.getsize(path)))
+        for mtime, filename, size in sorted(files):
+            self.__files[filename] = size
+            self.__size += size
+
+    @property
+    def size(self):
+        """
+        Return the total size in bytes of all cached files.
+        """
+        return self.__size
+
+    def get(self, uri, etag=""):
+        """
+        Return the local path of a cached asset, or None if it is not cached.
+        """
+        filename = self.__filename(uri, etag)
+        with self.__lock:
+            if filename not in self.__files:
+                return None
+            self.__files[filename] = self.__files.pop(filename)
+        path = os.path.join(self.directory, filename)
+        try:
+            os.utime(path, None)
+        except OSError:
+            return None
+        return path
+
+    def put(self, uri, etag, data):
+        """
+        Store the data for an asset in the cache and return its local path.
+        """
+        import tempfile
+
+        filename = self.__filename(uri, etag)
+        path = os.path.join(self.directory, filename)
+
+        # write to a temporary file first so readers never see partial data
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.rename(tmp_path, path)
+
+        with self.__lock:
+            self.__size += len(data) - self.__files.pop(filename, 0)
+            self.__files[filename] = len(data)
+            self.__evict(keep=filename)
+        return path
+
+    def __evict(self, keep):
+        """
+        Remove the least recently used files until the cache fits max_bytes.
+        """
+        for filename in list(self.__files.keys()):
+            if self.__size <= self.max_bytes:
+                break
+            if filename == keep:
+                continue
+            self.__size -= self.__files.pop(filename)
+            try:
+                os.remove(os.path.join(self.directory, filename))
+            except OSError:
+                pass
+
+    def __filename(self, uri, etag):
+        import hashlib
+        key = (uri + "\n" + (etag or "")).encode("utf-8")
+        return hashlib.sha1(key).hexdigest() + ".audio"
+
+class AudioPrefetcher(object):
+    """
+    Download the audio assets referenced by DialogOutput.uri in the
+    background, as soon as a response is received.
+
+    Set a Conversation's audio_prefetcher to an instance of this class
+    to start fetching the audio for every response. Use get() to return
+    a future that resolves to the local path of the audio file, or
+    open() to wait for the download and return a readable file object.
+    Requires the concurrent.futures module (or the futures backport for
+    Python 2).
+    """
+    def __init__(self, cache=None, max_workers=4, timeout=30):
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.cache = cache or AudioCache()
+        self.timeout = timeout
+        self.__executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.__lock = threading.Lock()
+        self.__futures = collections.OrderedDict()
+        self.__max_futures = 256
+
+    def prefetch(self, response):
+        """
+        Start fetching the audio for all dialog outputs in a response.
+        """
+        for output in response.outputs:
+            if output.type == OUTPUT_DIALOG and output.uri:
+                self.fetch(output.uri, response.etag)
+
+    def fetch(self, uri, etag=""):
+        """
+        Return a future for the local path of an audio asset, starting the
+        download if the asset is not already cached or being fetched.
+        """
+        from concurrent.futures import Future
+
+        with self.__lock:
+            known_etag, future = self.__futures.get(uri, (etag, None))
+            if future is not None and known_etag == etag and \
+               not (future.done() and future.exception()):
+                return future
+
+            path = self.cache.get(uri, etag)
+            if path is not None:
+                future = Future()
+                future.set_result(path)
+            else:
+                future = self.__executor.submit(self.__download, uri, etag)
+
+            # only remember a bounded number of futures; the files stay cached
+            self.__futures.pop(uri, None)
+            self.__futures[uri] = (etag, future)
+            while len(self.__futures) > self.__max_futures:
+                self.__futures.popitem(last=False)
+        return future
+
+    def get(self, output):
+        """
+        Return a future for the local path of the audio for a DialogOutput.
+        """
+        with self.__lock:
+            etag = self.__futures.get(output.uri, ("", None))[0]
+        return self.fetch(output.uri, etag)
+
+    def open(self, output):
+        """
+        Wait for the audio for a DialogOutput and return it as a binary file object.
+        """
+        return open(self.get(output).result(self.timeout), "rb")
+
+    def shutdown(self, wait=True):
+        """
+        Stop the background download threads.
+        """
+        self.__executor.shutdown(wait=wait)
+
+    def __download(self, uri, etag):
+        try:
+            from urllib.request import urlopen  # Python3
+        except ImportError:
+            from urllib2 import urlopen         # Python2
+
+        f = urlopen(uri, timeout=self.timeout)
+        try:
+            data = f.read()
+        finally:
+            f.close()
+        return self.cache.put(uri, etag, data)
+
+def parse_wav_header(data):
+    """
+    Parse the header of a WAV file from its first bytes. Returns a tuple
+    (header_size, sample_rate, channels, bits_per_sample), or None if more
+    bytes are needed. Raises a ValueError if the data is not a WAV file.
+    """
+    if len(data) < 12:
+        return None
+    if data[0:4] != b"RIFF" or data[8:12] != b"WAVE":
+        raise ValueError("Data is not a WAV file")
+
+    # walk the subchunks until the data chunk, remembering the format
+    offset = 12
+    format = None
+    while len(data) >= offset + 8:
+        chunk_name = data[offset:offset+4]
+        chunk_size = struct.unpack('<L', data[offset+4:offset+8])[0]
+        if chunk_name == b"data":
+            if format is None:
+                raise ValueError("WAV data has no format chunk")
+            return (offset + 8,) + format
+        if chunk_name == b"fmt ":
+            if len(data) < offset + 24:
+                return None
+            channels, sample_rate = struct.unpack('<HL', data[offset+10:offset+16])
+            bits_per_sample = struct.unpack('<H', data[offset+22:offset+24])[0]
+            format = (sample_rate, channels, bits_per_sample)
+        offset += 8 + chunk_size + (chunk_size & 1)
+    return None
+
+class RingBuffer(object):
+    """
+    A fixed-size, thread-safe byte buffer between one writer and one reader.
+
+    write() waits while the buffer is full, so a fast download cannot get
+    ahead of playback by more than capacity bytes. read() waits until the
+    requested number of bytes has been written, or the writer has closed
+    the buffer.
+    """
+    def __init__(self, capacity=256 * 1024):
+        self.capacity = capacity
+        self.__data = bytearray(capacity)
+        self.__start = 0
+        self.__size = 0
+        self.__closed = False
+        self.__error = None
+        self.__cond = threading.Condition()
+
+    def __len__(self):
+        return self.__size
+
+    def write(self, data, timeout=None):
+        """
+        Append data, waiting for space as needed. Returns False if the
+        buffer was closed before all of the data was written.
+        """
+        view = memoryview(data)
+        with self.__cond:
+            while len(view):
+                while self.__size == self.capacity and not self.__closed:
+                    if not self.__cond.wait(timeout):
+                        raise IOError("Timed out writing to the audio buffer")
+                if self.__closed:
+                    return False
+                end = (self.__start + self.__size) % self.capacity
+                count = min(len(view), self.capacity - self.__size, self.capacity - end)
+                self.__data[end:end + count] = view[:count]
+                self.__size += count
+                view = view[count:]
+                self.__cond.notify_all()
+        return True
+
+    def read(self, size, timeout=None):
+        """
+        Return the next size bytes, or fewer once the buffer is closed and
+        empty. Raises the error given to close(), if any, once all of the
+        buffered data has been read.
+        """
+        pieces = []
+        with self.__cond:
+            while size:
+                while not self.__size and not self.__closed:
+                    if not self.__cond.wait(timeout):
+                        raise IOError("Timed out reading from the audio buffer")
+                if not self.__size:
+                    if self.__error is not None and not pieces:
+                        raise self.__error
+                    break
+
+                # copy up to the end of the data, or of the buffer if it wraps
+                count = min(size, self.__size, self.capacity - self.__start)
+                pieces.append(bytes(self.__data[self.__start:self.__start + count]))
+                self.__start = (self.__start + count) % self.capacity
+                self.__size -= count
+                size -= count
+                self.__cond.notify_all()
+        return b"".join(pieces)
+
+    def close(self, error=None):
+        """
+        Mark the end of the data, optionally with an error for the reader.
+        """
+        with self.__cond:
+            self.__closed = True
+            self.__error = error
+            self.__cond.notify_all()
+
+class PlaybackClock(object):
+    """
+    The playback position of a dialog output, to keep lip sync in step
+    with its audio.
+
+    Call start() when the first sample is played, and viseme() on every
+    animation frame to get the active viseme from the PhonemeTimeline
+    of the output. If the audio device reports its playback position,
+    pass it to sync() to correct for any drift.
+    """
+    def __init__(self, timeline, duration=None):
+        self.timeline = timeline
+        self.duration = duration if duration is not None else timeline.duration
+        self.__cursor = timeline.cursor()
+        self.__started = None
+
+    @property
+    def started(self):
+        return self.__started is not None
+
+    @property
+    def position(self):
+        """
+        Return the playback position in seconds, from 0 to the duration.
+        """
+        if self.__started is None:
+            return 0.0
+        return max(0.0, min(self.duration, _clock() - self.__started))
+
+    @property
+    def finished(self):
+        return self.__started is not None and _clock() - self.__started >= self.duration
+
+    def start(self, position=0.0):
+        """
+        Start the clock, at the given position in seconds.
+        """
+        self.__started = _clock() - position
+
+    def sync(self, position):
+        """
+        Set the playback position reported by the audio device.
+        """
+        self.start(position)
+
+    def viseme(self):
+        """
+        Return the viseme for the current playback position, or None
+        before the first phoneme.
+        """
+        return self.__cursor.seek(self.position)
+
+class AudioStream(object):
+    """
+    Stream the audio for a DialogOutput while it is downloaded, so that
+    playback can start as soon as the response has been received.
+
+    A background thread reads the audio into a RingBuffer of capacity
+    bytes. If the connection drops part way through, the download is
+    resumed with an HTTP range request. The WAV header is parsed before
+    any audio is returned, and read() and chunks() return the PCM data.
+    Use chunks() to read the audio as it arrives in chunks of a fixed
+    playback time, and the clock, which starts with the first chunk, to
+    keep lip sync in step with playback.
+    """
+    def __init__(self, output, capacity=256 * 1024, block_size=8192, timeout=30, retries=2, pool=None):
+        from .transport import DEFAULT_POOL
+
+        self.output = output
+        self.uri = output.uri
+        self.block_size = block_size
+        self.timeout = timeout
+        self.retries = retries
+        self.sample_rate = 16000
+        self.channels = 1
+        self.bits_per_sample = 16
+        self.clock = PlaybackClock(output.timeline, output.duration)
+        self.__pool = pool if pool is not None else DEFAULT_POOL
+        self.__buffer = RingBuffer(capacity)
+        self.__header_ready = threading.Event()
+        self.__position = 0
+
+        self.__thread = threading.Thread(target=self.__download)
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    @property
+    def bytes_per_second(self):
+        """
+        Return the number of bytes of PCM data per second of playback.
+        """
+        self.__header_ready.wait(self.timeout)
+        return self.sample_rate * self.channels * self.bits_per_sample // 8
+
+    @property
+    def position(self):
+        """
+        Return the playback time in seconds of the audio read so far.
+        """
+        return float(self.__position) / self.bytes_per_second
+
+    def read(self, size):
+        """
+        Return the next size bytes of PCM data, waiting for them to be
+        downloaded, or fewer at the end of the audio.
+        """
+        self.__header_ready.wait(self.timeout)
+        data = self.__buffer.read(size, self.timeout)
+        self.__position += len(data)
+        return data
+
+    def chunks(self, seconds=0.1):
+        """
+        Yield (start, data) tuples with the start time and PCM data of each
+        chunk of the given playback time, as soon as each one has been
+        downloaded. The chunks cover the duration of the output, and the
+        last chunk may be shorter.
+        """
+        frame_size = self.channels * self.bits_per_sample // 8
+        size = max(frame_size, int(self.bytes_per_second * seconds) // frame_size * frame_size)
+        while True:
+            start = self.position
+            data = self.read(size)
+            if not data:
+                return
+            if not self.clock.started:
+                self.clock.start()
+            yield start, data
+
+    def __iter__(self):
+        return self.chunks()
+
+    def close(self):
+        """
+        Stop the download and discard any buffered audio.
+        """
+        self.__buffer.close()
+
+    def __download(self):
+        """
+        Download the audio into the buffer, resuming after dropped connections.
+        """
+        from .transport import httplib, urlparse
+
+        purl = urlparse.urlparse(self.uri)
+        path = purl.path + ("?" + purl.query if purl.query else "")
+        received = 0
+        header = b""
+        retries = self.retries
+        try:
+            while True:
+                headers = {"Range": "bytes=%d-" % received} if received else {}
+                conn, reused = self.__connect(purl, reuse=not received)
+                conn.timeout = self.timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(self.timeout)
+                try:
+                    conn.request("GET", path, headers=headers)
+                    response = conn.getresponse()
+                    if response.status not in (200, 206):
+                        raise IOError("HTTP %d fetching %s" % (response.status, self.uri))
+
+                    # a server that ignores the range sends everything again
+                    skip = received if response.status == 200 else 0
+                    while True:
+                        data = response.read(self.block_size)
+                        if not data:
+                            break
+                        if skip:
+                            data, skip = data[skip:], max(0, skip - len(data))
+                            if not data:
+                                continue
+                        received += len(data)
+                        if not self.__header_ready.is_set():
+                            header += data
+                            data = self.__parse_header(header)
+                        if data and not self.__buffer.write(data, self.timeout):
+                            conn.close()
+                            return
+                    if response.length is not None and response.length > 0:
+                        raise httplib.IncompleteRead(b"", response.length)
+                except (IOError, httplib.HTTPException) as e:
+                    conn.close()
+                    if received == 0 or retries <= 0:
+                        raise
+                    retries -= 1
+                    continue
+
+                if response.will_close or purl.scheme == "http":
+                    conn.close()
+                else:
+                    self.__pool.release(purl, conn)
+                break
+
+            # a header without any audio data
+            if not self.__header_ready.is_set():
+                self.__parse_header(header, final=True)
+            self.__buffer.close()
+        except Exception as e:
+            self.__header_ready.set()
+            self.__buffer.close(e)
+
+    def __connect(self, purl, reuse):
+        """
+        Return a (connection, reused) tuple for the parsed URI. The pool
+        only holds HTTPS connections, so http URIs get a new connection.
+        """
+        from .transport import httplib
+
+        if purl.scheme == "http":
+            return httplib.HTTPConnection(purl.netloc, timeout=self.timeout), False
+        return self.__pool.acquire(purl, reuse=reuse)
+
+    def __parse_header(self, data, final=False):
+        """
+        Parse the WAV header once enough bytes have arrived, and return
+        the audio data that follows it. Data without a RIFF header is
+        raw PCM in the default format.
+        """
+        if data[:4] != b"RIFF"[:len(data[:4])] or (final and len(data) < 12):
+            self.__header_ready.set()
+            return data
+
+        header = parse_wav_header(data)
+        if header is None:
+            if final:
+                raise ValueError("Incomplete WAV header")
+            return b""
+
+        header_size, self.sample_rate, self.channels, self.bits_per_sample = header
+        self.__header_ready.set()
+        return data[header_size:]
+
+# 100 ms of mono 16-bit PCM at 16 kHz, the default chunk size for streaming audio
+AUDIO_CHUNK_SIZE = 3200
+
+class ChunkWriterStats(object):
+    """
+    Throughput and buffering metrics for the audio sent by ChunkWriters.
+    A single object can collect the metrics of many writers.
+    """
+    def __init__(self):
+        self.bytes_written = 0
+        self.bytes_sent = 0
+        self.chunks_sent = 0
+        self.buffered = 0
+        self.max_buffered = 0
+        self.blocked_time = 0.0
+        self.send_time = 0.0
+        self.elapsed = 0.0
+        self.lock = threading.Lock()
+
+    @property
+    def throughput(self):
+        """
+        Return the number of bytes sent per second while streaming.
+        """
+        return self.bytes_sent / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def mean_chunk_size(self):
+        return self.bytes_sent / float(self.chunks_sent) if self.chunks_sent else 0.0
+
+class ChunkWriter(object):
+    """
+    Stream audio to a chunked exchange in chunks of a useful size.
+
+    Writes are buffered and sent by a background thread, which sends a
+    chunk as soon as chunk_size bytes are buffered, or once the oldest
+    buffered byte has waited for flush_interval seconds. If the network
+    is slower than the audio source, the buffer grows and later chunks
+    are larger, up to max_chunk_size, so fewer sends carry the backlog.
+    Once max_buffered bytes are waiting in the writer's own buffer,
+    write() blocks until the thread has sent enough to make room again.
+
+    A ChunkWriter has the same interface as the exchange it wraps: finish()
+    sends the rest of the buffer and then completes the request. Errors
+    from sending are raised by the next write(), or by finish(). Once the
+    writer is cancelled, they raise a RequestCancelled error, including a
+    write() that is blocked on a full buffer.
+
+    The clock, a function that returns the time in seconds, defaults to a
+    monotonic clock, and may be replaced, e.g., by a test.
+    """
+    def __init__(self, exchange, chunk_size=AUDIO_CHUNK_SIZE, flush_interval=0.1, max_chunk_size=None,
+                 max_buffered=None, stats=None, clock=None):
+        self.url = exchange.url
+        self.chunked = exchange.chunked
+        self.chunk_size = chunk_size
+        self.flush_interval = flush_interval
+        self.max_chunk_size = max_chunk_size or chunk_size * 4
+        self.max_buffered = max_buffered or chunk_size * 10
+        self.stats = stats if stats is not None else ChunkWriterStats()
+        self.__clock = clock or _clock
+        self.__exchange = exchange
+        self.__buffer = bytearray()
+        self.__oldest = None
+        self.__closed = False
+        self.__finished = False
+        self.__error = None
+        self.__started = self.__clock()
+        self.__cond = threading.Condition()
+        self.__thread = None
+
+    def send(self, data):
+        self.write(data)
+
+    def write(self, data):
+        """
+        Add audio to the buffer, waiting while the buffer is full.
+        """
+        if not data:
+            return
+        with self.__cond:
+            if self.__error is not None:
+                raise self.__error
+            if self.__closed:
+                raise ValueError("Audio written after the request was finished")
+            if self.__thread is None:
+                self.__thread = threading.Thread(target=self.__run)
+                self.__thread.daemon = True
+                self.__thread.start()
+
+            if len(self.__buffer) >= self.max_buffered:
+                blocked = self.__clock()
+                while len(self.__buffer) >= self.max_buffered and self.__error is None and not self.__closed:
+                    self.__cond.wait()
+                self.__update(blocked_time=self.__clock() - blocked)
+            if self.__error is not None:
+                raise self.__error
+            if self.__closed:
+                raise ValueError("Audio written after the request was finished")
+
+            if not self.__buffer:
+                self.__oldest = self.__clock()
+            self.__buffer += data
+            self.__update(bytes_written=len(data))
+            if len(self.__buffer) >= self.chunk_size:
+                self.__cond.notify_all()
+
+    def finish(self, on_data=None):
+        """
+        Send any buffered audio, then complete the request and return its result.
+        """
+        with self.__cond:
+            self.__closed = True
+            self.__cond.notify_all()
+        if self.__thread is not None:
+            self.__thread.join()
+        with self.stats.lock:
+            self.stats.elapsed += self.__clock() - self.__started
+        if self.__error is not None:
+            raise self.__error
+        try:
+            return self.__exchange.finish(on_data)
+        finally:
+            with self.__cond:
+                self.__finished = True
+
+    def cancel(self):
+        """
+        Discard the buffer, stop the sending thread, and abort the exchange,
+        unless finish() has already completed it. Later calls, and writes
+        that are waiting for room in the buffer, raise RequestCancelled.
+        """
+        from .transport import RequestCancelled
+
+        with self.__cond:
+            if self.__finished:
+                return
+            self.__closed = True
+            if self.__error is None:
+                self.__error = RequestCancelled("The audio request was cancelled")
+            del self.__buffer[:]
+            self.__update()
+            self.__cond.notify_all()
+        cancel = getattr(self.__exchange, "cancel", None)
+        if cancel is not None:
+            cancel()
+
+    def __run(self):
+        """
+        Send chunks from the buffer until the writer is finished.
+        """
+        while True:
+            with self.__cond:
+                while not self.__closed:
+                    if len(self.__buffer) >= self.chunk_size:
+                        break
+                    if self.__buffer:
+                        wait = self.__oldest + self.flush_interval - self.__clock()
+                        if wait <= 0:
+                            break
+                        self.__cond.wait(wait)
+                    else:
+                        self.__cond.wait()
+                if not self.__buffer:
+                    return
+                chunk = bytes(self.__buffer[:self.max_chunk_size])
+                del self.__buffer[:len(chunk)]
+                self.__oldest = self.__clock() if self.__buffer else None
+
+            # send outside the lock, so producers can keep writing meanwhile
+            start = self.__clock()
+            try:
+                self.__exchange.send(chunk)
+            except Exception as e:
+                with self.__cond:
+                    if self.__error is None:
+                        self.__error = e
+                    del self.__buffer[:]
+                    self.__update()
+                    self.__cond.notify_all()
+                return
+
+            with self.__cond:
+                self.__update(bytes_sent=len(chunk), chunks_sent=1, send_time=self.__clock() - start)
+                self.__cond.notify_all()
+
+    def __update(self, **counts):
+        """
+        Add to the stats counters, and record the size of the buffer.
+        """
+        stats = self.stats
+        with stats.lock:
+            for name, value in counts.items():
+                setattr(stats, name, getattr(stats, name) + value)
+            stats.buffered = len(self.__buffer)
+            stats.max_buffered = max(stats.max_buffered, stats.buffered)
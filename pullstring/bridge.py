@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+#
+# Stream live audio from asyncio code to PullString's Web API.
+#
+# Copyright (c) 2016 PullString, Inc.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+"""
+An asyncio bridge from a microphone to a streamed audio request.
+"""
+
+import sys
+import threading
+
+if sys.version_info >= (3, 0):
+    import queue
+else:
+    import Queue as queue
+
+# what to do with a new frame when the queue of frames to send is full
+POLICY_BLOCK = "block"
+POLICY_DROP = "drop"
+
+# markers in the queue of frames to send
+_END = object()
+_CANCEL = object()
+
+
+class AudioBridge(object):
+    """
+    Stream PCM audio frames from asyncio code, e.g., a microphone
+    callback, to the Web API with the start_audio(), add_audio(), and
+    end_audio() calls of a conversation, without blocking the event loop.
+
+    stream() reads frames from an asyncio.Queue, or an async iterator,
+    until it gets None or the iterator ends, and returns an asyncio
+    Future for the Response. The frames must be mono 16-bit LinearPCM
+    audio at 16000 samples per second. The upload starts with the first
+    frame, so the response arrives soon after the user stops talking.
+
+    At most max_frames frames wait to be sent. When the queue is full,
+    POLICY_BLOCK stops reading from the source until there is room, so
+    nothing is lost; POLICY_DROP drops the oldest frame instead, so a
+    slow network never holds up the audio source.
+
+    Cancel the Future to abandon the request: the upload is cut off, so
+    the Web API ignores it. The requests run on a thread of their own,
+    one stream at a time per conversation.
+    """
+    def __init__(self, conversation, max_frames=50, policy=POLICY_BLOCK):
+        if policy not in (POLICY_BLOCK, POLICY_DROP):
+            raise ValueError("Unknown queue policy: %s" % policy)
+        self.conversation = conversation
+        self.max_frames = max_frames
+        self.policy = policy
+        self.frames = 0
+        self.dropped = 0
+        self.bytes_sent = 0
+
+    def stream(self, source, request=None, timeout=None):
+        """
+        Return an asyncio Future for the Response to the audio read from
+        source. The request and timeout are passed to start_audio().
+        """
+        import asyncio
+
+        upload = _Upload(self, source, asyncio.get_event_loop())
+        upload.start(request, timeout)
+        return upload.future
+
+class _Upload(object):
+    """
+    A single stream of audio, from its source to the Web API.
+
+    The source is read by callbacks on the event loop, which put frames
+    into a queue. A thread takes them from the queue and makes the
+    blocking conversation calls, so it never waits for the event loop.
+    """
+    def __init__(self, bridge, source, loop):
+        import asyncio
+
+        self.bridge = bridge
+        self.loop = loop
+        self.future = loop.create_future()
+        self.__asyncio = asyncio
+        self.__source = source
+        self.__iterator = None if hasattr(source, "get") else source.__aiter__()
+        self.__frames = queue.Queue()
+        self.__pending = None
+        self.__blocked = None
+        self.__cancelled = False
+        self.__ending = False
+        self.__finished = False
+        self.__lock = threading.Lock()
+
+    def start(self, request, timeout):
+        self.future.add_done_callback(self.__on_done)
+        thread = threading.Thread(target=self.__run, args=(request, timeout))
+        thread.daemon = True
+        thread.start()
+        self.__read()
+
+    def __read(self):
+        """
+        Ask the source for the next frame.
+        """
+        if self.future.done():
+            return
+        try:
+            if self.__iterator is None:
+                awaitable = self.__source.get()
+            else:
+                awaitable = self.__iterator.__anext__()
+        except StopAsyncIteration:
+            self.__frames.put(_END)
+            return
+        except Exception as e:
+            self.__resolve(None, e)
+            return
+        self.__pending = self.__asyncio.ensure_future(awaitable)
+        self.__pending.add_done_callback(self.__on_frame)
+
+    def __on_frame(self, pending):
+        """
+        Queue a frame from the source, as the policy allows.
+        """
+        if pending.cancelled() or self.future.done():
+            return
+        error = pending.exception()
+        if isinstance(error, StopAsyncIteration):
+            frame = None
+        elif error is not None:
+            self.__resolve(None, error)
+            return
+        else:
+            frame = pending.result()
+
+        # the end of the audio is never dropped
+        if frame is None:
+            self.__frames.put(_END)
+            return
+
+        bridge = self.bridge
+        bridge.frames += 1
+        with self.__lock:
+            if self.__frames.qsize() >= bridge.max_frames:
+                if bridge.policy == POLICY_BLOCK:
+                    # read on once the thread has taken a frame
+                    self.__blocked = frame
+                    return
+                try:
+                    self.__frames.get_nowait()
+                    bridge.dropped += 1
+                except queue.Empty:
+                    pass
+            self.__frames.put(frame)
+        self.__read()
+
+    def __on_room(self):
+        """
+        Queue the frame that was held back by a full queue, and read on.
+        """
+        with self.__lock:
+            frame = self.__blocked
+            if frame is None or self.__frames.qsize() >= self.bridge.max_frames:
+                return
+            self.__blocked = None
+            self.__frames.put(frame)
+        self.__read()
+
+    def __on_done(self, future):
+        """
+        Stop reading the source, and cut off the upload if it was cancelled.
+        """
+        if self.__pending is not None:
+            self.__pending.cancel()
+        with self.__lock:
+            if self.__finished:
+                return
+            self.__cancelled = True
+            ending = self.__ending
+        self.__frames.put(_CANCEL)
+        if ending:
+            # the thread is waiting for the response, so wake it up
+            self.bridge.conversation.cancel_audio()
+
+    def __resolve(self, response, error):
+        """
+        Complete the Future, unless it was cancelled. Called on the loop.
+        """
+        if self.future.done():
+            return
+        if error is not None:
+            self.future.set_exception(error)
+        else:
+            self.future.set_result(response)
+
+    def __run(self, request, timeout):
+        """
+        Make the conversation calls, on a thread of their own.
+        """
+        conv = self.bridge.conversation
+        try:
+            conv.start_audio(request, timeout)
+            while True:
+                frame = self.__frames.get()
+                with self.__lock:
+                    if self.__cancelled or frame is _CANCEL:
+                        self.__finished = True
+                        conv.cancel_audio()
+                        return
+                    if frame is _END:
+                        self.__ending = True
+                        break
+                    blocked = self.__blocked is not None
+                if blocked:
+                    self.__call_soon(self.__on_room)
+                conv.add_audio(frame)
+                self.bridge.bytes_sent += len(frame)
+
+            response = conv.end_audio()
+            error = None
+        except Exception as e:
+            response, error = None, e
+
+        with self.__lock:
+            self.__finished = True
+        self.__call_soon(self.__resolve, response, error)
+
+    def __call_soon(self, callback, *args):
+        """
+        Call back on the event loop from the thread, unless it has closed.
+        """
+        try:
+            self.loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            pass
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+#
+# Bulk entity values for PullString's Web API.
+#
+# Copyright (c) 2016 PullString, Inc.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+"""
+Typed entity values for getting and setting many entities at once.
+"""
+
+from ._compat import string_types
+from .models import ENTITY_LABEL, ENTITY_COUNTER, ENTITY_FLAG, ENTITY_LIST, Status
+
+# the maximum number of entities in a single bulk request
+ENTITY_BATCH_SIZE = 200
+
+
+def entity_type_of(value):
+    """
+    Return the entity type for a value, i.e., ENTITY_FLAG for a bool,
+    ENTITY_COUNTER for a number, ENTITY_LABEL for a string, or ENTITY_LIST
+    for a list or tuple, or None.
+    """
+    value_type = type(value)
+    if value_type is bool:
+        return ENTITY_FLAG
+    if value_type in (int, float):
+        return ENTITY_COUNTER
+    if value_type in string_types:
+        return ENTITY_LABEL
+    if value_type in (list, tuple):
+        return ENTITY_LIST
+    return None
+
+def to_columns(values):
+    """
+    Return a (names, values) tuple of lists for either a mapping of names
+    to values, or a (names, values) tuple of sequences.
+    """
+    if hasattr(values, "items"):
+        return list(values.keys()), list(values.values())
+    names, values = values
+    if len(names) != len(values):
+        raise ValueError("Got %d entity names but %d values" % (len(names), len(values)))
+    return list(names), list(values)
+
+class EntitySchema(object):
+    """
+    A cache of the type of each entity, by name.
+
+    The type of each entity is inferred from its value the first time it
+    is seen, and later values with a different type are rejected before
+    they are sent to the Web API. A schema can be shared by all of the
+    conversations for the same project.
+    """
+    def __init__(self, types=None):
+        self.types = dict(types or {})
+
+    def type_of(self, name):
+        """
+        Return the entity type of the named entity, or None if it is unknown.
+        """
+        return self.types.get(name)
+
+    def check(self, names, values):
+        """
+        Raise a TypeError if any value does not match the type of its
+        entity, and remember the type of any new entities.
+        """
+        types = self.types
+        for name, value in zip(names, values):
+            known = types.get(name)
+            value_type = entity_type_of(value)
+            if known is None:
+                if value_type is None:
+                    raise TypeError("Unsupported value for entity %s: %r" % (name, value))
+                types[name] = value_type
+            elif known != value_type:
+                raise TypeError("Entity %s is a %s, got %r" % (name, known, value))
+
+    def learn(self, values):
+        """
+        Remember the type of any new entities in a mapping of names to values.
+        """
+        types = self.types
+        for name in values:
+            if name not in types:
+                value_type = entity_type_of(values[name])
+                if value_type is not None:
+                    types[name] = value_type
+
+class EntityValues(object):
+    """
+    The result of a bulk entity request: the status, and the typed value
+    of each entity in a dict, rather than a Counter, Flag, or Label per
+    entity. If any of the requests failed, status describes the first
+    failure, and values has the entities of the requests that succeeded.
+    """
+    def __init__(self, values=None, status=None, schema=None):
+        self.values = values if values is not None else {}
+        self.status = status or Status()
+        self.schema = schema
+
+    def get(self, name, default=None):
+        return self.values.get(name, default)
+
+    def type_of(self, name):
+        """
+        Return the entity type of the named entity, or None if it is unknown.
+        """
+        return self.schema.type_of(name) if self.schema is not None else entity_type_of(self.values.get(name))
+
+    def columns(self, names=None):
+        """
+        Return a (names, values) tuple of lists, for the given names or for
+        all entities. Missing entities have a value of None.
+        """
+        if names is None:
+            return to_columns(self.values)
+        names = list(names)
+        return names, [self.values.get(name) for name in names]
+
+    def __getitem__(self, name):
+        return self.values[name]
+
+    def __contains__(self, name):
+        return name in self.values
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __len__(self):
+        return len(self.values)
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+#
+# Encode and decode the JSON bodies of PullString's Web API.
+#
+# Copyright (c) 2016 PullString, Inc.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+"""
+Conversion between Web API JSON bodies and Response objects.
+"""
+
+import json
+import codecs
+
+from ._compat import string_types
+from .models import OUTPUT_DIALOG, OUTPUT_BEHAVIOR
+from .models import Phoneme, Counter, Flag, Label, ListEntity, DialogOutput, BehaviorOutput, Response
+
+
+def encode(body):
+    """
+    Return the JSON encoding of a request body.
+    """
+    return json.dumps(body)
+
+def decode(content):
+    """
+    Parse the UTF-8 encoded JSON content of a response body.
+    """
+    return json.loads(content.decode("utf-8"))
+
+def json_to_response(data, outputs=None, pool=None):
+    """
+    Convert JSON that conforms to PullString's Web API spec into a Response
+    object. If outputs is given, it is used instead of decoding the outputs
+    array again, e.g., after they were decoded by an OutputStreamDecoder.
+    If pool is given, the objects are taken from that ResponsePool.
+    """
+    response = _new(Response, pool)
+
+    # parse the simple top-level fields from the response
+    response.conversation_id = data.get('conversation', '')
+    response.participant_id = data.get('participant', '')
+    response.timed_response_interval = data.get('timed_response_interval', -1)
+    response.last_modified = data.get('last_modified', '')
+    response.etag = data.get('etag', '')
+    response.asr_hypothesis = data.get('asr_hypothesis', '')
+
+    # parse out the outputs array, i.e., dialog or behavior responses
+    if outputs is not None:
+        response.outputs.extend(outputs)
+    else:
+        for output_data in data.get('outputs', []):
+            output = json_to_output(output_data, pool)
+            if output:
+                response.outputs.append(output)
+
+    # parse all of the entity information (counters, flags, labels)
+    entities = data.get('entities', {})
+    for name in entities.keys():
+        entity = json_to_entity(name, entities[name], pool)
+        if entity:
+            response.entities.append(entity)
+
+    return response
+
+def json_to_output(output_data, pool=None):
+    """
+    Convert the JSON for a single output into a DialogOutput or
+    BehaviorOutput object, or None if the output type is unknown.
+    """
+    output_type = output_data.get('type', '').lower().strip()
+    if output_type == OUTPUT_DIALOG:
+        output = _new(DialogOutput, pool)
+        output.id = output_data.get('id', '')
+        output.text = output_data.get('text', '')
+        output.uri = output_data.get('uri', '')
+        output.duration = output_data.get('duration', 0)
+        output.character = output_data.get('character', '')
+        output.user_data = output_data.get('user_data', '')
+
+        phonemes_data = output_data.get('phonemes', [])
+        if pool is not None:
+            phonemes = pool.acquire_phonemes(len(phonemes_data))
+        else:
+            phonemes = [Phoneme() for phoneme_data in phonemes_data]
+        for phoneme, phoneme_data in zip(phonemes, phonemes_data):
+            phoneme.name = phoneme_data.get('name', '')
+            phoneme.seconds_since_start = phoneme_data.get('seconds_since_start', 0)
+            if phoneme.name:
+                output.phonemes.append(phoneme)
+        return output
+
+    elif output_type == OUTPUT_BEHAVIOR:
+        output = _new(BehaviorOutput, pool)
+        output.behavior = output_data.get('behavior', '')
+        output.parameters = output_data.get('parameters', {})
+        return output
+
+    return None
+
+def json_to_entity(name, value, pool=None):
+    """
+    Convert a JSON entity value into a Counter, Flag, Label, or ListEntity
+    object, or None if the value has an unsupported type.
+    """
+    if type(value) in [int, float]:
+        entity = _new(Counter, pool)
+
+    elif type(value) in [bool]:
+        entity = _new(Flag, pool)
+
+    elif type(value) in string_types:
+        entity = _new(Label, pool)
+
+    elif type(value) in [list]:
+        entity = _new(ListEntity, pool)
+
+    else:
+        return None
+
+    entity.name = name
+    entity.value = value
+    return entity
+
+def _new(cls, pool):
+    """
+    Return a new object of a model class, or a reused one from the pool.
+    """
+    return pool.acquire(cls) if pool is not None else cls()
+
+class OutputStreamDecoder(object):
+    """
+    Incrementally decode the outputs array of a Web API response body.
+
+    Call feed() with each block of bytes as it is received. It returns
+    the list of DialogOutput and BehaviorOutput objects that have been
+    completely received so far, so that clients can act on the first
+    outputs before the rest of the body arrives.
+    """
+    def __init__(self):
+        self.outputs = []
+        self.__decoder = codecs.getincrementaldecoder("utf-8")()
+        self.__json = json.JSONDecoder()
+        self.__text = ""
+        self.__pos = 0
+        self.__depth = 0
+        self.__in_string = False
+        self.__escape = False
+        self.__string_start = 0
+        self.__last_key = None
+        self.__in_outputs = False
+        self.__output_start = -1
+        self.__done = False
+
+    def feed(self, data):
+        """
+        Add a block of the response body and return any new outputs.
+        """
+        if self.__done:
+            return []
+
+        self.__text += self.__decoder.decode(data)
+        outputs = []
+        text = self.__text
+        pos = self.__pos
+        while pos < len(text):
+            c = text[pos]
+            if self.__in_string:
+                if self.__escape:
+                    self.__escape = False
+                elif c == "\\":
+                    self.__escape = True
+                elif c == '"':
+                    self.__in_string = False
+                    if self.__depth == 1:
+                        self.__last_key = text[self.__string_start:pos]
+            elif c == '"':
+                self.__in_string = True
+                self.__string_start = pos + 1
+            elif c in "{[":
+                if self.__in_outputs and self.__depth == 2 and c == "{":
+                    self.__output_start = pos
+                elif self.__depth == 1 and c == "[" and self.__last_key == "outputs":
+                    self.__in_outputs = True
+                self.__depth += 1
+            elif c in "}]":
+                self.__depth -= 1
+                if self.__in_outputs and self.__depth == 2 and self.__output_start >= 0:
+                    output_data = self.__json.raw_decode(text, self.__output_start)[0]
+                    self.__output_start = -1
+                    output = json_to_output(output_data)
+                    if output:
+                        outputs.append(output)
+                elif self.__in_outputs and self.__depth == 1:
+                    # the outputs array is complete, so stop scanning
+                    self.__done = True
+                    break
+            elif c == "," and self.__depth == 1:
+                self.__last_key = None
+            pos += 1
+
+        # keep the text of a partially received output or key, but nothing before it
+        if self.__output_start >= 0:
+            keep = self.__output_start
+        elif self.__in_string and self.__depth == 1:
+            keep = self.__string_start
+        else:
+            keep = pos
+        self.__text = text[keep:]
+        self.__pos = pos - keep
+        self.__string_start -= keep
+        if self.__output_start >= 0:
+            self.__output_start -= keep
+
+        self.outputs.extend(outputs)
+        return outputs
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+#
+# Per-client settings for PullString's Web API.
+#
+# Copyright (c) 2016 PullString, Inc.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+"""
+Client configuration, so that one process can use several Web API endpoints.
+"""
+
+from ._compat import clock as _clock
+from .models import VersionInfo
+from .transport import ConnectionPool, HttpTransport, urlparse
+
+
+class ClientConfig(object):
+    """
+    The endpoint and connection settings used by a Conversation.
+
+    Pass a ClientConfig to Conversation() to talk to a given base_url,
+    e.g., a staging server or another region, with its own headers,
+    while other conversations in the same process use other settings.
+    Settings that are None fall back to VersionInfo: the base URL and
+    headers are read from VersionInfo on every request, so a default
+    ClientConfig() behaves exactly as before.
+
+    Conversations with the same ClientConfig share its pool of
+    keep-alive connections. If no pool is given, the pool shared by all
+    conversations is used, unless an ssl_context is given, in which case
+    the config gets a pool of its own that uses that context. timeout is
+    the default time limit in seconds for each call, as Request.timeout,
+    where 0 means no limit.
+    """
+    def __init__(self, base_url=None, headers=None, ssl_context=None, pool=None, timeout=0):
+        self.ssl_context = ssl_context
+        self.timeout = timeout
+        self.__base_url = base_url
+        self.__headers = headers
+        if pool is None and ssl_context is not None:
+            pool = ConnectionPool(ssl_context=ssl_context)
+        self.pool = pool
+
+    @property
+    def base_url(self):
+        return self.__base_url if self.__base_url is not None else VersionInfo().api_base_url
+
+    @base_url.setter
+    def base_url(self, base_url):
+        self.__base_url = base_url
+
+    @property
+    def headers(self):
+        return self.__headers if self.__headers is not None else VersionInfo().api_base_headers
+
+    @headers.setter
+    def headers(self, headers):
+        self.__headers = headers
+
+    def transport(self):
+        """
+        Return a new transport that sends requests over the pool of this config.
+        """
+        return HttpTransport(self.pool)
+
+    def measure_latency(self, samples=3, timeout=2.0):
+        """
+        Return the lowest time in seconds to open a TCP connection and
+        complete a TLS handshake with the host of the base URL, over a
+        few samples. Each connection is then kept in the pool. A sample
+        that takes longer than timeout seconds raises a socket.timeout.
+        """
+        pool = self.transport().pool
+        purl = urlparse.urlparse(self.base_url)
+        best = None
+        for x in range(samples):
+            start = _clock()
+            conn, reused = pool.acquire(purl, reuse=False, timeout=timeout)
+            conn.connect()
+            elapsed = _clock() - start
+            pool.release(purl, conn)
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+def fastest(configs, samples=3, timeout=2.0):
+    """
+    Return the config with the lowest connection latency, e.g., to pick
+    the nearest of several regional endpoints when a worker starts.
+    Endpoints that cannot be reached, or take longer than timeout seconds
+    to connect, are skipped, and a ValueError is raised if none can be.
+    """
+    best = None
+    best_latency = None
+    for config in configs:
+        try:
+            latency = config.measure_latency(samples, timeout)
+        except (IOError, OSError):
+            continue
+        if best_latency is None or latency < best_latency:
+            best, best_latency = config, latency
+    if best is None:
+        raise ValueError("None of the Web API endpoints can be reached")
+    return best
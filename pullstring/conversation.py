@@ -0,0 +1,1102 @@
+# -*- coding: utf-8 -*-
+#
+# The Conversation interface to PullString's Web API.
+#
+# Copyright (c) 2016 PullString, Inc.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+"""
+The Conversation class, which sends requests to the Web API.
+"""
+
+import sys
+import copy
+import threading
+import posixpath
+
+from . import bulk
+from . import codec
+from . import audio
+from . import hedging
+from ._compat import clock as _clock
+from .models import BUILD_SANDBOX, BUILD_STAGING, FORMAT_RAW_PCM_16K, FORMAT_WAV_16K
+from .models import IF_MODIFIED_NOTHING, STATUS_DEADLINE_EXCEEDED, DEADLINE_EXCEEDED, STATUS_PENDING, PENDING
+from .models import Request, Response, Status
+from .transport import DeadlineExceeded
+from .config import ClientConfig
+
+if sys.version_info >= (3, 0):
+    import queue
+else:
+    import Queue as queue
+
+
+class Conversation(object):
+    """
+    The Conversation object lets you interface with PullString's Web API.
+
+    To initiate a conversation, you call the start() function, providing
+    the PullString project ID and a Request() object that must specify
+    your API Key. The API Key will be remembered for future requests to
+    the same Conversation instance.
+
+    The response from the Web API is returned as a Response() object,
+    which can contain zero or more outputs, including lines of dialog
+    or behaviors.
+
+    You can send input to the Web API using the various send_XXX()
+    functions, e.g., use send_text() to send a text input string
+    or send_audio() to send 16-bit LinearPCM audio data.
+
+    Set entity_cache to an EntityCache() object to remember entity
+    values locally, answer get_entities() from the cache where possible,
+    and only send entity values that have changed.
+
+    Set audio_prefetcher to an AudioPrefetcher() object to download the
+    audio for dialog outputs in the background as each response arrives.
+
+    Set coalesce to True to merge compatible requests: set_entities()
+    values are queued and sent along with the next send_intent() or
+    send_event() call (or before any other request, or on flush()), and
+    concurrent get_entities() calls from several threads are combined
+    into a single request. Requests are serialized across threads in
+    this mode, but audio streaming should not overlap other requests.
+
+    Set rate_limiter to a RateLimiter() object, shared by several
+    conversations, to limit the rate of requests for each API key.
+    Requests wait for their turn before they are sent.
+
+    Use get_entity_values() and set_entity_values() to get or set many
+    entities at once, e.g., to sync game state. Values are passed as
+    plain mappings or (names, values) columns, and checked against the
+    entity_schema, an EntitySchema() that can be shared by conversations.
+
+    Set hedger to a RequestHedger() object to send a second copy of a
+    slow get_entities() or check_for_timed_responses() request on another
+    connection, and use whichever response arrives first. These requests
+    do not change the conversation, so they are safe to send twice.
+
+    Set profiler to a TurnProfiler() object to profile a sample of the
+    requests of this conversation, e.g., to find out whether a slow turn
+    was spent in the SDK or waiting for the network.
+
+    Set response_pool to a ResponsePool() object to build responses from
+    reused objects, which reduces garbage collection pauses at high turn
+    rates. Each response must then be released to the pool once it is no
+    longer needed, and must not be used after that.
+
+    The transport is used to send HTTPS requests to the Web API. By
+    default, all conversations share a pool of keep-alive connections,
+    which can be opened ahead of traffic with pullstring.warm_up().
+
+    Pass a ClientConfig() as config to use a different base URL, headers,
+    TLS context, connection pool, or default timeout for this conversation
+    than the process-wide defaults in VersionInfo.
+
+    Each call that sends a request accepts a timeout in seconds, which
+    overrides the timeout of the Request. The time left is passed on to
+    every step of the call: waiting for the rate limiter, connecting,
+    uploading audio, retrying, and reading the response. For audio sent
+    with start_audio(), add_audio() and end_audio(), the time runs from
+    start_audio(). A call that runs out of time returns a Response whose
+    status has deadline_exceeded set, rather than waiting any longer.
+    """
+    
+    def __init__(self, config=None):
+        self.__last_request = None
+        self.__last_response = None
+        self.__exchange = None
+        self.__audio_exchange = None
+        self.__turn = True
+        self.__lock = threading.RLock()
+        self.__batch_lock = threading.Lock()
+        self.__open_batch = None
+        self.__sent_batches = []
+        self.__queued_entities = []
+        self.__queued_responses = []
+        self.__stream = threading.local()
+        self.__settings = None
+        self.debug_mode = False
+        self.coalesce = False
+        self.entity_cache = None
+        self.audio_prefetcher = None
+        self.rate_limiter = None
+        self.hedger = None
+        self.profiler = None
+        self.response_pool = None
+        self.audio_chunk_size = 0
+        self.audio_flush_interval = 0.1
+        self.audio_stats = audio.ChunkWriterStats()
+        self.entity_schema = None
+        self.config = config if config is not None else ClientConfig()
+        self.transport = self.config.transport()
+
+    def start(self, project_id, request=None, timeout=None):
+        """
+        Start a new conversation with the Web API and return the response.
+
+        You must specify the PullString project ID and a Request
+        object that specifies your valid API key.
+        """
+        # get the project ID into a canonical form
+        project_id = project_id.lower().strip()
+
+        # setup the parameters to start a new conversation
+        body = {}
+        body['project'] = project_id
+        if request and request.time_zone_offset >= 0:
+            body['time_zone_offset'] = request.time_zone_offset
+        if request and request.participant_id:
+            body['participant'] = request.participant_id
+        if request and request.build_type == BUILD_SANDBOX:
+            body['build_type'] = 'sandbox'
+        if request and request.build_type == BUILD_STAGING:
+            body['build_type'] = 'staging'
+
+        # send any queued entity values to the previous conversation, or if
+        # there is none, hold them back until the new one has started
+        if self.__last_response is not None and self.__last_response.conversation_id:
+            self.flush()
+        queued, waiting = self.__take_queued_entities()
+
+        # calling start clears out any previous request/response state
+        self.__last_request = None
+        self.__last_response = None
+        if self.entity_cache is not None:
+            self.entity_cache.invalidate()
+
+        # send the request to the Web API
+        endpoint = self.__get_endpoint(add_id=False)
+        try:
+            response = self.__send_request(endpoint=endpoint, body=codec.encode(body), request=request,
+                                           timeout=timeout)
+        except Exception as e:
+            self.__entities_failed(waiting, e)
+            raise
+
+        if waiting:
+            if response.status.success:
+                with self.__batch_lock:
+                    self.__queued_entities[:0] = queued
+                    self.__queued_responses[:0] = waiting
+                self.flush()
+            else:
+                self.__entities_sent(None, response, waiting)
+        return response
+
+    def send_text(self, text, request=None, timeout=None):
+        """
+        Send user input text to the Web API and return the response.
+        """
+        body = { "text" : text }
+        endpoint = self.__get_endpoint(add_id=True)
+        return self.__send_request(endpoint=endpoint, body=codec.encode(body), request=request, timeout=timeout)
+
+    def send_intent(self, intent, entities=None, request=None, timeout=None):
+        """
+        Send an intent as user input to the Web API and return the response.
+        """
+        body = { "intent" : intent}
+
+        queued, waiting = self.__take_queued_entities()
+        if queued:
+            entities = queued + list(entities or [])
+        entities = self.__changed_entities(entities)
+
+        if entities is not None:
+            values = {}
+            for entity in entities:
+                values[entity.name] = entity.value
+            body["set_entities"] = values
+
+        endpoint = self.__get_endpoint(add_id=True)
+        try:
+            response = self.__send_request(endpoint=endpoint, body=codec.encode(body), request=request,
+                                           timeout=timeout)
+        except Exception as e:
+            self.__entities_failed(waiting, e)
+            raise
+
+        # the intent may trigger content that changes the values again
+        self.__entities_sent(entities, response, waiting, fresh=False)
+        return response
+
+    def send_activity(self, activity, request=None, timeout=None):
+        """
+        Send an activity name or ID to the Web API and return the response.
+        """
+        body = { "activity" : activity }
+        endpoint = self.__get_endpoint(add_id=True)
+        return self.__send_request(endpoint=endpoint, body=codec.encode(body), request=request, timeout=timeout)
+
+    def send_event(self, event, parameters={}, request=None, timeout=None):
+        """
+        Send a named event to the Web API and return the response.
+        """
+        ev = {}
+        ev['name'] = event
+        ev['parameters'] = parameters
+        body = {'event': ev}
+
+        # send any queued entity values along with the event
+        queued, waiting = self.__take_queued_entities()
+        entities = self.__changed_entities(queued) if queued else None
+        if entities:
+            body['set_entities'] = dict((entity.name, entity.value) for entity in entities)
+        
+        endpoint = self.__get_endpoint(add_id=True)
+        try:
+            response = self.__send_request(endpoint=endpoint, body=codec.encode(body), request=request,
+                                           timeout=timeout)
+        except Exception as e:
+            self.__entities_failed(waiting, e)
+            raise
+        self.__entities_sent(entities, response, waiting, fresh=False)
+        return response
+
+    def check_for_timed_responses(self, request=None, timeout=None):
+        """
+        Call the Web API to see if there is a time-based response to process.
+        You only need to call this if the previous response returned a value
+        for timed_response_interval >= 0. In which case, you should set a timer
+        for that number of seconds and then call this function.
+        This function will return None if there is no time-based response.
+        """
+        # nothing to do if no previous response, or it had no time based interval
+        if not self.__last_response or self.__last_response.timed_response_interval < 0:
+            return None
+
+        # send an empty body to trigger the Web API checking for a timed response
+        endpoint = self.__get_endpoint(add_id=True)
+        return self.__send_request(endpoint=endpoint, body="{}", request=request, timeout=timeout, hedge=True)
+
+    def goto(self, response_id, request=None, timeout=None):
+        """
+        Jump the conversation directly to the response with the specified GUID.
+        """
+        body = { "goto" : response_id }
+        endpoint = self.__get_endpoint(add_id=True)
+        return self.__send_request(endpoint=endpoint, body=codec.encode(body), request=request, timeout=timeout)
+
+    def get_entities(self, entities, request=None, refresh=False):
+        """
+        Request the value of the specified entities from the Web API.
+
+        If an entity_cache is set and all values are known, the response
+        is created locally without calling the Web API. Pass refresh=True
+        to always fetch the values from the Web API, discarding any local
+        changes to those entities that were not sent yet.
+        """
+        names = []
+        for entity in entities:
+            names.append(entity.name)
+
+        if self.entity_cache is not None:
+            if refresh:
+                self.entity_cache.invalidate(names)
+            elif all(self.entity_cache.is_fresh(name) for name in names):
+                return self.__cached_response([self.entity_cache.get(name) for name in names])
+
+        if self.coalesce:
+            return self.__get_entities_coalesced(names, request)
+        return self.__get_entities(names, request)
+
+    def set_entities(self, entities, request=None):
+        """
+        Change the value of the specified entities via the Web API.
+
+        If an entity_cache is set, only the values that have changed are
+        sent, along with any local changes made via the entity_cache. The
+        Web API is not called if there is nothing to send.
+
+        If coalesce is True, the values are queued and sent with the next
+        request, or by flush(). Until then, the status of the returned
+        Response is pending (see Status.pending), and it is filled in
+        once the values have been sent. Call its wait() method, with an
+        optional timeout in seconds, to wait for that from another thread;
+        it returns False if the timeout expired first. The queued values
+        are sent with the request settings of the call that sends them, so
+        passing a request here raises a ValueError; pass it to flush().
+        """
+        if self.coalesce:
+            if request is not None:
+                raise ValueError("set_entities() takes no request in coalesce mode, pass it to flush()")
+            response = _QueuedResponse()
+            with self.__batch_lock:
+                self.__queued_entities.extend(entities)
+                self.__queued_responses.append(response)
+            return response
+
+        entities = self.__changed_entities(entities)
+        if not entities and self.entity_cache is not None:
+            return self.__cached_response([])
+
+        values = {}
+        for entity in entities:
+            values[entity.name] = entity.value
+        body = { 'set_entities': values }
+        
+        endpoint = self.__get_endpoint(add_id=True)
+        response = self.__send_request(endpoint=endpoint, body=codec.encode(body), request=request, turn=False)
+
+        self.__entities_sent(entities, response)
+        return response
+
+    def get_entity_values(self, names, request=None, batch_size=bulk.ENTITY_BATCH_SIZE, max_parallel=4):
+        """
+        Request the values of many entities at once, given their names,
+        and return an EntityValues object with the value of each entity.
+        More than batch_size names are split into several requests, which
+        are sent in parallel. The entity_cache is not used.
+        """
+        names = list(names)
+        bodies = []
+        for start in range(0, len(names), batch_size):
+            bodies.append({ 'get_entities': names[start:start + batch_size] })
+
+        result = self.__send_entity_batches(bodies, request, max_parallel)
+        result.schema.learn(result.values)
+        return result
+
+    def set_entity_values(self, values, request=None, batch_size=bulk.ENTITY_BATCH_SIZE, max_parallel=4):
+        """
+        Change the values of many entities at once, given either a mapping
+        of names to values or a (names, values) tuple of sequences, and
+        return an EntityValues object with the resulting values. Raises a
+        TypeError if a value has a different type than the entity_schema
+        expects. More than batch_size values are split into several
+        requests, which are sent in parallel. Cached values of these
+        entities are discarded from the entity_cache.
+        """
+        names, values = bulk.to_columns(values)
+        self.__get_entity_schema().check(names, values)
+        if self.entity_cache is not None:
+            self.entity_cache.invalidate(names)
+
+        bodies = []
+        for start in range(0, len(names), batch_size):
+            end = start + batch_size
+            bodies.append({ 'set_entities': dict(zip(names[start:end], values[start:end])) })
+
+        return self.__send_entity_batches(bodies, request, max_parallel)
+
+    def flush(self, request=None):
+        """
+        Send any entity values queued by set_entities() in coalesce mode.
+        Returns the response, or None if there was nothing to send.
+        """
+        queued, waiting = self.__take_queued_entities()
+        if not waiting:
+            return None
+
+        entities = self.__changed_entities(queued)
+        if entities:
+            values = dict((entity.name, entity.value) for entity in entities)
+            endpoint = self.__get_endpoint(add_id=True)
+            try:
+                response = self.__send_request(endpoint=endpoint, body=codec.encode({ 'set_entities': values }),
+                                               request=request, turn=False)
+            except Exception as e:
+                self.__entities_failed(waiting, e)
+                raise
+        else:
+            response = self.__cached_response([])
+
+        self.__entities_sent(entities, response, waiting)
+        return response
+
+    def send_audio(self, bytes, format=FORMAT_RAW_PCM_16K, request=None, timeout=None):
+        """
+        Send an entire audio sample of the user speaking to the Web
+        API.  The default format of the audio (FORMAT_RAW_PCM_16K)
+        must be mono 16-bit LinearPCM audio data at a sample rate of
+        16000 samples per second. Alternatively, you can provide a WAV
+        file with mono 16-bit LinearPCM audio at 16000 sample rate.
+        """
+        # strip the WAV header if given a WAV file
+        if format == FORMAT_WAV_16K:
+            bytes = self.strip_wav_header(bytes)
+
+        if bytes is None:
+            return None
+
+        self.start_audio(request, timeout)
+        self.add_audio(bytes)
+        return self.end_audio()
+
+    def start_audio(self, request=None, timeout=None):
+        """
+        Initiate a progressive (chunked) streaming of audio data.
+
+        Each piece of audio passed to add_audio() is sent as its own
+        chunk. Set audio_chunk_size to a number of bytes, e.g.,
+        AUDIO_CHUNK_SIZE, to collect the audio into chunks of that size
+        instead, or send it after audio_flush_interval seconds, with a
+        ChunkWriter. The metrics of all audio streamed through a
+        ChunkWriter by this conversation are collected in audio_stats.
+        """
+        headers = dict(self.config.headers)
+        headers["Content-Type"] = "audio/l16; rate=16000"
+        headers["Accept"] = "application/json"
+        headers["Transfer-Encoding"] = "chunked"
+
+        endpoint = self.__get_endpoint(add_id=True)
+
+        self.__http_start(endpoint, {}, headers, request, timeout=timeout)
+        if self.__exchange.chunked and self.audio_chunk_size:
+            self.__exchange = audio.ChunkWriter(self.__exchange, self.audio_chunk_size, self.audio_flush_interval,
+                                                stats=self.audio_stats)
+        self.__audio_exchange = self.__exchange
+
+    def add_audio(self, bytes):
+        """
+        Add a chunk of audio. You must call start_audio() first.  The
+        format of the audio must be mono 16-bit LinearPCM audio data
+        at a sample rate of 16000 samples per second.
+        """
+        self.__http_add(bytes)
+
+    def end_audio(self):
+        """
+        Signal that all audio has been provided via add_audio() calls.
+        This will complete the audio request and return the Web API response.
+        """
+        try:
+            if self.profiler is not None:
+                return self.profiler.run(self.__http_end)
+            return self.__http_end()
+        finally:
+            self.__audio_exchange = None
+
+    def cancel_audio(self):
+        """
+        Abandon the audio request started by start_audio(), e.g., when
+        the user stops talking to the app. The upload is cut off, so the
+        Web API ignores it. This may be called from another thread while
+        end_audio() waits for the response. Any later add_audio() or
+        end_audio() call for the request, or a pending end_audio(), raises
+        RequestCancelled. Once end_audio() has returned, there is nothing
+        left to cancel.
+        """
+        cancel = getattr(self.__audio_exchange, "cancel", None)
+        if cancel is not None:
+            cancel()
+
+    def stream(self, send, *args, **kwargs):
+        """
+        Call one of the send_XXX() functions of this conversation, e.g.,
+        conv.stream(conv.send_text, "hello"), and yield each DialogOutput
+        or BehaviorOutput as soon as it has been received, followed by the
+        complete Response once the whole response body has been read.
+
+        This lets clients start speaking the first line of dialog before
+        a long response has finished downloading.
+        """
+        items = queue.Queue()
+
+        def run():
+            self.__stream.sink = items.put
+            try:
+                items.put(_StreamResult(send(*args, **kwargs)))
+            except Exception as e:
+                items.put(_StreamResult(error=e))
+            finally:
+                self.__stream.sink = None
+
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+
+        while True:
+            item = items.get()
+            if not isinstance(item, _StreamResult):
+                yield item
+                continue
+            thread.join()
+            if item.error is not None:
+                raise item.error
+            if item.response is not None:
+                yield item.response
+            return
+
+    def get_conversation_id(self):
+        """
+        Return the current conversation ID for clients to persist across sessions if desired.
+        """
+        return self.__last_response.conversation_id if self.__last_response else ""
+
+    def get_participant_id(self):
+        """
+        Return the current participant ID for clients to persist across sessions if desired.
+        """
+        return self.__last_response.participant_id if self.__last_response else ""
+
+    def get_state(self):
+        """
+        Return the state needed to continue this conversation elsewhere,
+        e.g., in another process, as a dict of JSON-serializable values:
+        the conversation and participant IDs and the last Request settings.
+        Note that the Request settings include the API key.
+        """
+        response = self.__last_response
+        request = self.__last_request or Request()
+        return {
+            'conversation_id': response.conversation_id if response else "",
+            'participant_id': response.participant_id if response else "",
+            'last_modified': response.last_modified if response else "",
+            'etag': response.etag if response else "",
+            'request': dict(request.__dict__),
+        }
+
+    def restore_state(self, state):
+        """
+        Continue a conversation from the state returned by get_state(),
+        without sending a request to the Web API.
+        """
+        self.flush()
+
+        request = Request()
+        for attribute, value in state.get('request', {}).items():
+            if hasattr(request, attribute):
+                setattr(request, attribute, value)
+
+        response = Response()
+        response.conversation_id = state.get('conversation_id', "")
+        response.participant_id = state.get('participant_id', "")
+        response.last_modified = state.get('last_modified', "")
+        response.etag = state.get('etag', "")
+
+        self.__last_request = request
+        self.__last_response = response if response.conversation_id else None
+        if self.entity_cache is not None:
+            self.entity_cache.invalidate()
+
+    def __get_endpoint(self, add_id=False):
+        """
+        Return either the 'conversation' or 'conversation/<UUID>' endpoint name.
+        """
+        endpoint = 'conversation'
+        if add_id and self.__last_response and self.__last_response.conversation_id:
+            endpoint += '/' + self.__last_response.conversation_id
+        return endpoint
+
+    def strip_wav_header(self, bytes):
+        """
+        Read a WAV header, check it's valid, and return the data section.
+        """
+        try:
+            return audio.strip_wav_header(bytes)
+        except ValueError as e:
+            return self.__error(str(e))
+
+    def __error(self, msg):
+        """
+        Output an error message.
+        """
+        sys.stderr.write(msg + "\n")
+        sys.stderr.flush()
+        return None
+
+    def __get_request(self, new_request, old_request):
+        """
+        Create a request that has all of the set fields from new_request,
+        and where not set it uses the value of the field from old_request.
+        That is, use the previous request settings but let the client
+        override those on a per-request basis.
+        """
+        # handle no new or old request
+        r = Request()
+        if old_request is None:
+            old_request = Request()
+        if new_request is None:
+            new_request = old_request
+
+        # prefer the value from the new request, otherwise use the old request value
+        for attribute in r.__dict__.keys():
+            new_value = getattr(new_request, attribute)
+            old_value = getattr(old_request, attribute)
+            setattr(r, attribute, new_value if new_value else old_value)
+
+        return r
+
+    def __json_to_response(self, data, outputs=None):
+        """
+        Convert JSON that conforms to PullString's Web API spec into a Response object.
+        """
+        return codec.json_to_response(data, outputs, self.response_pool)
+
+    def __cached_response(self, entities):
+        """
+        Create a Response for the current conversation without calling the Web API.
+        """
+        response = Response()
+        response.entities = entities
+        if self.__last_response:
+            response.conversation_id = self.__last_response.conversation_id
+            response.participant_id = self.__last_response.participant_id
+            response.last_modified = self.__last_response.last_modified
+            response.etag = self.__last_response.etag
+        return response
+
+    def __get_entities(self, names, request):
+        """
+        Request the value of the named entities from the Web API.
+        """
+        body = { 'get_entities': names }
+
+        endpoint = self.__get_endpoint(add_id=True)
+        return self.__send_request(endpoint=endpoint, body=codec.encode(body), request=request, turn=False,
+                                   hedge=True)
+
+    def __get_entities_coalesced(self, names, request):
+        """
+        Request the value of the named entities, sharing a request with
+        other threads: if the names are already being requested, wait for
+        that response, otherwise add them to the next batch of names. The
+        first thread to add to a batch sends it once any current request
+        has completed, after any queued entity values.
+        """
+        with self.__batch_lock:
+            batch = None
+            # a request already sent may predate queued values for the names
+            queued = set(entity.name for entity in self.__queued_entities)
+            for sent in self.__sent_batches:
+                if sent.request is request and sent.names.issuperset(names) and queued.isdisjoint(names):
+                    batch = sent
+            leader = False
+            if batch is None:
+                batch = self.__open_batch
+                if batch is None or batch.request is not request:
+                    batch = _EntityBatch(request)
+                    self.__open_batch = batch
+                    leader = True
+                batch.names.update(names)
+
+        if leader:
+            with self.__lock:
+                with self.__batch_lock:
+                    if self.__open_batch is batch:
+                        self.__open_batch = None
+                    self.__sent_batches.append(batch)
+                try:
+                    batch.response = self.__get_entities(sorted(batch.names), request)
+                except Exception as e:
+                    batch.error = e
+                finally:
+                    with self.__batch_lock:
+                        self.__sent_batches.remove(batch)
+                    batch.done.set()
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+        return batch.response_for(names)
+
+    def __get_entity_schema(self):
+        if self.entity_schema is None:
+            self.entity_schema = bulk.EntitySchema()
+        return self.entity_schema
+
+    def __send_entity_batches(self, bodies, request, max_parallel):
+        """
+        Send the bodies of several entity requests in parallel, and merge
+        the entity values and the first error of their responses.
+        """
+        # entity values queued in coalesce mode must be sent first
+        if self.__queued_entities:
+            self.flush()
+
+        # the workers share these settings, rather than read the conversation state
+        with self.__lock:
+            endpoint = self.__get_endpoint(add_id=True)
+            settings = self.__resolve_request(endpoint, {}, None, request)
+            self.__last_request = settings[0]
+
+        if len(bodies) <= 1 or max_parallel <= 1:
+            results = [self.__send_entity_batch(settings, body) for body in bodies]
+        else:
+            from concurrent.futures import ThreadPoolExecutor
+
+            with ThreadPoolExecutor(max_workers=min(max_parallel, len(bodies))) as executor:
+                results = list(executor.map(lambda body: self.__send_entity_batch(settings, body), bodies))
+
+        result = bulk.EntityValues(schema=self.__get_entity_schema())
+        for status, content in results:
+            if not status.success and result.status.success:
+                result.status = status
+            result.values.update(content.get('entities', {}))
+        return result
+
+    def __send_entity_batch(self, settings, body):
+        """
+        Send one entity request on its own exchange, so that several can
+        be in flight at once, and return its Status and JSON content.
+        """
+        data = codec.encode(body).encode('utf-8')
+        try:
+            exchange = self.__open_resolved(settings)
+            self.__debug("BODY %s" % data)
+            exchange.send(data)
+            return self.__parse_result(exchange.finish())
+        except DeadlineExceeded:
+            return Status(STATUS_DEADLINE_EXCEEDED, DEADLINE_EXCEEDED), {}
+
+    def __take_queued_entities(self):
+        """
+        Return a tuple of the entities queued by set_entities() in coalesce
+        mode and the responses waiting for them, and clear the queue.
+        """
+        with self.__batch_lock:
+            queued, waiting = self.__queued_entities, self.__queued_responses
+            self.__queued_entities = []
+            self.__queued_responses = []
+        return queued, waiting
+
+    def __changed_entities(self, entities):
+        """
+        Return the entities to send to the Web API. With an entity_cache,
+        that is only the values that have changed, including local changes.
+        """
+        if self.entity_cache is None:
+            return entities
+        for entity in entities or []:
+            self.entity_cache.set(entity)
+        return self.entity_cache.dirty or (None if entities is None else [])
+
+    def __entities_sent(self, entities, response, waiting=(), fresh=True):
+        """
+        Update the entity_cache and any responses waiting for queued
+        entity values after a request that set entities.
+        """
+        if self.entity_cache is not None and entities and response.status.success:
+            self.entity_cache.mark_sent(entities, fresh=fresh)
+        # each waiting response gets copies, since the response may be
+        # released to a ResponsePool while they are still in use
+        for queued_response in waiting:
+            queued_response.status = Status(response.status.status_code, response.status.error_message)
+            queued_response.entities = [copy.copy(entity) for entity in response.entities]
+            queued_response.conversation_id = response.conversation_id
+            queued_response.participant_id = response.participant_id
+            queued_response.last_modified = response.last_modified
+            queued_response.etag = response.etag
+            queued_response.done.set()
+
+    def __entities_failed(self, waiting, error):
+        """
+        Complete the responses waiting for queued entity values after the
+        request that was to send them raised an error, with a status code
+        of 0, since there was no HTTP response.
+        """
+        for queued_response in waiting:
+            queued_response.status = Status(0, str(error) or error.__class__.__name__)
+            queued_response.done.set()
+
+    def __debug(self, msg):
+        if self.debug_mode:
+            print("DEBUG: %s" % msg)
+            
+    def __send_request(self, endpoint, query_params={}, body="", headers=None, request=None, turn=True,
+                       timeout=None, hedge=False):
+        """
+        Send a request to PullString's Web API and return a Response object.
+        A read-only request may be hedged, if a hedger is set.
+        """
+        if self.profiler is not None:
+            return self.profiler.run(self.__send_unprofiled, endpoint, query_params, body, headers, request,
+                                     turn, timeout, hedge)
+        return self.__send_unprofiled(endpoint, query_params, body, headers, request, turn, timeout, hedge)
+
+    def __send_unprofiled(self, endpoint, query_params, body, headers, request, turn, timeout, hedge):
+        # entity values queued in coalesce mode must be sent first
+        if self.__queued_entities:
+            self.flush()
+
+        with self.__lock:
+            self.__http_start(endpoint, query_params, headers, request, turn, timeout, hedge)
+            self.__http_add(body)
+            return self.__http_end()
+
+    def __http_start(self, endpoint, query_params, headers, request, turn=True, timeout=None, hedge=False):
+        """
+        Open an HTTPS request to the Web API. A turn is any request that
+        may change the conversation state, i.e., other than get/set entities.
+        """
+        try:
+            self.__exchange = self.__open_exchange(endpoint, query_params, headers, request, timeout, hedge)
+        except DeadlineExceeded as e:
+            self.__exchange = _ExpiredExchange(e)
+        self.__turn = turn
+
+    def __open_exchange(self, endpoint, query_params, headers, request, timeout=None, hedge=False):
+        """
+        Open a POST request to the Web API with the settings of the request
+        and return the exchange, which is used to send the body. Raises
+        DeadlineExceeded if the timeout expires first.
+        """
+        settings = self.__resolve_request(endpoint, query_params, headers, request, timeout)
+
+        # save the last request to remember settings
+        self.__last_request = settings[0]
+
+        return self.__open_resolved(settings, hedge)
+
+    def __resolve_request(self, endpoint, query_params, headers, request, timeout=None):
+        """
+        Return a (request, url, query_params, headers, timeout) tuple with
+        all of the settings for a POST request to the Web API.
+        """
+        # get all of the request settings for this call
+        request = self.__get_request(request, self.__last_request)
+        query_params = dict(query_params)
+        timeout = timeout or request.timeout or self.config.timeout
+
+        # fill in some default values for most requests
+        if headers is None:
+            headers = dict(self.config.headers)
+            headers["Content-Type"] = "application/json"
+            headers["Accept"] = "application/json"
+
+        headers['Authorization'] = "Bearer " + request.api_key
+
+        # only set restart_if_modified or if_modified if value is not default
+        # the legacy behavior of restart_if_modified takes precedence
+        if not request.restart_if_modified:
+            query_params['restart_if_modified'] = "false"
+        elif request.if_modified is not IF_MODIFIED_NOTHING:
+            query_params['if_modified'] = request.if_modified
+
+        if request.language:
+            query_params['language'] = request.language
+        else:
+            query_params['language'] = "en-US"
+
+        if request.locale:
+            query_params['locale'] = request.locale
+
+        url = posixpath.join(self.config.base_url, endpoint)
+        return request, url, query_params, headers, timeout
+
+    def __open_resolved(self, settings, hedge=False):
+        """
+        Open a POST request with the settings from __resolve_request(). This
+        does not touch the conversation state, so it may run on any thread.
+        """
+        request, url, query_params, headers, timeout = settings
+        deadline = _clock() + timeout if timeout else None
+
+        # wait until the request rate for the API key allows this request
+        if self.rate_limiter is not None:
+            wait = max(0.0, deadline - _clock()) if deadline is not None else None
+            if not self.rate_limiter.acquire(request.api_key, owner=self, timeout=wait):
+                raise DeadlineExceeded("Deadline exceeded waiting for the rate limiter")
+
+        # open a POST request with all the query params and headers
+        exchange = self.__open_transport(url, query_params, headers, deadline)
+        if hedge and self.hedger is not None:
+            def open_hedge():
+                # the hedge is skipped rather than wait for the rate limiter
+                if self.rate_limiter is not None and \
+                        not self.rate_limiter.acquire(request.api_key, owner=self, blocking=False):
+                    return None
+                return self.__open_transport(url, query_params, headers, deadline)
+            exchange = hedging.HedgedExchange(self.hedger, exchange, open_hedge)
+
+        self.__debug("POST %s" % exchange.url)
+        self.__debug("HEADERS %s" % headers)
+        return exchange
+
+    def __open_transport(self, url, query_params, headers, deadline):
+        """
+        Open an exchange with the transport, passing the deadline if any.
+        """
+        if deadline is None:
+            return self.transport.open(url, query_params, headers)
+        return self.transport.open(url, query_params, headers, deadline=deadline)
+
+    def __http_add(self, data):
+        """
+        Output data to the body of the HTTPS request.
+        """
+        
+        if isinstance(data, type(u"")):
+            data = data.encode('utf-8')
+
+        if data and not self.__exchange.chunked:
+            self.__debug("BODY %s" % data)
+
+        try:
+            self.__exchange.send(data)
+        except DeadlineExceeded as e:
+            self.__exchange = _ExpiredExchange(e)
+
+    def __http_end(self):
+        """
+        Close the HTTPS connection and parse the JSON response.
+        """
+
+        # get the response code and content, decoding outputs as they arrive for stream()
+        sink = getattr(self.__stream, "sink", None)
+        decoder = None
+        try:
+            if sink is None:
+                http_response = self.__exchange.finish()
+            else:
+                decoder = codec.OutputStreamDecoder()
+                def on_data(data):
+                    for output in decoder.feed(data):
+                        sink(output)
+                http_response = self.__exchange.finish(on_data)
+        except DeadlineExceeded as e:
+            self.__debug(str(e))
+            response = self.__json_to_response({})
+            response.status.status_code = STATUS_DEADLINE_EXCEEDED
+            response.status.error_message = DEADLINE_EXCEEDED
+            return response
+        status, content = self.__parse_result(http_response)
+
+        # convert the JSON response body to our Response object
+        outputs = decoder.outputs if decoder is not None and content else None
+        response = self.__json_to_response(content, outputs)
+        if self.response_pool is not None:
+            # keep the Status object that belongs to the pooled response
+            response.status.status_code = status.status_code
+            response.status.error_message = status.error_message
+        else:
+            response.status = status
+
+        # start downloading any audio assets as early as possible
+        if self.audio_prefetcher is not None:
+            self.audio_prefetcher.prefetch(response)
+
+        # remember the entity values, which may have changed during a turn
+        if self.entity_cache is not None and status.success:
+            if self.__turn:
+                self.entity_cache.expire()
+            self.entity_cache.update(response.entities)
+
+        # save the last response to remember settings, but only keep a copy
+        # of the settings of a pooled response, which the caller will release
+        if self.response_pool is not None:
+            self.__last_response = self.__copy_settings(response)
+        else:
+            self.__last_response = response
+
+        return response
+
+    def __parse_result(self, http_response):
+        """
+        Return the Status and the decoded JSON content of an HttpResult.
+        """
+        content = http_response.body
+
+        self.__debug("RESPONSE %s" % http_response.status)
+        self.__debug("CONTENT %s" % content)
+
+        # create a Status() object to describe the HTTP success/error
+        status = Status(http_response.status)
+        if status.status_code >= 300:
+            status.error_message = http_response.reason
+
+        # try to parse the server result as a JSON response
+        try:
+            content = codec.decode(content)
+
+            # parse out errors reported back in the JSON
+            error = content.get('error')
+            if error:
+                status.error_message = error.get('message', status.error_message)
+                status.status_code = error.get('status', status.status_code)
+                content = {}
+
+        except Exception as e:
+            self.__error("Failed to parse JSON response: %s" % content)
+            if isinstance(content, bytes):
+                content = content.decode("utf-8", "replace")
+            status.error_message = content.strip() or "Failed to parse JSON response"
+            content = {}
+
+        return status, content
+
+    def __copy_settings(self, response):
+        """
+        Copy the conversation settings of a response to a Response that
+        belongs to this conversation, which is reused for every copy.
+        """
+        if self.__settings is None:
+            self.__settings = Response()
+        settings = self.__settings
+        settings.conversation_id = response.conversation_id
+        settings.participant_id = response.participant_id
+        settings.last_modified = response.last_modified
+        settings.etag = response.etag
+        settings.timed_response_interval = response.timed_response_interval
+        return settings
+
+class _QueuedResponse(Response):
+    """
+    The response to entity values queued by set_entities() in coalesce
+    mode, which is filled in once the values have been sent.
+    """
+    def __init__(self):
+        Response.__init__(self)
+        self.status = Status(STATUS_PENDING, PENDING)
+        self.done = threading.Event()
+
+    def wait(self, timeout=None):
+        """
+        Wait until the queued values have been sent, and return True, or
+        False if the timeout in seconds expired first.
+        """
+        return self.done.wait(timeout)
+
+class _EntityBatch(object):
+    """
+    A set of entity names requested by one or more threads in coalesce mode.
+    """
+    def __init__(self, request):
+        self.request = request
+        self.names = set()
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+    def response_for(self, names):
+        """
+        Return a copy of the batch response with only the named entities.
+        """
+        response = Response()
+        response.status = Status(self.response.status.status_code, self.response.status.error_message)
+        response.entities = [copy.copy(entity) for entity in self.response.entities if entity.name in names]
+        response.conversation_id = self.response.conversation_id
+        response.participant_id = self.response.participant_id
+        response.last_modified = self.response.last_modified
+        response.etag = self.response.etag
+        return response
+
+class _ExpiredExchange(object):
+    """
+    Stand in for an exchange that ran out of time before it was finished,
+    so that the error is reported when the response is requested.
+    """
+    chunked = False
+
+    def __init__(self, error):
+        self.error = error
+
+    def send(self, data):
+        pass
+
+    def finish(self, on_data=None):
+        raise self.error
+
+class _StreamResult(object):
+    """
+    The final response, or the error, of a request made by stream().
+    """
+    def __init__(self, response=None, error=None):
+        self.response = response
+        self.error = error
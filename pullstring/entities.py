@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+#
+# A client-side cache of entity values.
+#
+# Copyright (c) 2016 PullString, Inc.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+"""
+Client-side entity state for a Conversation.
+"""
+
+import copy
+
+
+class EntityCache(object):
+    """
+    A client-side cache of entity values for a single Conversation.
+
+    Values returned by the Web API are remembered and considered fresh
+    until the next conversational turn, which may change them on the
+    server. Values changed locally via set() are marked dirty and are
+    sent with the next set_entities() or send_intent() call.
+    """
+    def __init__(self):
+        self.__values = {}
+        self.__fresh = set()
+        self.__changes = {}
+
+    def get(self, name):
+        """
+        Return a copy of the entity with the given name, or None if it is
+        unknown. Local changes that were not sent yet take precedence.
+        """
+        entity = self.__changes.get(name, self.__values.get(name))
+        return copy.copy(entity) if entity is not None else None
+
+    def set(self, entity):
+        """
+        Change the local value of an entity. The entity is marked dirty
+        unless it matches the fresh value last seen from the Web API.
+        """
+        if self.__is_current(entity):
+            self.__changes.pop(entity.name, None)
+        else:
+            self.__changes[entity.name] = copy.copy(entity)
+
+    def is_fresh(self, name):
+        """
+        Return True if the value for the entity is known without asking the Web API.
+        """
+        return name in self.__fresh or name in self.__changes
+
+    def is_dirty(self, name):
+        """
+        Return True if the entity has a local change that was not sent yet.
+        """
+        return name in self.__changes
+
+    @property
+    def dirty(self):
+        """
+        Return the list of entities with local changes that were not sent yet.
+        """
+        return [self.get(name) for name in sorted(self.__changes.keys())]
+
+    def update(self, entities):
+        """
+        Remember the entity values returned by the Web API.
+        """
+        for entity in entities:
+            self.__values[entity.name] = copy.copy(entity)
+            self.__fresh.add(entity.name)
+
+    def mark_sent(self, entities, fresh=True):
+        """
+        Record that the given entity values were accepted by the Web API.
+        """
+        for entity in entities:
+            if self.__changes.get(entity.name) is not None and \
+               self.__changes[entity.name].value == entity.value:
+                del self.__changes[entity.name]
+            self.__values[entity.name] = copy.copy(entity)
+            if fresh:
+                self.__fresh.add(entity.name)
+            else:
+                self.__fresh.discard(entity.name)
+
+    def expire(self):
+        """
+        Mark all cached values as stale, e.g., after a conversational turn.
+        """
+        self.__fresh.clear()
+
+    def invalidate(self, names=None):
+        """
+        Forget the cached values and any unsent local changes for the
+        given entity names, or for all entities if no names are given.
+        """
+        if names is None:
+            self.__values.clear()
+            self.__fresh.clear()
+            self.__changes.clear()
+            return
+        for name in names:
+            self.__values.pop(name, None)
+            self.__fresh.discard(name)
+            self.__changes.pop(name, None)
+
+    def __is_current(self, entity):
+        """
+        Return True if the entity matches the fresh value from the Web API.
+        """
+        current = self.__values.get(entity.name)
+        return entity.name in self.__fresh and current is not None and \
+            current.type == entity.type and current.value == entity.value
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+#
+# Hedge slow read-only requests with a duplicate on another connection.
+#
+# Copyright (c) 2016 PullString, Inc.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+"""
+Request hedging, to cut the tail latency of read-only Web API calls.
+"""
+
+import sys
+import threading
+import collections
+
+from ._compat import clock as _clock
+
+if sys.version_info >= (3, 0):
+    import queue
+else:
+    import Queue as queue
+
+
+class RequestHedger(object):
+    """
+    Decide when to send a second copy of a read-only request that is
+    slow to respond, i.e., get_entities() or check_for_timed_responses().
+
+    The hedge is sent once the request has taken longer than the given
+    percentile of recent latencies, so with the default of 95, about one
+    request in twenty is hedged. Until min_samples latencies have been
+    seen, initial_delay is used instead. The delay is never shorter than
+    min_delay.
+
+    The extra load is capped by the budget: each request earns budget
+    hedges, e.g., 0.05 allows at most one hedge per twenty requests on
+    average, with bursts of up to max_burst hedges. A hedger can be shared
+    by all of the conversations that talk to the same servers.
+    """
+    def __init__(self, percentile=95.0, budget=0.05, initial_delay=0.1, min_delay=0.005,
+                 window=1000, min_samples=20, max_burst=10):
+        self.percentile = percentile
+        self.budget = budget
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.max_burst = max_burst
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.__latencies = collections.deque(maxlen=window)
+        self.__delay = None
+        self.__tokens = float(max_burst)
+        self.__lock = threading.Lock()
+
+    def delay(self):
+        """
+        Return the number of seconds to wait before sending a hedge.
+        """
+        with self.__lock:
+            if self.__delay is None:
+                if len(self.__latencies) < self.min_samples:
+                    self.__delay = self.initial_delay
+                else:
+                    latencies = sorted(self.__latencies)
+                    index = int(len(latencies) * self.percentile / 100.0)
+                    self.__delay = latencies[min(index, len(latencies) - 1)]
+            return max(self.min_delay, self.__delay)
+
+    def record(self, seconds, hedge_won=False):
+        """
+        Record the latency of a completed request, and earn hedging budget.
+        """
+        with self.__lock:
+            self.requests += 1
+            if hedge_won:
+                self.hedge_wins += 1
+            self.__tokens = min(self.max_burst, self.__tokens + self.budget)
+            self.__latencies.append(seconds)
+
+            # sorting the window is not free, so only do it every few requests
+            if self.requests % 16 == 0 or len(self.__latencies) <= self.min_samples:
+                self.__delay = None
+
+    def allow(self):
+        """
+        Return True, and spend the budget for one hedge, if it allows one.
+        """
+        with self.__lock:
+            if self.__tokens < 1.0:
+                return False
+            self.__tokens -= 1.0
+            self.hedged += 1
+            return True
+
+class HedgedExchange(object):
+    """
+    Send a request with one exchange, and if it has not been answered
+    after the delay chosen by the hedger, send it again with a second
+    exchange from open_hedge(), which may return None to skip the hedge.
+    The first answer is returned and the other exchange is cancelled.
+    """
+    def __init__(self, hedger, exchange, open_hedge):
+        self.url = exchange.url
+        self.chunked = exchange.chunked
+        self.hedger = hedger
+        self.__exchange = exchange
+        self.__open_hedge = open_hedge
+        self.__body = []
+
+    def send(self, data):
+        if self.chunked:
+            self.__exchange.send(data)
+        elif data:
+            self.__body.append(data)
+
+    def finish(self, on_data=None):
+        """
+        Return the HttpResult of whichever exchange answers first. Streamed
+        requests, and those with a callback for each block, are not hedged,
+        since their data cannot be sent or delivered twice.
+        """
+        body = b"".join(self.__body)
+        if self.chunked or on_data is not None:
+            if body:
+                self.__exchange.send(body)
+            return self.__exchange.finish(on_data)
+
+        start = _clock()
+        results = queue.Queue()
+        self.__run(self.__exchange, body, results)
+        try:
+            exchange, result, error = results.get(timeout=self.hedger.delay())
+            self.hedger.record(_clock() - start)
+            return self.__result(result, error)
+        except queue.Empty:
+            pass
+
+        hedge = None
+        if self.hedger.allow():
+            try:
+                hedge = self.__open_hedge()
+            except Exception:
+                hedge = None
+        if hedge is not None:
+            self.__run(hedge, body, results)
+
+        # take the first success, or the last error if both fail
+        pending = 2 if hedge is not None else 1
+        while True:
+            exchange, result, error = results.get()
+            pending -= 1
+            if error is None or not pending:
+                break
+
+        for other in (self.__exchange, hedge):
+            if other is not None and other is not exchange:
+                cancel = getattr(other, "cancel", None)
+                if cancel is not None:
+                    cancel()
+        self.hedger.record(_clock() - start, hedge_won=exchange is hedge)
+        return self.__result(result, error)
+
+    def __run(self, exchange, body, results):
+        """
+        Send the body and wait for the response on a background thread.
+        """
+        def run():
+            try:
+                if body:
+                    exchange.send(body)
+                results.put((exchange, exchange.finish(), None))
+            except Exception as e:
+                results.put((exchange, None, e))
+
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+
+    def __result(self, result, error):
+        if error is not None:
+            raise error
+        return result
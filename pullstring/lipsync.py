@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+#
+# Phoneme timelines to drive lip sync playback of dialog audio.
+#
+# Copyright (c) 2016 PullString, Inc.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+"""
+Precomputed phoneme timelines for DialogOutput objects.
+"""
+
+import sys
+import array
+import bisect
+
+
+class PhonemeTimeline(object):
+    """
+    A precomputed timeline of the phonemes for a dialog output, e.g., to
+    drive lip sync playback.
+
+    The phoneme start times are stored in a sorted array, and each phoneme
+    is mapped once to an interned viseme name using the optional visemes
+    dict (by default, the viseme is the phoneme name). Use viseme_at() for
+    random access, a cursor() for monotonic playback time, or sample() to
+    compute all frames at a fixed frame rate.
+    """
+    def __init__(self, phonemes, duration=0.0, visemes=None):
+        try:
+            intern_string = sys.intern  # Python3
+        except AttributeError:
+            intern_string = intern      # Python2
+
+        visemes = visemes or {}
+        ordered = sorted(phonemes, key=lambda phoneme: phoneme.seconds_since_start)
+
+        self.visemes = []
+        self.times = array.array('d')
+        self.indexes = array.array('H')
+        viseme_index = {}
+        for phoneme in ordered:
+            viseme = intern_string(str(visemes.get(phoneme.name, phoneme.name)))
+            if viseme not in viseme_index:
+                viseme_index[viseme] = len(self.visemes)
+                self.visemes.append(viseme)
+            self.times.append(phoneme.seconds_since_start)
+            self.indexes.append(viseme_index[viseme])
+
+        self.duration = max(duration, self.times[-1] if self.times else 0.0)
+
+    def __len__(self):
+        return len(self.times)
+
+    def index_at(self, seconds):
+        """
+        Return the index of the phoneme active at the given time, or -1 if
+        the time is before the first phoneme.
+        """
+        return bisect.bisect_right(self.times, seconds) - 1
+
+    def viseme_at(self, seconds):
+        """
+        Return the viseme active at the given time, or None before the first phoneme.
+        """
+        index = self.index_at(seconds)
+        return self.visemes[self.indexes[index]] if index >= 0 else None
+
+    def cursor(self):
+        """
+        Return a PhonemeCursor to look up visemes for a monotonic playback time.
+        """
+        return PhonemeCursor(self)
+
+    def sample(self, fps, start=0.0, end=None):
+        """
+        Return the list of visemes for each frame from start to end (the
+        duration by default) at the given frame rate. Frames before the
+        first phoneme are None.
+        """
+        if end is None:
+            end = self.duration
+        num_frames = int((end - start) * fps) + 1 if end >= start else 0
+
+        frames = []
+        index = self.index_at(start)
+        count = len(self.times)
+        for frame in range(num_frames):
+            seconds = start + float(frame) / fps
+            while index + 1 < count and self.times[index + 1] <= seconds:
+                index += 1
+            frames.append(self.visemes[self.indexes[index]] if index >= 0 else None)
+        return frames
+
+class PhonemeCursor(object):
+    """
+    Track the active viseme in a PhonemeTimeline for a playback time that
+    usually moves forward. Each lookup is amortised O(1) during playback,
+    and falls back to a binary search when seeking backwards.
+    """
+    def __init__(self, timeline):
+        self.timeline = timeline
+        self.index = -1
+
+    def seek(self, seconds):
+        """
+        Move the cursor to the given playback time and return the active
+        viseme, or None before the first phoneme.
+        """
+        times = self.timeline.times
+        index = self.index
+        if index >= 0 and times[index] > seconds:
+            index = self.timeline.index_at(seconds)
+        else:
+            count = len(times)
+            while index + 1 < count and times[index + 1] <= seconds:
+                index += 1
+        self.index = index
+        return self.timeline.visemes[self.timeline.indexes[index]] if index >= 0 else None
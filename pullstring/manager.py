@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+#
+# Route participants to live conversations across worker processes.
+#
+# Copyright (c) 2016 PullString, Inc.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+"""
+A sharded, size-bounded set of live Conversation objects.
+"""
+
+import time
+import zlib
+import threading
+import collections
+
+from . import codec
+from .conversation import Conversation
+
+
+class ConversationManager(object):
+    """
+    Keep live Conversation objects for many participants, sharded by
+    participant ID so that the work can be spread over many processes.
+
+    Each participant ID hashes to one of shard_count shards, with the
+    same result in every process; use shard_for() to route a participant
+    to the process that serves their shard, and pass the shards that a
+    process serves as shards (all of them by default).
+
+    Each shard keeps up to max_per_shard live conversations, and
+    conversations that have not been used for idle_timeout seconds are
+    evicted. The state of an evicted conversation is saved to the store,
+    a mapping from participant ID to a JSON string, e.g., a dict or a
+    dbm database, and restored the next time that participant is seen.
+    Only live conversations are kept in memory, so a persistent store
+    keeps memory bounded for any number of participants. Without one,
+    the states are kept in memory for up to max_stored participants,
+    and the least recently saved are forgotten beyond that.
+
+    Errors while saving an evicted conversation, e.g., from sending its
+    queued entity values or from the store, do not stop the others from
+    being saved; they are counted in save_errors, and the latest is kept
+    in last_error as a (participant_id, error) tuple.
+
+    New conversations are created with factory, which defaults to
+    Conversation. They share a pool of keep-alive connections, so each
+    turn is sent over a warm connection.
+    """
+    def __init__(self, shard_count=16, shards=None, max_per_shard=1024, idle_timeout=600.0,
+                 store=None, factory=None, max_stored=65536):
+        self.shard_count = shard_count
+        self.max_per_shard = max_per_shard
+        self.idle_timeout = idle_timeout
+        self.store = store if store is not None else _MemoryStore(max_stored)
+        self.factory = factory or Conversation
+        self.save_errors = 0
+        self.last_error = None
+        if shards is None:
+            shards = range(shard_count)
+        self.__shards = dict((shard, _Shard()) for shard in shards)
+
+    def shard_for(self, participant_id):
+        """
+        Return the shard number for a participant ID.
+        """
+        return (zlib.crc32(participant_id.encode("utf-8")) & 0xffffffff) % self.shard_count
+
+    def owns(self, participant_id):
+        """
+        Return True if this manager serves the shard of a participant.
+        """
+        return self.shard_for(participant_id) in self.__shards
+
+    def get(self, participant_id):
+        """
+        Return the live Conversation for a participant, restoring its
+        saved state or creating a new one if needed. A new conversation
+        has no conversation ID yet and must be started by the caller.
+        Raises a ValueError if the participant belongs to another shard.
+        """
+        shard = self.__get_shard(participant_id)
+        now = time.time()
+        with shard.lock:
+            entry = shard.conversations.pop(participant_id, None)
+            if entry is None:
+                # a conversation that is still being saved is taken back
+                conversation = shard.saving.pop(participant_id, None)
+                if conversation is None:
+                    conversation = self.__create(participant_id)
+                entry = [conversation, now]
+            entry[1] = now
+            shard.conversations[participant_id] = entry
+            evicted = self.__evict(shard, now)
+        self.__save_all(shard, evicted)
+        return entry[0]
+
+    def release(self, participant_id):
+        """
+        Stop serving a participant, e.g., to hand them off to another
+        process. Returns the serialized state of their conversation,
+        or None if it is unknown. The state is also kept in the store.
+        """
+        shard = self.__get_shard(participant_id)
+        with shard.lock:
+            entry = shard.conversations.pop(participant_id, None)
+            if entry is not None:
+                shard.saving[participant_id] = entry[0]
+        if entry is not None:
+            self.__save(shard, participant_id, entry[0])
+        return self.__load(participant_id)
+
+    def adopt(self, participant_id, state):
+        """
+        Take over a participant from another process, given the state
+        returned by release() there. It is restored on the next get().
+        """
+        shard = self.__get_shard(participant_id)
+        if not isinstance(state, (str, bytes, type(u""))):
+            state = codec.encode(state)
+        with shard.lock:
+            shard.conversations.pop(participant_id, None)
+            shard.saving.pop(participant_id, None)
+            self.store[participant_id] = state
+
+    def evict_idle(self):
+        """
+        Save and remove every conversation that has been idle for longer
+        than idle_timeout, and return the number that were evicted.
+        """
+        now = time.time()
+        count = 0
+        for shard in self.__shards.values():
+            with shard.lock:
+                evicted = self.__evict(shard, now)
+            self.__save_all(shard, evicted)
+            count += len(evicted)
+        return count
+
+    def close(self):
+        """
+        Save the state of all live conversations and remove them.
+        """
+        for shard in self.__shards.values():
+            with shard.lock:
+                evicted = []
+                while shard.conversations:
+                    participant_id, entry = shard.conversations.popitem(last=False)
+                    shard.saving[participant_id] = entry[0]
+                    evicted.append((participant_id, entry[0]))
+            self.__save_all(shard, evicted)
+
+    def __len__(self):
+        return sum(len(shard.conversations) for shard in self.__shards.values())
+
+    def __get_shard(self, participant_id):
+        shard = self.__shards.get(self.shard_for(participant_id))
+        if shard is None:
+            raise ValueError("Participant %s belongs to shard %d, which is not served here" %
+                             (participant_id, self.shard_for(participant_id)))
+        return shard
+
+    def __create(self, participant_id):
+        """
+        Create a conversation, restoring any saved state for the participant.
+        """
+        conversation = self.factory()
+        state = self.__load(participant_id)
+        if state is not None:
+            conversation.restore_state(codec.decode(state.encode("utf-8")))
+        return conversation
+
+    def __evict(self, shard, now):
+        """
+        Remove the least recently used conversations of a shard while it
+        is too big or they are idle, and return a list of the participant
+        IDs and conversations to save. The shard must be locked.
+        """
+        evicted = []
+        conversations = shard.conversations
+        while conversations:
+            participant_id = next(iter(conversations))
+            conversation, last_used = conversations[participant_id]
+            if len(conversations) <= self.max_per_shard and now - last_used <= self.idle_timeout:
+                break
+            del conversations[participant_id]
+            shard.saving[participant_id] = conversation
+            evicted.append((participant_id, conversation))
+        return evicted
+
+    def __save_all(self, shard, evicted):
+        for participant_id, conversation in evicted:
+            self.__save(shard, participant_id, conversation)
+
+    def __save(self, shard, participant_id, conversation):
+        """
+        Save the state of a conversation removed from a shard. The shard
+        must not be locked, since queued entity values are sent first.
+        """
+        try:
+            conversation.flush()
+        except Exception as e:
+            # the queued values are lost, but the rest of the state is still saved
+            self.__failed(participant_id, e)
+        with shard.lock:
+            # skip it if get() has taken the conversation back meanwhile
+            if shard.saving.get(participant_id) is not conversation:
+                return
+            del shard.saving[participant_id]
+            try:
+                state = conversation.get_state()
+                if state['conversation_id']:
+                    self.store[participant_id] = codec.encode(state)
+            except Exception as e:
+                self.__failed(participant_id, e)
+
+    def __failed(self, participant_id, error):
+        self.save_errors += 1
+        self.last_error = (participant_id, error)
+
+    def __load(self, participant_id):
+        try:
+            state = self.store[participant_id]
+        except KeyError:
+            return None
+        return state.decode("utf-8") if isinstance(state, bytes) else state
+
+class _Shard(object):
+    """
+    The live conversations of one shard, in least recently used order.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.conversations = collections.OrderedDict()
+        # conversations that have been removed, while their state is saved
+        self.saving = {}
+
+class _MemoryStore(object):
+    """
+    The default store: the saved states of up to max_size participants,
+    which forgets the least recently saved beyond that.
+    """
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.__states = collections.OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __getitem__(self, participant_id):
+        return self.__states[participant_id]
+
+    def __setitem__(self, participant_id, state):
+        with self.__lock:
+            self.__states.pop(participant_id, None)
+            self.__states[participant_id] = state
+            while len(self.__states) > self.max_size:
+                self.__states.popitem(last=False)
+
+    def __contains__(self, participant_id):
+        return participant_id in self.__states
+
+    def __len__(self):
+        return len(self.__states)
+
+    def keys(self):
+        return list(self.__states.keys())
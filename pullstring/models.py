@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+#
+# The data model for requests to and responses from PullString's Web API.
+#
+# Copyright (c) 2016 PullString, Inc.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+"""
+Constants and classes that describe Web API requests and responses.
+"""
+
+# Define the set of outputs
+OUTPUT_DIALOG            = "dialog"
+OUTPUT_BEHAVIOR          = "behavior"
+
+# Define the list of entity types
+ENTITY_LABEL             = "label"
+ENTITY_COUNTER           = "counter"
+ENTITY_FLAG              = "flag"
+ENTITY_LIST              = "list"
+
+# Define the audio formats for sending audio to the server
+FORMAT_RAW_PCM_16K       = "raw_pcm_16k"
+FORMAT_WAV_16K           = "wav_16k"
+
+# The asset build type to request for Web API requests
+BUILD_SANDBOX            = "sandbox"
+BUILD_STAGING            = "staging"
+BUILD_PRODUCTION         = "production"
+
+# The Action to take for a conversation when new content is published
+IF_MODIFIED_RESTART      = "restart"
+IF_MODIFIED_UPDATE       = "update"
+IF_MODIFIED_NOTHING      = "nothing"
+
+# Define the various feature sets that this SDK can support
+FEATURE_STREAMING_ASR    = "streaming-asr"
+
+# The status of a request that did not complete before its deadline
+STATUS_DEADLINE_EXCEEDED = 408
+DEADLINE_EXCEEDED        = "Deadline exceeded"
+
+# The status of a response to entity values queued in coalesce mode, until they are sent
+STATUS_PENDING           = 202
+PENDING                  = "Pending"
+
+
+class Phoneme(object):
+    """
+    Describe a single phoneme for an audio response, e.g., to drive automatic lip sync.
+    """
+    def __init__(self, name="", secs_since_start=0.0):
+        self.name = name
+        self.seconds_since_start = secs_since_start
+
+class Entity(object):
+    """
+    Base class to describe a single entity, such as a label, counter, flag, or list.
+    """
+    def __init__(self, name, type):
+        self.name = name
+        self.type = type
+        
+class Label(Entity):
+    """
+    Subclass of Entity to describe a single Label.
+    """
+    def __init__(self, name="", value=""):
+        Entity.__init__(self, name, ENTITY_LABEL)
+        self.value = value
+
+class Counter(Entity):
+    """
+    Subclass of Entity to describe a single Counter.
+    """
+    def __init__(self, name="", value=0):
+        Entity.__init__(self, name, ENTITY_COUNTER)
+        self.value = value
+
+class Flag(Entity):
+    """
+    Subclass of Entity to describe a single Flag.
+    """
+    def __init__(self, name="", value=False):
+        Entity.__init__(self, name, ENTITY_FLAG)
+        self.value = value
+
+class ListEntity(Entity):
+    """
+    Subclass of Entity to describe a single List of values.
+    """
+    def __init__(self, name="", value=None):
+        Entity.__init__(self, name, ENTITY_LIST)
+        self.value = value if value is not None else []
+
+class Output(object):
+    """
+    Base class for outputs that are of type dialog or behavior.
+    """
+    def __init__(self, output_id, type):
+        self.id = output_id
+        self.type = type
+
+class DialogOutput(Output):
+    """
+    Subclass of Output that represents a dialog response.
+    """
+    def __init__(self, output_id=""):
+        Output.__init__(self, output_id, OUTPUT_DIALOG)
+        self.text = ""
+        self.uri = ""
+        self.duration = 0.0
+        self.phonemes = []
+        self.character = ""
+        self.user_data = ""
+        self.__timeline = None
+
+    @property
+    def timeline(self):
+        """
+        Return a PhonemeTimeline for the phonemes of this output, built on first use.
+        """
+        if self.__timeline is None or len(self.__timeline) != len(self.phonemes):
+            from .lipsync import PhonemeTimeline
+            self.__timeline = PhonemeTimeline(self.phonemes, self.duration)
+        return self.__timeline
+
+    def __str__(self):
+        str = self.text
+        if self.character:
+            str = self.character + ": " + str
+        return str
+
+class BehaviorOutput(Output):
+    """
+    Subclass of Output that represents a behavior response.
+    """
+    def __init__(self, output_id=""):
+        Output.__init__(self, output_id, OUTPUT_BEHAVIOR)
+        self.behavior = ""
+        self.parameters = {}
+
+    def __str__(self):
+        result = self.behavior
+        if self.parameters:
+            result += ": " + str(self.parameters)
+        return result
+
+class Status(object):
+    """
+    Describe the status and any errors from a Web API response.
+    """
+    def __init__(self, code=200, message="success"):
+        self.status_code = code
+        self.error_message = message
+
+    @property
+    def success(self):
+        return self.error_message == "success"
+
+    @property
+    def deadline_exceeded(self):
+        """
+        Return True if the request ran out of time on the client side.
+        """
+        return self.status_code == STATUS_DEADLINE_EXCEEDED and self.error_message == DEADLINE_EXCEEDED
+
+    @property
+    def pending(self):
+        """
+        Return True if the request has been queued but not sent yet.
+        """
+        return self.status_code == STATUS_PENDING and self.error_message == PENDING
+
+class Response(object):
+    """
+    Describe a single response from the PullString Web API.
+
+    The get_entity(), get_outputs(), get_behaviors(), and dialog_text
+    accessors use indexes that are built once, on first use. Assigning
+    a new outputs or entities list resets the indexes.
+    """
+    def __init__(self):
+        self.outputs = []
+        self.entities = []
+        self.status = Status()
+        self.conversation_endpoint = ""
+        self.last_modified = ""
+        self.etag = ""
+        self.conversation_id = ""
+        self.participant_id = ""
+        self.timed_response_interval = -1
+        self.asr_hypothesis = ""
+
+    @property
+    def outputs(self):
+        return self.__outputs
+
+    @outputs.setter
+    def outputs(self, outputs):
+        self.__outputs = outputs
+        self.__output_index = None
+
+    @property
+    def entities(self):
+        return self.__entities
+
+    @entities.setter
+    def entities(self, entities):
+        self.__entities = entities
+        self.__entity_index = None
+
+    @property
+    def entities_by_name(self):
+        """
+        Return a dict of all entities in the response, keyed by name.
+        """
+        if self.__entity_index is None:
+            self.__entity_index = dict((entity.name, entity) for entity in self.__entities)
+        return self.__entity_index
+
+    def get_entity(self, name, default=None):
+        """
+        Return the entity with the specified name, or default if not present.
+        """
+        return self.entities_by_name.get(name, default)
+
+    def get_outputs(self, output_type):
+        """
+        Return the list of outputs of the specified type, e.g., OUTPUT_DIALOG.
+        """
+        return self.__get_output_index()[0].get(output_type, [])
+
+    def get_behaviors(self, behavior):
+        """
+        Return the list of behavior outputs with the specified behavior name.
+        """
+        return self.__get_output_index()[1].get(behavior, [])
+
+    @property
+    def dialog_text(self):
+        """
+        Return the text of all dialog outputs, joined with spaces.
+        """
+        return self.__get_output_index()[2]
+
+    def __get_output_index(self):
+        """
+        Build the output indexes on first use: outputs by type,
+        behavior outputs by behavior name, and the dialog text.
+        """
+        if self.__output_index is None:
+            by_type = {}
+            by_behavior = {}
+            for output in self.__outputs:
+                by_type.setdefault(output.type, []).append(output)
+                if output.type == OUTPUT_BEHAVIOR:
+                    by_behavior.setdefault(output.behavior, []).append(output)
+            text = " ".join(output.text for output in by_type.get(OUTPUT_DIALOG, []))
+            self.__output_index = (by_type, by_behavior, text)
+        return self.__output_index
+
+class Request(object):
+    """
+    Describe the parameters for a request to the PullString Web API.
+
+    Set timeout to the number of seconds that each call may take, from
+    waiting for a connection to reading the last byte of the response.
+    A call that runs out of time returns a response whose status has
+    deadline_exceeded set. The default of 0 means no time limit.
+    """
+    def __init__(self, api_key="", participant_id=""):
+        self.api_key = api_key
+        self.participant_id = participant_id
+        self.build_type = BUILD_PRODUCTION
+        self.time_zone_offset = 0
+        self.conversation_id = ""
+        self.language = ""
+        self.locale = ""
+        self.if_modified = IF_MODIFIED_NOTHING
+        self.restart_if_modified = True
+        self.timeout = 0
+
+class VersionInfo(object):
+    """
+    A class to provide version information about this implementation of the PullString SDK.
+    """
+
+    # class variable to store the API base URL for all requests
+    __API_BASE_URL = "https://conversation.pullstring.ai/v1"
+
+    # class variable to store the API base headers for all requests
+    __API_BASE_HEADERS = {}
+
+    @property
+    def api_base_url(self):
+        return VersionInfo.__API_BASE_URL
+
+    @api_base_url.setter
+    def api_base_url(self, new_url):
+        VersionInfo.__API_BASE_URL = new_url
+
+    @property
+    def api_base_headers(self):
+        return VersionInfo.__API_BASE_HEADERS
+
+    @api_base_headers.setter
+    def api_base_headers(self, new_headers):
+        VersionInfo.__API_BASE_HEADERS = new_headers
+
+    def __get_api_version(self):
+        """
+        Return the current Web API version number, e.g., "1".
+        """
+        try:
+            import re
+            return int(re.sub(r'.*/v([0-9]+).*', r'\1', self.api_base_url))
+        except:
+            return 0
+    api_version = property(__get_api_version)
+
+    def has_feature(self, feature_name):
+        """
+        Return True if the specified feature is supported by this implementation.
+        """
+        if feature_name == FEATURE_STREAMING_ASR:
+            return True
+        return False
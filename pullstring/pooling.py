@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+#
+# Reuse Response objects to reduce allocations and garbage collection.
+#
+# Copyright (c) 2016 PullString, Inc.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+"""
+An object pool for Response objects and everything they contain.
+"""
+
+import threading
+import traceback
+
+from .models import Phoneme, Label, Counter, Flag, ListEntity, DialogOutput, BehaviorOutput, Response
+
+
+class ResponsePool(object):
+    """
+    A pool of Response objects, and the DialogOutput, BehaviorOutput,
+    Phoneme, and Entity objects that they contain.
+
+    Set the response_pool of a Conversation to build its responses from
+    the pool, and call release() when you are done with each response.
+    The response and all of its contents are then reused for later
+    responses, so they must not be used after they have been released.
+    Up to max_size free objects of each type are kept.
+
+    A pool can be shared by conversations on several threads.
+
+    With debug set to True, released objects raise a RuntimeError that
+    shows where they were released if they are used again, or released
+    twice. This makes releasing slower, so use it to find bugs only.
+    """
+    def __init__(self, max_size=1024, debug=False):
+        self.max_size = max_size
+        self.debug = debug
+        self.created = 0
+        self.reused = 0
+        self.__free = dict((cls, []) for cls in _POOLED_CLASSES)
+        self.__lock = threading.Lock()
+
+    def acquire(self, cls):
+        """
+        Return an object of the given model class, e.g., Response. A reused
+        Response or DialogOutput has empty lists, but otherwise all fields
+        must be set by the caller.
+        """
+        with self.__lock:
+            try:
+                obj = self.__free[cls].pop()
+            except IndexError:
+                self.created += 1
+                return cls()
+            self.reused += 1
+        if self.debug:
+            self.__revive(obj, cls)
+        return obj
+
+    def acquire_phonemes(self, count):
+        """
+        Return a list of count Phoneme objects, whose fields must be set.
+        """
+        with self.__lock:
+            free = self.__free[Phoneme]
+            phonemes = free[max(0, len(free) - count):] if count else []
+            del free[len(free) - len(phonemes):]
+            self.reused += len(phonemes)
+            self.created += count - len(phonemes)
+        if self.debug:
+            for phoneme in phonemes:
+                self.__revive(phoneme, Phoneme)
+        while len(phonemes) < count:
+            phonemes.append(Phoneme())
+        return phonemes
+
+    def release(self, response):
+        """
+        Return a response and all of its contents to the pool.
+        """
+        if self.debug:
+            self.__check(response)
+
+        outputs = response.outputs
+        entities = response.entities
+        released = [response]
+        for output in outputs:
+            if type(output) is DialogOutput:
+                phonemes = output.phonemes
+                self.__put(Phoneme, phonemes)
+                del phonemes[:]
+                output._DialogOutput__timeline = None
+            released.append(output)
+        released.extend(entities)
+
+        # clear the lists in place, so that they are reused too
+        del outputs[:]
+        del entities[:]
+        response.outputs = outputs
+        response.entities = entities
+        if response.status is not None:
+            response.status.status_code = 200
+            response.status.error_message = "success"
+
+        for obj in released:
+            self.__put(type(obj), (obj,))
+
+    def __put(self, cls, objects):
+        """
+        Add released objects to the free list for their class, up to max_size.
+        """
+        free = self.__free.get(cls)
+        if free is None:
+            return
+        if self.debug:
+            where = "".join(traceback.format_stack()[:-2])
+            for obj in objects:
+                object.__setattr__(obj, "_released_at", where)
+                object.__setattr__(obj, "__class__", _released_class(cls))
+        with self.__lock:
+            room = self.max_size - len(free)
+            if room > 0:
+                free.extend(objects[:room])
+
+    def __check(self, response):
+        """
+        Raise an error if any object of a response was already released.
+        """
+        for obj in [response] + response.outputs + response.entities:
+            getattr(obj, "__dict__")
+        for output in response.outputs:
+            for phoneme in getattr(output, "phonemes", []):
+                getattr(phoneme, "__dict__")
+
+    def __revive(self, obj, cls):
+        object.__setattr__(obj, "__class__", cls)
+        obj.__dict__.pop("_released_at", None)
+
+# the model classes that are kept in the pool
+_POOLED_CLASSES = [Response, DialogOutput, BehaviorOutput, Phoneme, Label, Counter, Flag, ListEntity]
+
+_RELEASED_CLASSES = {}
+
+def _released_class(cls):
+    """
+    Return a subclass of cls that raises an error on any attribute access,
+    which released objects are switched to in debug mode until they are reused.
+    """
+    released_cls = _RELEASED_CLASSES.get(cls)
+    if released_cls is None:
+        def __getattribute__(self, name):
+            where = object.__getattribute__(self, "__dict__").get("_released_at", "")
+            raise RuntimeError("%s object used after it was released to the ResponsePool, "
+                               "released at:\n%s" % (cls.__name__, where))
+
+        def __setattr__(self, name, value):
+            __getattribute__(self, name)
+
+        released_cls = type("Released" + cls.__name__, (cls,),
+                            {"__getattribute__": __getattribute__, "__setattr__": __setattr__})
+        _RELEASED_CLASSES[cls] = released_cls
+    return released_cls
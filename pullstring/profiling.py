@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+#
+# Profile the SDK code of sampled conversation turns.
+#
+# Copyright (c) 2016 PullString, Inc.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+"""
+An opt-in cProfile hook for Conversation turns.
+"""
+
+import sys
+import time
+import random
+import pstats
+import cProfile
+import threading
+
+from ._compat import clock as _clock
+
+
+class TurnProfiler(object):
+    """
+    Profile a sample of the requests made by a Conversation, and add up
+    the cost of each function over all of the profiled turns.
+
+    Set the profiler of a Conversation to a TurnProfiler to enable it;
+    with no profiler set, nothing is measured. A fraction sample_rate of
+    the turns is run under cProfile. Time spent waiting for the network
+    shows up in the socket and SSL read functions, and the rest is the
+    SDK's own cost, e.g., building the request and decoding the JSON.
+
+    Call dump() to print the aggregated stats at any time. If threshold
+    is set, each profiled turn that takes at least that many seconds is
+    also printed on its own to output, which defaults to sys.stderr.
+    Only one turn is profiled at a time; turns that overlap a profiled
+    turn in another thread are not sampled.
+    """
+    def __init__(self, sample_rate=1.0, threshold=None, output=None, sort="cumulative", limit=25):
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.output = output
+        self.sort = sort
+        self.limit = limit
+        self.turns = 0
+        self.profiled = 0
+        self.slow = 0
+        self.__stats = None
+        self.__active = threading.Lock()
+        self.__lock = threading.Lock()
+
+    def run(self, func, *args, **kwargs):
+        """
+        Call func(*args, **kwargs) and return its result, profiling the
+        call if it is sampled.
+        """
+        with self.__lock:
+            self.turns += 1
+        if random.random() >= self.sample_rate or not self.__active.acquire(False):
+            return func(*args, **kwargs)
+
+        try:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # another profiler is already running in this thread
+                return func(*args, **kwargs)
+
+            start = _clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profile.disable()
+                self.__add(profile, _clock() - start)
+        finally:
+            self.__active.release()
+
+    def stats(self):
+        """
+        Return a pstats.Stats object with the aggregated stats, or None if
+        no turn has been profiled yet.
+        """
+        with self.__lock:
+            return self.__stats
+
+    def functions(self, limit=None):
+        """
+        Return a list of (function, calls, own_seconds, total_seconds)
+        tuples for the most expensive functions by total time, where
+        function is "file:line(name)".
+        """
+        with self.__lock:
+            if self.__stats is None:
+                return []
+            entries = []
+            for (filename, line, name), (cc, calls, tottime, cumtime, callers) in self.__stats.stats.items():
+                entries.append(("%s:%d(%s)" % (filename, line, name), calls, tottime, cumtime))
+        entries.sort(key=lambda entry: entry[3], reverse=True)
+        return entries[:limit or self.limit]
+
+    def dump(self, output=None, path=None):
+        """
+        Print the aggregated stats to output, or save them to path in the
+        binary format read by pstats and tools such as snakeviz.
+        """
+        with self.__lock:
+            if self.__stats is None:
+                return
+            if path is not None:
+                self.__stats.dump_stats(path)
+                return
+            self.__print(self.__stats, output, "%d of %d turns profiled" % (self.profiled, self.turns))
+
+    def reset(self):
+        """
+        Discard the aggregated stats.
+        """
+        with self.__lock:
+            self.__stats = None
+            self.turns = self.profiled = self.slow = 0
+
+    def __add(self, profile, elapsed):
+        """
+        Add the stats of a profiled turn, and print them if it was slow.
+        """
+        with self.__lock:
+            self.profiled += 1
+            if self.__stats is None:
+                self.__stats = pstats.Stats(profile)
+            else:
+                self.__stats.add(profile)
+            if self.threshold is not None and elapsed >= self.threshold:
+                self.slow += 1
+                self.__print(pstats.Stats(profile), None, "slow turn took %.1f ms" % (elapsed * 1000))
+
+    def __print(self, stats, output, title):
+        output = output or self.output or sys.stderr
+        output.write("pullstring profile: %s\n" % title)
+        stats.stream = output
+        stats.sort_stats(self.sort).print_stats(self.limit)
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+#
+# Client-side rate limiting of requests to PullString's Web API.
+#
+# Copyright (c) 2016 PullString, Inc.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+"""
+Token bucket rate limiting per API key, shared by many conversations.
+"""
+
+import threading
+import collections
+
+from ._compat import clock as _clock
+
+
+class RateLimitStats(object):
+    """
+    Describe the requests let through by a RateLimiter for one API key,
+    and how long they waited in the queue, in seconds.
+    """
+    def __init__(self):
+        self.acquired = 0
+        self.rejected = 0
+        self.queued = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @property
+    def mean_wait(self):
+        return self.total_wait / self.acquired if self.acquired else 0.0
+
+class RateLimiter(object):
+    """
+    A token bucket for each API key that limits the request rate of all
+    of the conversations that use that key, to stay within the quota of
+    the key and avoid throttling by the Web API.
+
+    Each bucket holds up to burst tokens and is refilled at rate tokens
+    per second. Every request takes a token. When the bucket is empty,
+    requests wait in a queue, and the owners of waiting requests (e.g.,
+    each Conversation) take turns, so that one busy conversation cannot
+    starve the others. Use set_quota() to give a key a different quota.
+
+    Set the rate_limiter of a Conversation to use a RateLimiter for all
+    of its requests. Requests can also be limited directly by calling
+    acquire(), or acquire_async() from asyncio code.
+    """
+    def __init__(self, rate=10.0, burst=None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1)
+        self.__lock = threading.Lock()
+        self.__buckets = {}
+
+    def set_quota(self, api_key, rate, burst=None):
+        """
+        Set the rate (per second) and burst capacity for an API key.
+        """
+        with self.__lock:
+            bucket = self.__get_bucket(api_key)
+            bucket.rate = rate
+            bucket.burst = burst if burst is not None else max(rate, 1)
+            bucket.tokens = min(bucket.tokens, bucket.burst)
+
+    def acquire(self, api_key, owner=None, blocking=True, timeout=None):
+        """
+        Take a token for a request with the API key, waiting for one if
+        blocking is True, for at most timeout seconds if given. Returns
+        True if a token was taken. The owner identifies the caller, e.g.,
+        a Conversation, for fair queuing.
+        """
+        with self.__lock:
+            bucket = self.__get_bucket(api_key)
+            self.__refill(bucket)
+            if not bucket.owners and bucket.tokens >= 1:
+                bucket.tokens -= 1
+                bucket.stats.acquired += 1
+                return True
+            if not blocking:
+                bucket.stats.rejected += 1
+                return False
+            waiter = _Waiter(threading.Event())
+            self.__enqueue(bucket, owner, waiter)
+
+        if waiter.event.wait(timeout):
+            return True
+
+        with self.__lock:
+            if waiter.granted:
+                return True
+            self.__dequeue(bucket, owner, waiter)
+            bucket.stats.rejected += 1
+            return False
+
+    def acquire_async(self, api_key, owner=None):
+        """
+        Return an asyncio Future that completes when a token for a request
+        with the API key has been taken. Cancel the future to leave the queue.
+        """
+        import asyncio
+
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        with self.__lock:
+            bucket = self.__get_bucket(api_key)
+            self.__refill(bucket)
+            if not bucket.owners and bucket.tokens >= 1:
+                bucket.tokens -= 1
+                bucket.stats.acquired += 1
+                future.set_result(True)
+                return future
+            waiter = _Waiter(loop=loop, future=future)
+            self.__enqueue(bucket, owner, waiter)
+
+        def on_done(future):
+            if future.cancelled():
+                with self.__lock:
+                    self.__dequeue(bucket, owner, waiter)
+        future.add_done_callback(on_done)
+        return future
+
+    def stats(self, api_key):
+        """
+        Return the RateLimitStats for an API key.
+        """
+        with self.__lock:
+            return self.__get_bucket(api_key).stats
+
+    def __get_bucket(self, api_key):
+        bucket = self.__buckets.get(api_key)
+        if bucket is None:
+            bucket = _Bucket(self.rate, self.burst)
+            self.__buckets[api_key] = bucket
+        return bucket
+
+    def __refill(self, bucket):
+        now = _clock()
+        bucket.tokens = min(bucket.burst, bucket.tokens + (now - bucket.updated) * bucket.rate)
+        bucket.updated = now
+
+    def __enqueue(self, bucket, owner, waiter):
+        """
+        Add a waiter to the queue of its owner and start granting tokens.
+        """
+        waiter.queued = _clock()
+        bucket.owners.setdefault(owner, collections.deque()).append(waiter)
+        bucket.stats.queued += 1
+        self.__schedule(bucket)
+
+    def __dequeue(self, bucket, owner, waiter):
+        """
+        Remove a waiter that gave up before it was granted a token.
+        """
+        waiters = bucket.owners.get(owner)
+        if waiters is not None and waiter in waiters:
+            waiters.remove(waiter)
+            bucket.stats.queued -= 1
+            if not waiters:
+                del bucket.owners[owner]
+
+    def __schedule(self, bucket):
+        """
+        Grant tokens to waiters, taking turns between owners, and set a
+        timer for when the next token will be available. The lock must be held.
+        """
+        self.__refill(bucket)
+        while bucket.owners and bucket.tokens >= 1:
+            owner, waiters = bucket.owners.popitem(last=False)
+            waiter = waiters.popleft()
+            if waiters:
+                bucket.owners[owner] = waiters
+
+            bucket.tokens -= 1
+            wait = _clock() - waiter.queued
+            bucket.stats.acquired += 1
+            bucket.stats.queued -= 1
+            bucket.stats.total_wait += wait
+            bucket.stats.max_wait = max(bucket.stats.max_wait, wait)
+            waiter.grant()
+
+        if bucket.owners and bucket.timer is None and bucket.rate > 0:
+            delay = (1 - bucket.tokens) / bucket.rate
+            bucket.timer = threading.Timer(delay, self.__on_timer, (bucket,))
+            bucket.timer.daemon = True
+            bucket.timer.start()
+
+    def __on_timer(self, bucket):
+        with self.__lock:
+            bucket.timer = None
+            self.__schedule(bucket)
+
+class _Bucket(object):
+    """
+    The tokens and the queue of waiting requests for one API key.
+    """
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = _clock()
+        self.owners = collections.OrderedDict()
+        self.timer = None
+        self.stats = RateLimitStats()
+
+class _Waiter(object):
+    """
+    A request waiting for a token, from a thread or an asyncio task.
+    """
+    def __init__(self, event=None, loop=None, future=None):
+        self.event = event
+        self.loop = loop
+        self.future = future
+        self.queued = 0.0
+        self.granted = False
+
+    def grant(self):
+        self.granted = True
+        if self.event is not None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self.__resolve)
+
+    def __resolve(self):
+        if not self.future.done():
+            self.future.set_result(True)
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+#
+# Record and replay the HTTPS exchanges of a Conversation.
+#
+# Copyright (c) 2016 PullString, Inc.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+"""
+Transports that record Web API traffic to a file and replay it offline.
+"""
+
+import os
+import json
+import time
+import base64
+import hashlib
+import threading
+
+from ._compat import clock as _clock
+from .transport import HttpTransport, HttpResult, DeadlineExceeded, urlparse, urlencode
+
+# request headers that must never be written to a recording
+_PRIVATE_HEADERS = ["authorization"]
+
+
+class RecordingTransport(object):
+    """
+    A transport that sends requests with another transport (by default,
+    a new HttpTransport) and appends each exchange to a JSON lines file.
+
+    Each line describes one request and its response, and the latency
+    from opening the request to receiving the full response. Binary
+    request bodies, i.e., audio, are written to audio_dir if given, with
+    one file per distinct body, or else are base64 encoded in the line.
+    The Authorization header is never recorded.
+    """
+    def __init__(self, path, transport=None, audio_dir=None):
+        self.path = path
+        self.transport = transport or HttpTransport()
+        self.audio_dir = audio_dir
+        self.__lock = threading.Lock()
+
+        if audio_dir and not os.path.isdir(audio_dir):
+            os.makedirs(audio_dir)
+
+    def open(self, url, query_params, headers, deadline=None):
+        """
+        Start a request with the wrapped transport, recording its exchange.
+        """
+        if deadline is None:
+            exchange = self.transport.open(url, query_params, headers)
+        else:
+            exchange = self.transport.open(url, query_params, headers, deadline=deadline)
+        return _RecordingExchange(self, exchange, _request_path(url, query_params), headers)
+
+    def warm_up(self, url, count=1):
+        self.transport.warm_up(url, count)
+
+    def write(self, record, body):
+        """
+        Append the record of an exchange with the given request body.
+        """
+        if _is_text(body, record['headers']):
+            record['body'] = body.decode("utf-8")
+        elif self.audio_dir:
+            filename = hashlib.sha1(body).hexdigest() + ".audio"
+            audio_path = os.path.join(self.audio_dir, filename)
+            if not os.path.exists(audio_path):
+                with open(audio_path, "wb") as f:
+                    f.write(body)
+            record['body_file'] = filename
+        else:
+            record['body_base64'] = base64.b64encode(body).decode("ascii")
+
+        line = json.dumps(record, sort_keys=True) + "\n"
+        with self.__lock:
+            with open(self.path, "a") as f:
+                f.write(line)
+
+class ReplayTransport(object):
+    """
+    A transport that answers requests from a file written by a
+    RecordingTransport, without any network access.
+
+    A request is answered by the first unused recorded exchange with the
+    same path, query, and body. With loop set to True, exchanges can be
+    used again once all matching ones have been used, e.g., to run the
+    same session many times in a load test. Responses are delayed by the
+    recorded latency multiplied by latency_scale, so 0 replays as fast
+    as possible and 1 replays with the recorded timing. A request whose
+    deadline passes during that delay raises DeadlineExceeded, as it
+    would over the network.
+    """
+    def __init__(self, path, latency_scale=1.0, loop=False):
+        self.path = path
+        self.latency_scale = latency_scale
+        self.loop = loop
+        self.__lock = threading.Lock()
+        self.__records = {}
+        self.__used = {}
+
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    key = (record['path'], self.__body_key(record))
+                    self.__records.setdefault(key, []).append(record)
+
+    def open(self, url, query_params, headers, deadline=None):
+        """
+        Start a request that is answered from the recording.
+        """
+        return _ReplayExchange(self, _request_path(url, query_params), headers, deadline)
+
+    def warm_up(self, url, count=1):
+        pass
+
+    def find(self, path, body, headers):
+        """
+        Return the next recorded exchange for a request, or raise a
+        LookupError if there is none.
+        """
+        if _is_text(body, headers):
+            key = (path, body.decode("utf-8"))
+        else:
+            key = (path, hashlib.sha1(body).hexdigest())
+
+        with self.__lock:
+            records = self.__records.get(key, [])
+            used = self.__used.get(key, 0)
+            if used >= len(records):
+                if not self.loop or not records:
+                    raise LookupError("No recorded response for POST %s" % path)
+                used = 0
+            self.__used[key] = used + 1
+            return records[used]
+
+    def __body_key(self, record):
+        # text bodies match exactly, audio bodies match by their hash
+        if 'body' in record:
+            return record['body']
+        if 'body_file' in record:
+            return record['body_file'][:-len(".audio")]
+        return hashlib.sha1(base64.b64decode(record['body_base64'])).hexdigest()
+
+class _RecordingExchange(object):
+    """
+    Pass a request through to a real exchange and record it when it finishes.
+    """
+    def __init__(self, recorder, exchange, path, headers):
+        self.url = exchange.url
+        self.chunked = exchange.chunked
+        self.__recorder = recorder
+        self.__exchange = exchange
+        self.__path = path
+        self.__headers = headers
+        self.__body = []
+        self.__start = time.time()
+
+    def send(self, data):
+        if data:
+            self.__body.append(data)
+        self.__exchange.send(data)
+
+    def finish(self, on_data=None):
+        result = self.__exchange.finish(on_data)
+        record = {
+            'path': self.__path,
+            'headers': dict((k, v) for k, v in self.__headers.items() if k.lower() not in _PRIVATE_HEADERS),
+            'status': result.status,
+            'reason': result.reason,
+            'response_headers': result.headers,
+            'response': result.body.decode("utf-8", "replace"),
+            'latency': round(time.time() - self.__start, 6),
+        }
+        self.__recorder.write(record, b"".join(self.__body))
+        return result
+
+class _ReplayExchange(object):
+    """
+    Collect the body of a request and answer it with a recorded response.
+    """
+    def __init__(self, replayer, path, headers, deadline=None):
+        self.url = path
+        self.chunked = (headers.get("Transfer-Encoding", "") == "chunked")
+        self.deadline = deadline
+        self.__replayer = replayer
+        self.__path = path
+        self.__headers = headers
+        self.__body = []
+        self.__start = time.time()
+
+    def send(self, data):
+        if data:
+            self.__body.append(data)
+
+    def finish(self, on_data=None):
+        record = self.__replayer.find(self.__path, b"".join(self.__body), self.__headers)
+
+        # wait out the rest of the (scaled) recorded latency
+        delay = record.get('latency', 0.0) * self.__replayer.latency_scale - (time.time() - self.__start)
+        if self.deadline is not None and _clock() + delay >= self.deadline:
+            time.sleep(max(0.0, self.deadline - _clock()))
+            raise DeadlineExceeded("Deadline exceeded for POST %s" % self.__path)
+        if delay > 0:
+            time.sleep(delay)
+
+        body = record.get('response', "").encode("utf-8")
+        if on_data is not None and body:
+            on_data(body)
+        return HttpResult(record.get('status', 200), record.get('reason', ""),
+                          dict(record.get('response_headers', {})), body)
+
+def _request_path(url, query_params):
+    """
+    Return the path and query of a request, which identify it in a recording.
+    """
+    path = urlparse.urlparse(url).path
+    if query_params:
+        path += "?" + urlencode(sorted(query_params.items()))
+    return path
+
+def _is_text(body, headers):
+    """
+    Return True if a request body is recorded as text, i.e., JSON.
+    """
+    if headers.get("Content-Type", "").startswith("audio/"):
+        return False
+    try:
+        body.decode("utf-8")
+        return True
+    except UnicodeDecodeError:
+        return False
@@ -0,0 +1,539 @@
+# -*- coding: utf-8 -*-
+#
+# The HTTPS transport for requests to PullString's Web API.
+#
+# Copyright (c) 2016 PullString, Inc.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+"""
+Send POST requests to the Web API over pooled keep-alive HTTPS connections.
+"""
+
+import ssl
+import sys
+import time
+import zlib
+import select
+import socket
+import threading
+
+from ._compat import clock as _clock
+from .models import VersionInfo
+
+if sys.version_info >= (3, 0):
+    # python3 imports
+    import http.client as httplib
+    import urllib.parse as urlparse
+    from urllib.parse import urlencode
+else:
+    # python2 imports
+    import httplib
+    import urlparse
+    from urllib import urlencode
+
+
+class DeadlineExceeded(socket.timeout):
+    """
+    Raised when a request runs out of time before its deadline.
+    """
+
+class RequestCancelled(IOError):
+    """
+    Raised when a request is used after it was cancelled.
+    """
+
+class HttpResult(object):
+    """
+    Describe the status, headers, and body of an HTTP response.
+    """
+    def __init__(self, status=200, reason="", headers=None, body=b""):
+        self.status = status
+        self.reason = reason
+        self.headers = headers or {}
+        self.body = body
+
+class PooledHTTPSConnection(httplib.HTTPSConnection):
+    """
+    An HTTPS connection that disables Nagle's algorithm and can resume a
+    previous TLS session for an abbreviated handshake.
+    """
+    def __init__(self, host, context, session=None, timeout=socket._GLOBAL_DEFAULT_TIMEOUT):
+        httplib.HTTPSConnection.__init__(self, host, context=context, timeout=timeout)
+        self.session = session
+
+    def connect(self):
+        # connect the TCP socket and send each write immediately
+        httplib.HTTPConnection.connect(self)
+        try:
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except (OSError, socket.error):
+            pass
+
+        server_hostname = self._tunnel_host or self.host
+        if self.session is not None:
+            try:
+                self.sock = self._context.wrap_socket(self.sock, server_hostname=server_hostname,
+                                                      session=self.session)
+                return
+            except (ValueError, TypeError):
+                pass  # the session does not belong to this context, or is unsupported
+        self.sock = self._context.wrap_socket(self.sock, server_hostname=server_hostname)
+
+    @property
+    def session_reused(self):
+        """
+        Return True if the TLS handshake resumed a previous session.
+        """
+        return bool(getattr(self.sock, "session_reused", False))
+
+class ConnectionPool(object):
+    """
+    A thread-safe pool of keep-alive HTTPS connections, grouped by host.
+
+    Up to max_idle connections per host are kept open between requests.
+    The TLS session of each host is remembered so that new connections
+    can use an abbreviated handshake. Use warm_up() to open connections
+    before the first request. If an ssl_context is given, it is used for
+    every host, e.g., to trust a private certificate authority.
+    """
+    def __init__(self, max_idle=8, ssl_context=None):
+        self.max_idle = max_idle
+        self.ssl_context = ssl_context
+        self.__lock = threading.Lock()
+        self.__idle = {}
+        self.__contexts = {}
+        self.__sessions = {}
+
+    def acquire(self, purl, reuse=True, timeout=None):
+        """
+        Return a (connection, reused) tuple for the host of the parsed
+        URL, where reused is True for an open connection from the pool.
+        The timeout in seconds applies to each socket operation.
+        """
+        with self.__lock:
+            idle = self.__idle.get(purl.netloc) or []
+            while reuse and idle:
+                conn = idle.pop()
+                if self.__is_open(conn):
+                    conn.sock.settimeout(timeout if timeout is not None else socket.getdefaulttimeout())
+                    return conn, True
+                conn.close()
+            context = self.__contexts.get(purl.netloc)
+            if context is None:
+                context = self.__create_context(purl)
+                self.__contexts[purl.netloc] = context
+            session = self.__sessions.get(purl.netloc)
+        if timeout is None:
+            timeout = socket._GLOBAL_DEFAULT_TIMEOUT
+        return PooledHTTPSConnection(purl.netloc, context, session, timeout), False
+
+    def release(self, purl, conn):
+        """
+        Return a connection to the pool after its response has been read.
+        """
+        session = _resumable_session(conn.sock)
+        with self.__lock:
+            if session is not None:
+                self.__sessions[purl.netloc] = session
+            idle = self.__idle.setdefault(purl.netloc, [])
+            if conn.sock is not None and len(idle) < self.max_idle:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def warm_up(self, url, count=1):
+        """
+        Open and TLS-handshake connections to the host of the URL, until
+        the pool has at least count idle connections for that host.
+        """
+        purl = urlparse.urlparse(url)
+        with self.__lock:
+            needed = count - len(self.__idle.get(purl.netloc, []))
+        for x in range(needed):
+            conn, reused = self.acquire(purl, reuse=False)
+            conn.connect()
+            self.__read_ticket(conn)
+            self.release(purl, conn)
+
+    def idle_count(self, url):
+        """
+        Return the number of idle connections to the host of the URL.
+        """
+        with self.__lock:
+            return len(self.__idle.get(urlparse.urlparse(url).netloc, []))
+
+    def close(self):
+        """
+        Close all idle connections and forget the TLS sessions.
+        """
+        with self.__lock:
+            idle = [conn for conns in self.__idle.values() for conn in conns]
+            self.__idle = {}
+            self.__sessions = {}
+        for conn in idle:
+            conn.close()
+
+    def __is_open(self, conn):
+        """
+        Return True if the server has not closed an idle connection. An
+        idle connection should only be readable for TLS session tickets.
+        """
+        if conn.sock is None:
+            return False
+        try:
+            if not select.select([conn.sock], [], [], 0)[0]:
+                return True
+            timeout = conn.sock.gettimeout()
+            conn.sock.settimeout(0)
+            try:
+                conn.sock.recv(1)
+                return False
+            finally:
+                conn.sock.settimeout(timeout)
+        except ssl.SSLWantReadError:
+            return True
+        except (ValueError, socket.error, select.error):
+            return False
+
+    def __read_ticket(self, conn, wait=0.2):
+        """
+        Wait briefly for the session ticket that a TLS 1.3 server sends
+        after the handshake, which is only read along with response data
+        otherwise, so that a warmed up session can be resumed.
+        """
+        if conn.sock is None or getattr(conn.sock, "session", None) is None \
+                or _resumable_session(conn.sock) is not None:
+            return
+        timeout = conn.sock.gettimeout()
+        try:
+            if select.select([conn.sock], [], [], wait)[0]:
+                conn.sock.settimeout(0)
+                conn.sock.recv(1)
+        except ssl.SSLWantReadError:
+            pass
+        except (ValueError, socket.error, select.error):
+            pass
+        finally:
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+
+    def __create_context(self, purl):
+        if self.ssl_context is not None:
+            return self.ssl_context
+
+        # disable TLS cert checking if pointing to a local server (PullString internal only)
+        if purl.hostname == "localhost":
+            return ssl._create_unverified_context()
+        return ssl.create_default_context()
+
+def _resumable_session(sock):
+    """
+    Return the TLS session of a socket if it can be resumed, or None. Under
+    TLS 1.3, that is only once the server's session ticket has been read.
+    """
+    session = getattr(sock, "session", None)
+    if session is None:
+        return None
+    if not session.has_ticket and sock.version() == "TLSv1.3":
+        return None
+    return session
+
+# the pool shared by all conversations that use the default transport
+DEFAULT_POOL = ConnectionPool()
+
+class HttpExchange(object):
+    """
+    A single POST request to the Web API. The body is either sent in one
+    piece, or streamed with chunked transfer encoding if the headers
+    specify "Transfer-Encoding: chunked". A body sent in one piece is
+    gzip compressed if it has at least gzip_min_size bytes.
+
+    If a deadline is given, as a time.monotonic() value, every step of
+    the exchange, from opening the connection to reading the last byte
+    of the response, only waits for the time that is left, and raises a
+    DeadlineExceeded error once the deadline has passed.
+    """
+    BLOCK_SIZE = 8192
+
+    def __init__(self, pool, purl, url, path, headers, gzip_min_size=None, deadline=None):
+        self.url = url
+        self.path = path
+        self.headers = headers
+        self.chunked = (headers.get("Transfer-Encoding", "") == "chunked")
+        self.gzip_min_size = gzip_min_size
+        self.deadline = deadline
+        self.__pool = pool
+        self.__purl = purl
+        self.__body = None
+        self.__done = False
+        self.__cancelled = False
+        self.__lock = threading.Lock()
+        self.__conn, self.__reused = pool.acquire(purl, timeout=self.__remaining())
+
+        if self.chunked:
+            # send the headers now, the data follows in a chunked encoded format
+            try:
+                self.__conn.putrequest('POST', path)
+                for key in headers.keys():
+                    self.__conn.putheader(key, headers[key])
+                self.__conn.endheaders()
+            except Exception as e:
+                self.__fail(e)
+
+    def send(self, data):
+        """
+        Output bytes to the body of the request.
+        """
+        self.__check_cancelled()
+        if self.chunked:
+            if data:
+                try:
+                    self.__set_timeout()
+                    self.__conn.send(b"%x\r\n" % len(data) + data + b"\r\n")
+                except Exception as e:
+                    self.__fail(e)
+        elif data:
+            if self.gzip_min_size is not None and len(data) >= self.gzip_min_size:
+                compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+                data = compressor.compress(data) + compressor.flush()
+                self.headers = dict(self.headers)
+                self.headers["Content-Encoding"] = "gzip"
+            self.__body = data
+
+    def finish(self, on_data=None):
+        """
+        Complete the request and return the HttpResult for the response.
+        If on_data is given, it is called with each block of the response
+        body as soon as it is received. A compressed body is decompressed
+        as it is read. The connection is returned to the pool if the server
+        keeps it open.
+        """
+        self.__check_cancelled()
+        try:
+            http_response = self.__get_response()
+            headers = dict(http_response.getheaders())
+            decompressor = _Decompressor.for_encoding(http_response.getheader("Content-Encoding"))
+            if on_data is None and decompressor is None and self.deadline is None:
+                body = http_response.read()
+            else:
+                body = self.__read_blocks(http_response, on_data, decompressor)
+            if decompressor is not None:
+                # the body is no longer encoded, so neither header applies
+                for key in list(headers.keys()):
+                    if key.lower() in ("content-encoding", "content-length"):
+                        del headers[key]
+            result = HttpResult(http_response.status, http_response.reason, headers, body)
+        except Exception as e:
+            self.__fail(e)
+
+        # once the connection is back in the pool, cancel() must leave it alone
+        with self.__lock:
+            cancelled = self.__done
+            self.__done = True
+        if http_response.will_close or cancelled:
+            self.__conn.close()
+        else:
+            self.__pool.release(self.__purl, self.__conn)
+        return result
+
+    def cancel(self):
+        """
+        Abort the exchange from another thread, e.g., when a hedged request
+        has been answered first. A pending finish(), and any later send()
+        or finish(), raises RequestCancelled. Once finish() has returned,
+        the connection may be in use by another exchange, so cancel() does
+        nothing.
+        """
+        with self.__lock:
+            if self.__done:
+                return
+            self.__done = True
+            self.__cancelled = True
+        sock = self.__conn.sock
+        if sock is not None:
+            try:
+                # shutting down wakes up a thread that is blocked reading
+                sock.shutdown(socket.SHUT_RDWR)
+            except (OSError, socket.error):
+                pass
+        self.__conn.close()
+
+    def __read_blocks(self, http_response, on_data, decompressor=None):
+        """
+        Read the response body as it arrives, rather than all at once.
+        """
+        # read1() returns whatever is available, without waiting for a full block
+        read = getattr(http_response, "read1", http_response.read)
+        blocks = []
+        while True:
+            if self.deadline is not None:
+                self.__set_timeout()
+            data = read(self.BLOCK_SIZE)
+            if decompressor is not None:
+                data = decompressor.decompress(data) if data else decompressor.flush()
+            if data:
+                blocks.append(data)
+                if on_data is not None:
+                    on_data(data)
+            elif decompressor is None or decompressor.finished:
+                # read1() leaves a complete response open, which blocks the next
+                # request on this connection, so close the response explicitly
+                http_response.close()
+                return b"".join(blocks)
+
+    def __get_response(self):
+        """
+        Send the request body and return the HTTP response. A request on a
+        pooled connection that the server has closed is retried once on a
+        new connection, if it failed while the request was being written.
+        Once the whole request has been sent, the server may have acted on
+        it, so an error while waiting for the response is never retried,
+        and neither is a timeout or a body that has already been streamed.
+        """
+        try:
+            self.__set_timeout()
+            if self.chunked:
+                # make sure we add a final empty chunk for chunked encoding
+                self.__conn.send(b"0\r\n\r\n")
+            else:
+                self.__conn.request("POST", self.path, self.__body, self.headers)
+        except (socket.error, httplib.HTTPException) as e:
+            if self.chunked or not self.__reused or isinstance(e, socket.timeout):
+                raise
+        else:
+            return self.__conn.getresponse()
+
+        self.__conn.close()
+        self.__conn, self.__reused = self.__pool.acquire(self.__purl, reuse=False, timeout=self.__remaining())
+        self.__conn.request("POST", self.path, self.__body, self.headers)
+        return self.__conn.getresponse()
+
+    def __remaining(self):
+        """
+        Return the number of seconds left before the deadline, or None if
+        there is no deadline. Raises DeadlineExceeded once it has passed.
+        """
+        if self.deadline is None:
+            return None
+        remaining = self.deadline - _clock()
+        if remaining <= 0:
+            raise DeadlineExceeded("Deadline exceeded for POST %s" % self.url)
+        return remaining
+
+    def __set_timeout(self):
+        """
+        Limit the next socket operation to the time left before the deadline.
+        """
+        remaining = self.__remaining()
+        if remaining is not None and self.__conn.sock is not None:
+            self.__conn.sock.settimeout(remaining)
+
+    def __check_cancelled(self):
+        if self.__cancelled:
+            raise RequestCancelled("POST %s was cancelled" % self.url)
+
+    def __fail(self, error):
+        """
+        Close the connection after an error, and raise RequestCancelled if
+        the exchange was cancelled, or DeadlineExceeded if the error is a
+        timeout caused by the deadline.
+        """
+        self.__conn.close()
+        self.__check_cancelled()
+        if self.deadline is not None and isinstance(error, socket.timeout) \
+                and not isinstance(error, DeadlineExceeded):
+            raise DeadlineExceeded("Deadline exceeded for POST %s" % self.url)
+        raise error
+
+class _Decompressor(object):
+    """
+    Decompress a gzip or deflate encoded response body block by block.
+    """
+    def __init__(self, wbits):
+        self.__wbits = wbits
+        self.__decompressor = zlib.decompressobj(wbits)
+        self.__started = False
+        self.finished = False
+
+    @classmethod
+    def for_encoding(cls, encoding):
+        """
+        Return a decompressor for a Content-Encoding, or None if the body
+        is not compressed.
+        """
+        encoding = (encoding or "").strip().lower()
+        if encoding in ("gzip", "x-gzip"):
+            return cls(16 + zlib.MAX_WBITS)
+        if encoding == "deflate":
+            return cls(zlib.MAX_WBITS)
+        return None
+
+    def decompress(self, data):
+        try:
+            result = self.__decompressor.decompress(data)
+        except zlib.error:
+            # some servers send deflate without the zlib wrapper
+            if self.__started or self.__wbits != zlib.MAX_WBITS:
+                raise
+            self.__wbits = -zlib.MAX_WBITS
+            self.__decompressor = zlib.decompressobj(self.__wbits)
+            result = self.__decompressor.decompress(data)
+        self.__started = True
+        return result
+
+    def flush(self):
+        self.finished = True
+        return self.__decompressor.flush()
+
+# the compression level for request bodies, which favors speed over size
+GZIP_LEVEL = 5
+
+class HttpTransport(object):
+    """
+    Send HTTPS requests to the Web API over keep-alive connections from a
+    ConnectionPool, which is shared by all transports by default.
+
+    Responses are requested with gzip or deflate compression unless
+    accept_compression is False, and are decompressed as they arrive.
+    Set gzip_min_size to gzip request bodies of at least that many bytes,
+    e.g., large set_entities() requests, while small bodies are sent as-is.
+    """
+    def __init__(self, pool=None, accept_compression=True, gzip_min_size=None):
+        self.pool = pool if pool is not None else DEFAULT_POOL
+        self.accept_compression = accept_compression
+        self.gzip_min_size = gzip_min_size
+
+    def open(self, url, query_params, headers, deadline=None):
+        """
+        Start a POST request to the given URL and return an HttpExchange
+        to send the body and receive the response, before the deadline
+        if one is given.
+        """
+        purl = urlparse.urlparse(url)
+        path = purl.path
+        if query_params:
+            path += "?" + urlencode(query_params)
+
+        if self.accept_compression and "Accept-Encoding" not in headers:
+            headers = dict(headers)
+            headers["Accept-Encoding"] = "gzip, deflate"
+
+        return HttpExchange(self.pool, purl, "https://%s%s" % (purl.netloc, path), path, headers,
+                            self.gzip_min_size, deadline)
+
+    def warm_up(self, url, count=1):
+        """
+        Open count connections to the host of the URL ahead of the first request.
+        """
+        self.pool.warm_up(url, count)
+
+def warm_up(count=1, url=None):
+    """
+    Open and TLS-handshake count connections to the Web API in the default
+    pool, e.g., when a worker process starts, so that the first requests
+    do not pay for a full TCP and TLS handshake.
+    """
+    DEFAULT_POOL.warm_up(url or VersionInfo().api_base_url, count)
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+#
+# Keep conversations started ahead of the participants who need them.
+#
+# Copyright (c) 2016 PullString, Inc.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+"""
+A pool of pre-started conversations, for new sessions without a round trip.
+"""
+
+import copy
+import threading
+import collections
+
+from ._compat import clock as _clock
+from .conversation import Conversation
+
+
+class ConversationPool(object):
+    """
+    Keep up to size conversations of a project that have already been
+    started, with the response to start(), so that a new session gets
+    its initial content without waiting for a request to the Web API.
+
+    A background thread starts conversations with a copy of the request
+    until size are ready, and starts more as they are taken. The request
+    should not set a participant_id, since every conversation would then
+    share it. Conversations that have been ready for max_age seconds are
+    discarded, so that none is handed out after the Web API has expired
+    it; keep max_age well below the server's session timeout. After a
+    failed start, the thread waits retry_delay seconds before it tries
+    again.
+
+    New conversations are created with factory, which defaults to
+    Conversation, so they can be given a transport or rate limiter.
+    """
+    def __init__(self, project_id, request, size=4, max_age=300.0, factory=None, retry_delay=1.0):
+        self.project_id = project_id
+        self.request = request
+        self.size = size
+        self.max_age = max_age
+        self.factory = factory or Conversation
+        self.retry_delay = retry_delay
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.last_error = None
+        self.__ready = collections.deque()
+        self.__closed = False
+        self.__cond = threading.Condition()
+
+        self.__thread = threading.Thread(target=self.__refill)
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def __len__(self):
+        with self.__cond:
+            self.__expire()
+            return len(self.__ready)
+
+    def get(self):
+        """
+        Return a (conversation, response) tuple for a new session, where
+        response is the result of start(). If no pre-started conversation
+        is ready, a new one is started before returning.
+        """
+        with self.__cond:
+            self.__expire()
+            if self.__ready:
+                started, conv, response = self.__ready.popleft()
+                self.hits += 1
+                self.__cond.notify_all()
+                return conv, response
+            self.misses += 1
+        return self.__start()
+
+    def wait(self, count=None, timeout=None):
+        """
+        Wait until count conversations (by default, size) are ready, and
+        return True, or False if the timeout in seconds expired first.
+        """
+        count = self.size if count is None else count
+        deadline = None if timeout is None else _clock() + timeout
+        with self.__cond:
+            while len(self.__ready) < count:
+                remaining = None if deadline is None else deadline - _clock()
+                if self.__closed or (remaining is not None and remaining <= 0):
+                    return False
+                self.__cond.wait(remaining)
+            return True
+
+    def close(self):
+        """
+        Stop starting conversations and discard the ones that are ready.
+        """
+        with self.__cond:
+            self.__closed = True
+            self.__ready.clear()
+            self.__cond.notify_all()
+        self.__thread.join()
+
+    def __start(self):
+        """
+        Start a new conversation and return it with its initial response.
+        """
+        conv = self.factory()
+        response = conv.start(self.project_id, copy.copy(self.request))
+        return conv, response
+
+    def __expire(self):
+        """
+        Discard the conversations that have been ready for max_age seconds.
+        The oldest ones are at the front, so stop at the first young one.
+        """
+        oldest = _clock() - self.max_age
+        while self.__ready and self.__ready[0][0] <= oldest:
+            self.__ready.popleft()
+            self.expired += 1
+
+    def __refill(self):
+        """
+        Start conversations in the background until the pool is closed.
+        """
+        while True:
+            with self.__cond:
+                while not self.__closed:
+                    self.__expire()
+                    if len(self.__ready) < self.size:
+                        break
+                    # wake up when the oldest conversation expires, if not before
+                    self.__cond.wait(self.__ready[0][0] + self.max_age - _clock())
+                if self.__closed:
+                    return
+
+            try:
+                conv, response = self.__start()
+                error = None if response.status.success else response.status.error_message
+            except Exception as e:
+                error = e
+
+            with self.__cond:
+                if error is not None:
+                    self.last_error = error
+                    # get() wakes the thread too, so wait out the whole delay
+                    retry = _clock() + self.retry_delay
+                    while not self.__closed and retry > _clock():
+                        self.__cond.wait(retry - _clock())
+                elif not self.__closed:
+                    self.__ready.append((_clock(), conv, response))
+                    self.__cond.notify_all()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+#
+# Tests for the audio asset prefetcher and its on-disk cache
+#
+# Copyright (c) 2016, PullString, Inc. All rights reserved.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+sys.path.insert(0, os.path.abspath('..'))
+import pullstring
+from webapi_server import WebAPITestMixin
+
+try:
+    from urllib.request import pathname2url
+except ImportError:
+    from urllib import pathname2url
+
+class TestAudioPrefetch(WebAPITestMixin, unittest.TestCase):
+    """
+    Fetch dialog audio from file:// URIs that stand in for the asset server.
+    """
+
+    def setUp(self):
+        self.assets = tempfile.mkdtemp()
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.assets)
+        shutil.rmtree(self.cache_dir)
+
+    def make_asset(self, name, data):
+        path = os.path.join(self.assets, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return "file:" + pathname2url(path)
+
+    def test_cache_evicts_least_recently_used(self):
+        cache = pullstring.AudioCache(self.cache_dir, max_bytes=10)
+        cache.put("a", "1", b"aaaa")
+        cache.put("b", "1", b"bbbb")
+        self.assertIsNotNone(cache.get("a", "1"))
+        cache.put("c", "1", b"cccc")
+
+        self.assertIsNotNone(cache.get("a", "1"))
+        self.assertIsNone(cache.get("b", "1"))
+        self.assertIsNone(cache.get("a", "2"))
+        self.assertEqual(cache.size, 8)
+
+        # a new cache instance picks up the files already on disk
+        self.assertEqual(pullstring.AudioCache(self.cache_dir).size, 8)
+
+    def test_fetch_uses_cache(self):
+        uri = self.make_asset("yes.wav", b"RIFF-yes")
+        prefetcher = pullstring.AudioPrefetcher(pullstring.AudioCache(self.cache_dir))
+        path = prefetcher.fetch(uri, "etag-1").result(5)
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), b"RIFF-yes")
+
+        # once cached, the asset is served without fetching the URI again
+        os.remove(os.path.join(self.assets, "yes.wav"))
+        prefetcher = pullstring.AudioPrefetcher(pullstring.AudioCache(self.cache_dir))
+        self.assertEqual(prefetcher.fetch(uri, "etag-1").result(5), path)
+        self.assertIsNotNone(prefetcher.fetch(uri, "etag-2").exception(5))
+        prefetcher.shutdown()
+
+    def test_conversation_prefetches_dialog_audio(self):
+        uri = self.make_asset("no.wav", b"RIFF-no")
+
+        def handler(request):
+            return 200, {"conversation": "conv-1", "etag": "build-1",
+                         "outputs": [{"type": "dialog", "text": "Hello", "uri": uri}]}
+
+        self.start_server(handler)
+        conv = pullstring.Conversation()
+        conv.audio_prefetcher = pullstring.AudioPrefetcher(pullstring.AudioCache(self.cache_dir))
+        response = conv.start("project", pullstring.Request(api_key="key"))
+
+        with conv.audio_prefetcher.open(response.outputs[0]) as f:
+            self.assertEqual(f.read(), b"RIFF-no")
+        self.assertIsNotNone(conv.audio_prefetcher.cache.get(uri, "build-1"))
+        conv.audio_prefetcher.shutdown()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+#
+# Tests for streaming dialog audio while it downloads
+#
+# Copyright (c) 2016, PullString, Inc. All rights reserved.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+import os
+import sys
+import time
+import struct
+import threading
+import unittest
+sys.path.insert(0, os.path.abspath('..'))
+import pullstring
+from webapi_server import WebAPIServer
+
+def make_wav(seconds, sample_rate=16000):
+    """
+    Return a WAV file of 16-bit mono audio, with a counting byte pattern.
+    """
+    data = bytes(bytearray(x % 251 for x in range(int(seconds * sample_rate) * 2)))
+    header = b"RIFF" + struct.pack('<L', 36 + len(data)) + b"WAVE"
+    header += b"fmt " + struct.pack('<LHHLLHH', 16, 1, 1, sample_rate, sample_rate * 2, 2, 16)
+    return header + b"data" + struct.pack('<L', len(data)) + data
+
+def make_output(uri, duration):
+    output = pullstring.DialogOutput()
+    output.uri = uri
+    output.duration = duration
+    for name, seconds in [("p", 0.0), ("aa", 0.25), ("m", 0.5)]:
+        phoneme = pullstring.Phoneme()
+        phoneme.name = name
+        phoneme.seconds = seconds
+        output.phonemes.append(phoneme)
+    return output
+
+class TestRingBuffer(unittest.TestCase):
+    """
+    Check wrap-around, backpressure, and closing of the ring buffer.
+    """
+
+    def test_wrap_around(self):
+        ring = pullstring.RingBuffer(8)
+        ring.write(b"abcdef")
+        self.assertEqual(ring.read(4), b"abcd")
+        ring.write(b"ghijkl")
+        self.assertEqual(len(ring), 8)
+        self.assertEqual(ring.read(8), b"efghijkl")
+
+    def test_backpressure_and_close(self):
+        ring = pullstring.RingBuffer(4)
+        writer = threading.Thread(target=ring.write, args=(b"0123456789",))
+        writer.start()
+        time.sleep(0.05)
+        self.assertTrue(writer.is_alive())
+        self.assertEqual(ring.read(6), b"012345")
+        self.assertEqual(ring.read(4), b"6789")
+        writer.join()
+        ring.close(IOError("dropped"))
+        self.assertRaises(IOError, ring.read, 1)
+
+class TestAudioStream(unittest.TestCase):
+    """
+    Stream WAV files from the local stand-in server.
+    """
+
+    def setUp(self):
+        self.server = WebAPIServer().start()
+        self.wav = make_wav(1.0)
+        self.server.files["/audio/hello.wav"] = self.wav
+        self.uri = "https://localhost:%d/audio/hello.wav" % self.server.port
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_chunks_match_duration(self):
+        stream = pullstring.AudioStream(make_output(self.uri, 1.0))
+        chunks = list(stream.chunks(0.1))
+        self.assertEqual(len(chunks), 10)
+        self.assertEqual([round(start, 3) for start, data in chunks], [x / 10.0 for x in range(10)])
+        self.assertEqual(b"".join(data for start, data in chunks), self.wav[44:])
+        self.assertEqual(stream.bytes_per_second, 32000)
+        self.assertTrue(stream.clock.started)
+
+    def test_first_chunk_before_download_ends(self):
+        self.server.trickle = (4000, 0.02)
+        stream = pullstring.AudioStream(make_output(self.uri, 1.0), capacity=8192)
+        start = time.time()
+        chunks = iter(stream.chunks(0.05))
+        next(chunks)
+        first = time.time() - start
+        rest = list(chunks)
+        self.assertEqual(len(rest), 19)
+        self.assertTrue(time.time() - start > first * 2, first)
+
+    def test_resume_after_drop(self):
+        self.server.drop_after = 10000
+        stream = pullstring.AudioStream(make_output(self.uri, 1.0), capacity=4096)
+        data = b"".join(data for start, data in stream)
+        self.assertEqual(data, self.wav[44:])
+        gets = [r for r in self.server.requests if r.method == "GET"]
+        self.assertEqual(len(gets), 2)
+        self.assertEqual(gets[1].headers.get("Range"), "bytes=10000-")
+
+    def test_plain_http(self):
+        server = WebAPIServer(secure=False).start()
+        self.addCleanup(server.stop)
+        server.files["/audio/hello.wav"] = self.wav
+        uri = "http://localhost:%d/audio/hello.wav" % server.port
+        stream = pullstring.AudioStream(make_output(uri, 1.0))
+        self.assertEqual(b"".join(data for start, data in stream), self.wav[44:])
+        self.assertEqual([r.method for r in server.requests], ["GET"])
+
+    def test_missing_file(self):
+        stream = pullstring.AudioStream(make_output(self.uri + ".missing", 1.0))
+        self.assertRaises(IOError, stream.read, 100)
+
+class TestPlaybackClock(unittest.TestCase):
+    """
+    Check that the clock follows the phonemes of the output.
+    """
+
+    def test_viseme_follows_clock(self):
+        output = make_output("unused", 1.0)
+        clock = pullstring.PlaybackClock(output.timeline)
+        self.assertEqual(clock.position, 0.0)
+        clock.start(0.3)
+        self.assertEqual(clock.viseme(), output.timeline.viseme_at(0.3))
+        clock.sync(0.6)
+        self.assertTrue(0.6 <= clock.position < 0.7)
+        self.assertEqual(clock.viseme(), output.timeline.viseme_at(0.6))
+        clock.sync(5.0)
+        self.assertEqual(clock.position, 1.0)
+        self.assertTrue(clock.finished)
+
+if __name__ == '__main__':
+    unittest.main()
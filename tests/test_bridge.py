@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+#
+# Tests for the asyncio audio bridge, run against a local Web API stand-in
+#
+# Copyright (c) 2016, PullString, Inc. All rights reserved.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+import os
+import sys
+import time
+import threading
+import unittest
+sys.path.insert(0, os.path.abspath('..'))
+import pullstring
+from pullstring.transport import ConnectionPool
+from webapi_server import WebAPITestMixin
+
+# one 20 ms frame of 16-bit 16k audio per letter
+FRAMES = [letter.encode("ascii") * 640 for letter in "abcdefghij"]
+
+
+class SlowStart(pullstring.Conversation):
+    """
+    A conversation that takes a while to open an audio request, so that
+    frames pile up in the bridge.
+    """
+    def start_audio(self, request=None, timeout=None):
+        time.sleep(0.2)
+        pullstring.Conversation.start_audio(self, request, timeout)
+
+class TimedEnd(pullstring.Conversation):
+    """
+    A conversation that records when end_audio() returns or fails.
+    """
+    ended = None
+
+    def end_audio(self):
+        try:
+            return pullstring.Conversation.end_audio(self)
+        finally:
+            self.ended = time.time()
+
+class LateEnd(pullstring.Conversation):
+    """
+    A conversation that takes a while to return from end_audio() after
+    the response has been read, and its connection put back in the pool.
+    """
+    def end_audio(self):
+        response = pullstring.Conversation.end_audio(self)
+        time.sleep(0.3)
+        return response
+
+class Frames(object):
+    """
+    An async iterator over frames, which raises error at the end if set.
+    """
+    def __init__(self, frames, error=None):
+        self.frames = list(frames)
+        self.error = error
+
+    def __aiter__(self):
+        return self
+
+    def __anext__(self):
+        import asyncio
+        future = asyncio.get_event_loop().create_future()
+        if self.frames:
+            future.set_result(self.frames.pop(0))
+        elif self.error is not None:
+            future.set_exception(self.error)
+        else:
+            future.set_exception(StopAsyncIteration())
+        return future
+
+@unittest.skipIf(sys.version_info < (3, 5), "requires asyncio")
+class TestAudioBridge(WebAPITestMixin, unittest.TestCase):
+    """
+    Check that audio from asyncio code is streamed to the Web API.
+    """
+
+    def setUp(self):
+        import asyncio
+        self.asyncio = asyncio
+        self.delay = 0.0
+        self.server = self.start_server(self.handler)
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.threads = threading.active_count()
+        self.pool = ConnectionPool()
+
+    def tearDown(self):
+        self.pool.close()
+        self.asyncio.set_event_loop(None)
+        self.loop.close()
+
+    def handler(self, request):
+        if request.headers.get("Content-Type", "").startswith("audio/"):
+            time.sleep(self.delay)
+        return 200, {"conversation": "conv-1", "participant": "participant-1",
+                     "outputs": [{"type": "dialog", "id": "1", "text": "got %d bytes" % len(request.body)}]}
+
+    def new_conversation(self, factory=pullstring.Conversation):
+        conv = factory(pullstring.ClientConfig(pool=self.pool))
+        conv.start("project", pullstring.Request(api_key="key"))
+        return conv
+
+    def new_queue(self, frames, end=True):
+        queue = self.asyncio.Queue()
+        for frame in frames:
+            queue.put_nowait(frame)
+        if end:
+            queue.put_nowait(None)
+        return queue
+
+    def wait_for_threads(self):
+        # the server's connection threads exit once the pooled connections close
+        self.pool.close()
+        deadline = time.time() + 2.0
+        while threading.active_count() > self.threads and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(threading.active_count(), self.threads)
+
+    def test_queue_source(self):
+        bridge = pullstring.AudioBridge(self.new_conversation())
+        response = self.loop.run_until_complete(bridge.stream(self.new_queue(FRAMES)))
+        self.assertTrue(response.status.success)
+        self.assertEqual(response.outputs[0].text, "got 6400 bytes")
+        self.assertEqual(self.server.requests[-1].body, b"".join(FRAMES))
+        self.assertEqual((bridge.frames, bridge.dropped, bridge.bytes_sent), (10, 0, 6400))
+        self.wait_for_threads()
+
+    def test_async_iterator_source(self):
+        bridge = pullstring.AudioBridge(self.new_conversation())
+        response = self.loop.run_until_complete(bridge.stream(Frames(FRAMES)))
+        self.assertEqual(self.server.requests[-1].body, b"".join(FRAMES))
+        self.assertEqual(response.outputs[0].text, "got 6400 bytes")
+
+    def test_frames_from_callbacks(self):
+        # frames arrive in real time, as from a microphone callback
+        queue = self.asyncio.Queue()
+        for index, frame in enumerate(FRAMES + [None]):
+            self.loop.call_later(index * 0.02, queue.put_nowait, frame)
+        bridge = pullstring.AudioBridge(self.new_conversation())
+        self.loop.run_until_complete(bridge.stream(queue))
+        self.assertEqual(self.server.requests[-1].body, b"".join(FRAMES))
+
+    def test_block_policy(self):
+        bridge = pullstring.AudioBridge(self.new_conversation(SlowStart), max_frames=3)
+        self.loop.run_until_complete(bridge.stream(self.new_queue(FRAMES)))
+        self.assertEqual(self.server.requests[-1].body, b"".join(FRAMES))
+        self.assertEqual(bridge.dropped, 0)
+
+    def test_drop_policy(self):
+        bridge = pullstring.AudioBridge(self.new_conversation(SlowStart), max_frames=3,
+                                        policy=pullstring.POLICY_DROP)
+        self.loop.run_until_complete(bridge.stream(self.new_queue(FRAMES)))
+        self.assertEqual(self.server.requests[-1].body, b"".join(FRAMES[-3:]))
+        self.assertEqual((bridge.frames, bridge.dropped, bridge.bytes_sent), (10, 7, 1920))
+        self.assertRaises(ValueError, pullstring.AudioBridge, None, policy="spill")
+
+    def test_cancel_upload(self):
+        conv = self.new_conversation()
+        queue = self.new_queue(FRAMES[:2], end=False)
+        future = pullstring.AudioBridge(conv).stream(queue)
+        self.loop.run_until_complete(self.asyncio.sleep(0.1))
+        future.cancel()
+        self.loop.run_until_complete(self.asyncio.sleep(0))
+        self.assertTrue(future.cancelled())
+
+        # the server sees the upload cut short, and the conversation is still usable
+        deadline = time.time() + 2.0
+        while self.server.truncated_uploads == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.server.truncated_uploads, 1)
+        self.wait_for_threads()
+        self.assertTrue(conv.send_text("hello").status.success)
+
+    def test_cancel_while_waiting(self):
+        self.delay = 1.0
+        conv = self.new_conversation(TimedEnd)
+        future = pullstring.AudioBridge(conv).stream(self.new_queue(FRAMES))
+        self.loop.run_until_complete(self.asyncio.sleep(0.2))
+        start = time.time()
+        future.cancel()
+        self.loop.run_until_complete(self.asyncio.sleep(0))
+        self.wait_for_threads()
+        self.assertTrue(conv.ended - start < 0.5, conv.ended - start)
+
+    def test_cancel_after_end(self):
+        conv = self.new_conversation(LateEnd)
+        future = pullstring.AudioBridge(conv).stream(self.new_queue(FRAMES))
+        self.loop.run_until_complete(self.asyncio.sleep(0.15))
+        future.cancel()
+        self.loop.run_until_complete(self.asyncio.sleep(0.3))
+        self.assertTrue(future.cancelled())
+
+        # the connection went back to the pool and was not cut off
+        self.assertEqual(self.pool.idle_count(self.server.base_url), 1)
+        self.assertTrue(conv.send_text("hello").status.success)
+        self.assertEqual(len(set(r.client_address for r in self.server.requests)), 1)
+        self.assertEqual(self.server.truncated_uploads, 0)
+
+    def test_cancel_task(self):
+        conv = self.new_conversation()
+        bridge = pullstring.AudioBridge(conv)
+        queue = self.new_queue(FRAMES, end=False)
+        task = self.loop.create_task(self.asyncio.wait_for(bridge.stream(queue), 0.1))
+        self.assertRaises(self.asyncio.TimeoutError, self.loop.run_until_complete, task)
+        self.wait_for_threads()
+
+    def test_source_error(self):
+        conv = self.new_conversation()
+        future = pullstring.AudioBridge(conv).stream(Frames(FRAMES[:2], error=IOError("microphone unplugged")))
+        self.assertRaises(IOError, self.loop.run_until_complete, future)
+        self.wait_for_threads()
+        self.assertTrue(conv.send_text("hello").status.success)
+
+if __name__ == '__main__':
+    unittest.main()
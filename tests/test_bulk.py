@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+#
+# Tests for bulk entity requests, run against a local Web API stand-in
+#
+# Copyright (c) 2016, PullString, Inc. All rights reserved.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+import os
+import sys
+import time
+import threading
+import unittest
+sys.path.insert(0, os.path.abspath('..'))
+import pullstring
+from webapi_server import WebAPITestMixin
+
+class TestBulkEntities(WebAPITestMixin, unittest.TestCase):
+    """
+    Check that many entities are sent in bounded, parallel requests.
+    """
+
+    def setUp(self):
+        self.values = {}
+        self.lock = threading.Lock()
+        self.server = self.start_server(self.handler)
+
+        self.conv = pullstring.Conversation()
+        self.conv.start("project", pullstring.Request(api_key="key"))
+
+    def handler(self, request):
+        body = request.json
+        if body.get("get_entities") == ["Broken"]:
+            return 400, {"error": {"status": 400, "message": "Unknown entity"}}
+        with self.lock:
+            self.values.update(body.get("set_entities", {}))
+            names = list(body.get("set_entities", {}).keys()) + body.get("get_entities", [])
+            entities = dict((name, self.values[name]) for name in names if name in self.values)
+        return 200, {"conversation": "conv-1", "entities": entities}
+
+    def entity_bodies(self):
+        return [r.json for r in self.server.requests[1:]]
+
+    def test_set_mapping(self):
+        result = self.conv.set_entity_values({"NAME": "Jill", "Score": 7, "Ready": True})
+        self.assertTrue(result.status.success)
+        self.assertEqual(self.entity_bodies(), [{"set_entities": {"NAME": "Jill", "Score": 7, "Ready": True}}])
+        self.assertEqual(result["Score"], 7)
+        self.assertEqual(result.type_of("Ready"), pullstring.ENTITY_FLAG)
+        self.assertEqual(result.columns(["NAME", "Missing"]), (["NAME", "Missing"], ["Jill", None]))
+
+    def test_set_columns_in_parallel_batches(self):
+        names = ["Counter %d" % x for x in range(250)]
+        values = list(range(250))
+        in_flight = []
+
+        def handler(request):
+            # hold each batch until all three have arrived, or a second has passed,
+            # and note how many batches the server had received by then
+            deadline = time.time() + 1
+            while len(self.server.requests) < 4 and time.time() < deadline:
+                time.sleep(0.01)
+            in_flight.append(len(self.server.requests) - 1)
+            return self.handler(request)
+        self.server.handler = handler
+        result = self.conv.set_entity_values((names, values), batch_size=100)
+
+        bodies = self.entity_bodies()
+        self.assertEqual(sorted(len(body["set_entities"]) for body in bodies), [50, 100, 100])
+        self.assertEqual(len(result), 250)
+        self.assertEqual(result["Counter 249"], 249)
+        self.assertEqual(in_flight, [3, 3, 3])
+
+    def test_get_values(self):
+        self.values = dict(("Flag %d" % x, x % 2 == 0) for x in range(10))
+        result = self.conv.get_entity_values(["Flag %d" % x for x in range(10)], batch_size=4)
+        self.assertEqual(len(self.entity_bodies()), 3)
+        self.assertEqual(result.values, self.values)
+        self.assertEqual(self.conv.entity_schema.type_of("Flag 3"), pullstring.ENTITY_FLAG)
+        self.assertEqual(self.conv.get_entity_values([]).values, {})
+
+    def test_schema_rejects_wrong_type(self):
+        schema = pullstring.EntitySchema()
+        self.conv.entity_schema = schema
+        self.conv.set_entity_values({"Score": 1, "NAME": "Jill"})
+        self.assertRaises(TypeError, self.conv.set_entity_values, {"Score": "high"})
+        self.assertRaises(TypeError, self.conv.set_entity_values, {"NAME": True})
+        self.assertRaises(TypeError, self.conv.set_entity_values, {"NAME": ["red"]})
+        self.assertRaises(TypeError, self.conv.set_entity_values, {"Colors": {"red": 1}})
+        self.assertRaises(ValueError, self.conv.set_entity_values, (["A", "B"], [1]))
+        self.assertEqual(len(self.entity_bodies()), 1)
+        self.assertEqual(schema.types, {"Score": pullstring.ENTITY_COUNTER, "NAME": pullstring.ENTITY_LABEL})
+
+    def test_set_list(self):
+        result = self.conv.set_entity_values({"Colors": ["red", "green"]})
+        self.assertTrue(result.status.success)
+        self.assertEqual(self.entity_bodies(), [{"set_entities": {"Colors": ["red", "green"]}}])
+        self.assertEqual(result["Colors"], ["red", "green"])
+        self.assertEqual(result.type_of("Colors"), pullstring.ENTITY_LIST)
+        self.assertRaises(TypeError, self.conv.set_entity_values, {"Colors": "red"})
+
+    def test_error_status(self):
+        self.values = {"NAME": "Jill"}
+        result = self.conv.get_entity_values(["NAME", "Broken"], batch_size=1)
+        self.assertFalse(result.status.success)
+        self.assertEqual(result.status.error_message, "Unknown entity")
+        self.assertEqual(result.values, {"NAME": "Jill"})
+
+    def test_entity_cache_invalidated(self):
+        self.conv.entity_cache = pullstring.EntityCache()
+        self.conv.set_entities([pullstring.Label("NAME", "Jack")])
+        self.conv.set_entity_values({"NAME": "Jill"})
+        self.assertEqual(self.conv.get_entities([pullstring.Label("NAME")]).get_entity("NAME").value, "Jill")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+#
+# Tests for coalescing streamed audio into chunks, with backpressure
+#
+# Copyright (c) 2016, PullString, Inc. All rights reserved.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+import os
+import sys
+import time
+import threading
+import unittest
+sys.path.insert(0, os.path.abspath('..'))
+import pullstring
+from pullstring.transport import HttpResult
+from webapi_server import WebAPITestMixin
+
+class FakeExchange(object):
+    """
+    A chunked exchange that records each chunk, taking delay seconds per send.
+    """
+    def __init__(self, delay=0.0, error=None):
+        self.url = "https://localhost/v1/conversation"
+        self.chunked = True
+        self.delay = delay
+        self.error = error
+        self.chunks = []
+
+    def send(self, data):
+        if self.error is not None:
+            raise self.error
+        time.sleep(self.delay)
+        self.chunks.append(data)
+
+    def finish(self, on_data=None):
+        return HttpResult(200, "OK", {}, b"{}")
+
+class TestChunkWriter(unittest.TestCase):
+    """
+    Check coalescing, timed flushes, backpressure, and errors.
+    """
+
+    def test_coalesce_small_writes(self):
+        exchange = FakeExchange()
+        writer = pullstring.ChunkWriter(exchange, chunk_size=3200)
+        for x in range(100):
+            writer.write(b"\1" * 320)
+        self.assertEqual(writer.finish().status, 200)
+        self.assertEqual(sum(len(chunk) for chunk in exchange.chunks), 32000)
+        self.assertTrue(len(exchange.chunks) <= 12, len(exchange.chunks))
+        self.assertEqual(writer.stats.bytes_written, 32000)
+        self.assertEqual(writer.stats.bytes_sent, 32000)
+        self.assertEqual(writer.stats.chunks_sent, len(exchange.chunks))
+
+    def test_flush_on_timer(self):
+        now = [100.0]
+        exchange = FakeExchange()
+        writer = pullstring.ChunkWriter(exchange, chunk_size=3200, flush_interval=0.05, clock=lambda: now[0])
+        writer.write(b"\1" * 320)
+
+        # nothing is sent until flush_interval has passed by the writer's clock
+        time.sleep(0.15)
+        self.assertEqual(exchange.chunks, [])
+        now[0] += 0.05
+        deadline = time.time() + 5
+        while not exchange.chunks and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(exchange.chunks, [b"\1" * 320])
+        writer.finish()
+        self.assertEqual(exchange.chunks, [b"\1" * 320])
+
+    def test_backpressure(self):
+        exchange = FakeExchange(delay=0.02)
+        writer = pullstring.ChunkWriter(exchange, chunk_size=1000, max_buffered=4000)
+        for x in range(20):
+            writer.write(b"\1" * 1000)
+            self.assertTrue(writer.stats.buffered <= 5000)
+        writer.finish()
+        self.assertTrue(writer.stats.blocked_time > 0)
+        self.assertTrue(writer.stats.max_buffered <= 5000)
+        self.assertEqual(writer.stats.bytes_sent, 20000)
+        self.assertTrue(writer.stats.mean_chunk_size > 1000)
+        self.assertTrue(writer.stats.throughput > 0)
+
+    def test_cancel_wakes_blocked_writer(self):
+        exchange = FakeExchange(delay=0.5)
+        writer = pullstring.ChunkWriter(exchange, chunk_size=100, max_buffered=200)
+        errors = []
+
+        def produce():
+            try:
+                while True:
+                    writer.write(b"\1" * 100)
+            except Exception as e:
+                errors.append(e)
+        producer = threading.Thread(target=produce)
+        producer.start()
+        deadline = time.time() + 5
+        while writer.stats.buffered < 200 and time.time() < deadline:
+            time.sleep(0.01)
+
+        # the blocked producer fails, and so does any later call
+        writer.cancel()
+        producer.join(5)
+        self.assertFalse(producer.is_alive())
+        self.assertTrue(isinstance(errors[0], pullstring.RequestCancelled))
+        self.assertRaises(pullstring.RequestCancelled, writer.write, b"\1")
+        self.assertRaises(pullstring.RequestCancelled, writer.finish)
+
+    def test_send_error(self):
+        writer = pullstring.ChunkWriter(FakeExchange(error=IOError("reset")), chunk_size=10)
+        writer.write(b"\1" * 10)
+        time.sleep(0.05)
+        self.assertRaises(IOError, writer.write, b"\1")
+        self.assertRaises(IOError, writer.finish)
+
+class TestConversationAudio(WebAPITestMixin, unittest.TestCase):
+    """
+    Check that streamed audio reaches the Web API intact.
+    """
+
+    def setUp(self):
+        self.server = self.start_server()
+
+    def test_stream_audio(self):
+        conv = pullstring.Conversation()
+        conv.audio_chunk_size = pullstring.AUDIO_CHUNK_SIZE
+        conv.start("project", pullstring.Request(api_key="key"))
+        audio = bytes(bytearray(x % 256 for x in range(16000)))
+        conv.start_audio()
+        for offset in range(0, len(audio), 160):
+            conv.add_audio(audio[offset:offset + 160])
+        self.assertTrue(conv.end_audio().status.success)
+        self.assertEqual(self.server.requests[-1].body, audio)
+        self.assertEqual(conv.audio_stats.bytes_sent, 16000)
+        self.assertTrue(conv.audio_stats.chunks_sent <= 6)
+
+        # without coalescing, every piece is its own chunk
+        conv.audio_chunk_size = 0
+        conv.send_audio(audio)
+        self.assertEqual(self.server.requests[-1].body, audio)
+        self.assertEqual(conv.audio_stats.bytes_sent, 16000)
+
+    def test_add_audio_after_cancel(self):
+        conv = pullstring.Conversation()
+        conv.audio_chunk_size = pullstring.AUDIO_CHUNK_SIZE
+        conv.start("project", pullstring.Request(api_key="key"))
+        conv.start_audio()
+        conv.add_audio(b"\1" * 320)
+        conv.cancel_audio()
+
+        # more audio than the writer buffers fails at once, rather than blocking
+        for x in range(3):
+            self.assertRaises(pullstring.RequestCancelled, conv.add_audio, b"\1" * 32000)
+        self.assertRaises(pullstring.RequestCancelled, conv.end_audio)
+
+    def test_add_audio_after_cancel_unbuffered(self):
+        conv = pullstring.Conversation()
+        conv.start("project", pullstring.Request(api_key="key"))
+        conv.start_audio()
+        conv.add_audio(b"\1" * 320)
+        conv.cancel_audio()
+
+        # nothing more is sent, on this connection or a new one
+        self.assertRaises(pullstring.RequestCancelled, conv.add_audio, b"\1" * 320)
+        self.assertRaises(pullstring.RequestCancelled, conv.end_audio)
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertTrue(conv.send_text("hello").status.success)
+        self.assertEqual(self.server.requests[-1].json, {"text": "hello"})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+#
+# Tests for coalescing requests, run against a local Web API stand-in
+#
+# Copyright (c) 2016, PullString, Inc. All rights reserved.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+import os
+import sys
+import time
+import threading
+import unittest
+sys.path.insert(0, os.path.abspath('..'))
+import pullstring
+from webapi_server import WebAPITestMixin
+
+class TestCoalesce(WebAPITestMixin, unittest.TestCase):
+    """
+    Check that compatible requests are merged and each caller gets its response.
+    """
+
+    def setUp(self):
+        self.values = {"Player Score": 4, "NAME": "Jack", "Color": "Green"}
+        self.delay = 0.0
+        self.server = self.start_server(self.handler)
+
+        self.conv = pullstring.Conversation()
+        self.conv.coalesce = True
+        self.conv.start("project", pullstring.Request(api_key="key"))
+
+    def handler(self, request):
+        time.sleep(self.delay)
+        body = request.json
+        self.values.update(body.get("set_entities", {}))
+        entities = dict((name, self.values[name]) for name in body.get("get_entities", []))
+        return 200, {"conversation": "conv-1", "entities": entities}
+
+    def sent_bodies(self):
+        return [r.json for r in self.server.requests[1:]]
+
+    def test_set_entities_merged_with_event(self):
+        set_response = self.conv.set_entities([pullstring.Label("NAME", "Jill")])
+        self.assertEqual(self.sent_bodies(), [])
+
+        self.conv.send_event("restart_game")
+        self.assertEqual(self.sent_bodies(), [{"event": {"name": "restart_game", "parameters": {}},
+                                               "set_entities": {"NAME": "Jill"}}])
+        self.assertEqual(set_response.conversation_id, "conv-1")
+        self.assertTrue(set_response.status.success)
+
+    def test_set_entities_merged_with_intent(self):
+        self.conv.set_entities([pullstring.Counter("Player Score", 5)])
+        self.conv.send_intent("Favorite Color", [pullstring.Label("Color", "Red")])
+        self.assertEqual(self.sent_bodies()[0]["set_entities"], {"Player Score": 5, "Color": "Red"})
+
+    def test_queued_entities_sent_before_other_requests(self):
+        self.conv.set_entities([pullstring.Label("NAME", "Jill")])
+        self.conv.send_text("hello")
+        self.assertEqual(self.sent_bodies(), [{"set_entities": {"NAME": "Jill"}}, {"text": "hello"}])
+        self.assertIsNone(self.conv.flush())
+
+    def test_queued_response_is_pending(self):
+        response = self.conv.set_entities([pullstring.Label("NAME", "Jill")])
+        self.assertTrue(response.status.pending)
+        self.assertFalse(response.status.success)
+        self.assertFalse(response.wait(0.01))
+
+        flusher = threading.Timer(0.05, self.conv.flush)
+        flusher.start()
+        self.assertTrue(response.wait(5))
+        flusher.join()
+        self.assertTrue(response.status.success)
+        self.assertEqual(self.sent_bodies(), [{"set_entities": {"NAME": "Jill"}}])
+
+    def test_entities_queued_before_start(self):
+        conv = pullstring.Conversation()
+        conv.coalesce = True
+        response = conv.set_entities([pullstring.Label("NAME", "Jill")])
+        conv.start("project", pullstring.Request(api_key="key"))
+
+        # the values wait for the new conversation, rather than going to the bare endpoint
+        paths = [r.path.split("?")[0] for r in self.server.requests[1:]]
+        self.assertEqual(paths, ["/v1/conversation", "/v1/conversation/conv-1"])
+        self.assertEqual(self.server.requests[-1].json, {"set_entities": {"NAME": "Jill"}})
+        self.assertTrue(response.wait(0))
+        self.assertTrue(response.status.success)
+
+    def test_get_after_queued_set(self):
+        self.delay = 0.2
+        reader = threading.Thread(target=self.conv.get_entities, args=([pullstring.Entity("NAME", "")],))
+        reader.start()
+        deadline = time.time() + 5
+        while len(self.server.requests) < 2 and time.time() < deadline:
+            time.sleep(0.01)
+
+        # the request in flight predates the new value, so it is not shared
+        self.conv.set_entities([pullstring.Label("NAME", "Jill")])
+        response = self.conv.get_entities([pullstring.Entity("NAME", "")])
+        reader.join()
+        self.assertEqual([e.value for e in response.entities], ["Jill"])
+        self.assertEqual(self.sent_bodies(), [{"get_entities": ["NAME"]}, {"set_entities": {"NAME": "Jill"}},
+                                              {"get_entities": ["NAME"]}])
+
+    def test_set_entities_request_rejected(self):
+        self.assertRaises(ValueError, self.conv.set_entities, [pullstring.Label("NAME", "Jill")],
+                          pullstring.Request(api_key="key"))
+
+    def test_pooled_responses_are_not_shared(self):
+        pool = pullstring.ResponsePool(debug=True)
+        self.conv.response_pool = pool
+        self.server.handler = lambda request: (200, {"conversation": "conv-1",
+                                                     "entities": request.json.get("set_entities", {})})
+        first = self.conv.set_entities([pullstring.Label("NAME", "Jill")])
+        second = self.conv.set_entities([pullstring.Label("Color", "Red")])
+        event_response = self.conv.send_event("restart_game")
+
+        # releasing the merged response leaves the queued responses intact
+        pool.release(event_response)
+        for response in [first, second]:
+            self.assertTrue(response.status.success)
+            self.assertEqual(sorted((e.name, e.value) for e in response.entities),
+                             [("Color", "Red"), ("NAME", "Jill")])
+        self.assertFalse(first.entities[0] is second.entities[0])
+
+    def test_concurrent_get_entities(self):
+        self.delay = 0.2
+        results = {}
+
+        def get(names):
+            results[tuple(names)] = self.conv.get_entities([pullstring.Entity(name, "") for name in names])
+
+        threads = [threading.Thread(target=get, args=(names,))
+                   for names in [["NAME"], ["Player Score"], ["Color"], ["NAME", "Color"]]]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.02)
+        for thread in threads:
+            thread.join()
+
+        # the first request is in flight while the others are combined into one
+        self.assertLessEqual(len(self.sent_bodies()), 2)
+        self.assertEqual([e.value for e in results[("NAME",)].entities], ["Jack"])
+        self.assertEqual([e.value for e in results[("Player Score",)].entities], [4])
+        self.assertEqual(sorted(e.name for e in results[("NAME", "Color")].entities), ["Color", "NAME"])
+
+if __name__ == '__main__':
+    unittest.main()
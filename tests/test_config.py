@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+#
+# Tests for per-client configuration, run against local Web API stand-ins
+#
+# Copyright (c) 2016, PullString, Inc. All rights reserved.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+import os
+import ssl
+import sys
+import time
+import socket
+import unittest
+sys.path.insert(0, os.path.abspath('..'))
+import pullstring
+from pullstring.config import fastest
+from pullstring.transport import ConnectionPool, DEFAULT_POOL
+from webapi_server import WebAPIServer, WebAPITestMixin, CERT_FILE
+
+class TestClientConfig(WebAPITestMixin, unittest.TestCase):
+    """
+    Check that conversations with different configs use different endpoints.
+    """
+
+    def setUp(self):
+        self.default = self.start_server()
+        self.staging = WebAPIServer().start()
+        self.addCleanup(self.staging.stop)
+
+        # conversations without a config of their own use the shared pool
+        self.addCleanup(DEFAULT_POOL.close)
+
+    def make_config(self, **kwargs):
+        """
+        Return a ClientConfig with a pool of its own, closed after the test.
+        """
+        if kwargs.get("ssl_context") is None:
+            kwargs["pool"] = ConnectionPool()
+        config = pullstring.ClientConfig(**kwargs)
+        self.addCleanup(config.pool.close)
+        return config
+
+    def test_default_uses_version_info(self):
+        config = pullstring.ClientConfig()
+        self.assertEqual(config.base_url, self.default.base_url)
+        self.assertTrue(config.transport().pool is DEFAULT_POOL)
+        conv = pullstring.Conversation()
+        conv.start("project", pullstring.Request(api_key="key"))
+        self.assertEqual(len(self.default.requests), 1)
+
+    def test_endpoints_side_by_side(self):
+        config = pullstring.ClientConfig(base_url=self.staging.base_url, headers={"X-Region": "staging"})
+        staging = pullstring.Conversation(config)
+        default = pullstring.Conversation()
+        for conv in [staging, default, staging]:
+            conv.start("project", pullstring.Request(api_key="key"))
+        self.assertEqual(len(self.staging.requests), 2)
+        self.assertEqual(len(self.default.requests), 1)
+        self.assertEqual(self.staging.requests[0].headers.get("X-Region"), "staging")
+        self.assertNotIn("X-Region", self.default.requests[0].headers)
+
+    def test_default_timeout(self):
+        self.staging.handler = lambda request: (time.sleep(0.5), (200, {"outputs": []}))[1]
+        conv = pullstring.Conversation(pullstring.ClientConfig(base_url=self.staging.base_url, timeout=0.1))
+        response = conv.start("project", pullstring.Request(api_key="key"))
+        self.assertTrue(response.status.deadline_exceeded)
+
+    def test_ssl_context(self):
+        context = ssl.create_default_context(cafile=CERT_FILE)
+        context.check_hostname = False
+        config = self.make_config(base_url=self.staging.base_url, ssl_context=context)
+        self.assertFalse(config.pool is DEFAULT_POOL)
+        conv = pullstring.Conversation(config)
+        self.assertTrue(conv.start("project", pullstring.Request(api_key="key")).status.success)
+
+        # a context that does not trust the server's certificate fails
+        strict = pullstring.Conversation(self.make_config(base_url=self.staging.base_url,
+                                                          ssl_context=ssl.create_default_context()))
+        self.assertRaises(ssl.SSLError, strict.start, "project", pullstring.Request(api_key="key"))
+
+    def test_fastest(self):
+        unreachable = self.make_config(base_url="https://localhost:1/v1")
+        staging = self.make_config(base_url=self.staging.base_url)
+        self.assertTrue(fastest([unreachable, staging], samples=1) is staging)
+        self.assertTrue(staging.measure_latency(samples=1) > 0)
+        self.assertRaises(ValueError, fastest, [unreachable])
+
+    def test_fastest_skips_unresponsive(self):
+        # a listening socket that never accepts completes TCP connects, but never the TLS handshake
+        listener = socket.socket()
+        listener.bind(("localhost", 0))
+        listener.listen(8)
+        try:
+            silent = self.make_config(base_url="https://localhost:%d/v1" % listener.getsockname()[1])
+            staging = self.make_config(base_url=self.staging.base_url)
+            self.assertRaises(socket.timeout, silent.measure_latency, samples=1, timeout=0.1)
+            self.assertTrue(fastest([silent, staging], samples=1, timeout=0.1) is staging)
+        finally:
+            listener.close()
+
+if __name__ == '__main__':
+    unittest.main()
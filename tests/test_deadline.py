@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+#
+# Tests for per-call deadlines, run against a local Web API stand-in
+#
+# Copyright (c) 2016, PullString, Inc. All rights reserved.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+import os
+import sys
+import time
+import unittest
+sys.path.insert(0, os.path.abspath('..'))
+import pullstring
+from webapi_server import WebAPITestMixin
+
+class TestDeadline(WebAPITestMixin, unittest.TestCase):
+    """
+    Check that each phase of a call stops when its time runs out.
+    """
+
+    def setUp(self):
+        self.delay = 0.0
+        self.server = self.start_server(self.handler)
+
+        self.conv = pullstring.Conversation()
+        self.conv.start("project", pullstring.Request(api_key="key"))
+
+    def handler(self, request):
+        time.sleep(self.delay)
+        return 200, {"conversation": "conv-1", "participant": "participant-1", "outputs": [],
+                     "entities": {"NAME": "Jill"}}
+
+    def assertExpired(self, response, start, limit):
+        elapsed = time.time() - start
+        self.assertTrue(response.status.deadline_exceeded)
+        self.assertEqual(response.status.status_code, pullstring.STATUS_DEADLINE_EXCEEDED)
+        self.assertFalse(response.status.success)
+        self.assertTrue(elapsed < limit, elapsed)
+
+    def test_slow_response(self):
+        self.delay = 0.5
+        start = time.time()
+        self.assertExpired(self.conv.send_text("hello", timeout=0.1), start, 0.3)
+
+        # the conversation is still usable, and a new connection is opened
+        self.delay = 0.0
+        response = self.conv.send_text("hello", timeout=1.0)
+        self.assertTrue(response.status.success)
+        self.assertFalse(response.status.deadline_exceeded)
+
+    def test_request_timeout(self):
+        self.delay = 0.5
+        start = time.time()
+        request = pullstring.Request(api_key="key")
+        request.timeout = 0.1
+        self.assertExpired(self.conv.send_text("hello", request), start, 0.3)
+
+    def test_slow_body(self):
+        self.server.trickle = (8, 0.05)
+        start = time.time()
+        self.assertExpired(self.conv.send_text("hello", timeout=0.2), start, 0.4)
+
+    def test_audio_upload(self):
+        start = time.time()
+        self.conv.start_audio(timeout=0.1)
+        self.conv.add_audio(b"\0" * 320)
+        time.sleep(0.15)
+        self.conv.add_audio(b"\0" * 320)
+        self.assertExpired(self.conv.end_audio(), start, 0.3)
+
+    def test_rate_limiter(self):
+        self.conv.rate_limiter = pullstring.RateLimiter(rate=1, burst=1)
+        self.assertTrue(self.conv.send_text("hello").status.success)
+        start = time.time()
+        self.assertExpired(self.conv.send_text("hello", timeout=0.1), start, 0.3)
+
+    def test_entity_batches(self):
+        self.delay = 0.5
+        request = pullstring.Request()
+        request.timeout = 0.1
+        start = time.time()
+        values = self.conv.get_entity_values(["NAME"], request)
+        self.assertTrue(values.status.deadline_exceeded)
+        self.assertTrue(time.time() - start < 0.3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+#
+# Tests for the client-side entity cache, run against a local Web API stand-in
+#
+# Copyright (c) 2016, PullString, Inc. All rights reserved.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+import os
+import sys
+import unittest
+sys.path.insert(0, os.path.abspath('..'))
+import pullstring
+from webapi_server import WebAPITestMixin
+
+class TestEntityCache(WebAPITestMixin, unittest.TestCase):
+    """
+    Check that entity values are served locally and only changes are sent.
+    """
+
+    def setUp(self):
+        self.values = {"Player Score": 4, "NAME": "Jack"}
+        self.server = self.start_server(self.handler)
+
+        self.conv = pullstring.Conversation()
+        self.conv.entity_cache = pullstring.EntityCache()
+        self.conv.start("project", pullstring.Request(api_key="key"))
+
+    def handler(self, request):
+        body = request.json
+        entities = {}
+        for name in body.get("get_entities", []):
+            entities[name] = self.values[name]
+        self.values.update(body.get("set_entities", {}))
+        return 200, {"conversation": "conv-1", "participant": "participant-1", "entities": entities}
+
+    def sent_bodies(self):
+        return [r.json for r in self.server.requests[1:]]
+
+    def test_get_entities_is_answered_from_cache(self):
+        response = self.conv.get_entities([pullstring.Counter("Player Score")])
+        self.assertEqual(response.entities[0].value, 4)
+
+        response = self.conv.get_entities([pullstring.Counter("Player Score")])
+        self.assertEqual(response.entities[0].value, 4)
+        self.assertEqual(response.conversation_id, "conv-1")
+        self.assertEqual(len(self.sent_bodies()), 1)
+
+    def test_turn_expires_cached_values(self):
+        self.conv.get_entities([pullstring.Counter("Player Score")])
+        self.values["Player Score"] = 5
+        self.conv.send_text("rock")
+
+        response = self.conv.get_entities([pullstring.Counter("Player Score")])
+        self.assertEqual(response.entities[0].value, 5)
+        self.assertEqual(len(self.sent_bodies()), 3)
+
+    def test_refresh_calls_web_api(self):
+        self.conv.get_entities([pullstring.Label("NAME")])
+        self.conv.get_entities([pullstring.Label("NAME")], refresh=True)
+        self.assertEqual(len(self.sent_bodies()), 2)
+
+    def test_set_entities_only_sends_changes(self):
+        self.conv.get_entities([pullstring.Counter("Player Score"), pullstring.Label("NAME")])
+        self.conv.set_entities([pullstring.Counter("Player Score", 4), pullstring.Label("NAME", "Jill")])
+        self.assertEqual(self.sent_bodies()[-1], {"set_entities": {"NAME": "Jill"}})
+
+        # nothing has changed, so the Web API is not called again
+        response = self.conv.set_entities([pullstring.Label("NAME", "Jill")])
+        self.assertTrue(response.status.success)
+        self.assertEqual(len(self.sent_bodies()), 2)
+
+    def test_dirty_entities_are_sent_with_intent(self):
+        cache = self.conv.entity_cache
+        cache.set(pullstring.Counter("Player Score", 7))
+        self.assertTrue(cache.is_dirty("Player Score"))
+        self.assertEqual(cache.get("Player Score").value, 7)
+
+        self.conv.send_intent("Favorite Color", [pullstring.Label("NAME", "Jill")])
+        self.assertEqual(self.sent_bodies()[-1]["set_entities"], {"NAME": "Jill", "Player Score": 7})
+        self.assertEqual(cache.dirty, [])
+        self.assertFalse(cache.is_fresh("Player Score"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+#
+# Tests for the SDK under injected faults, run against a local Web API stand-in
+#
+# Copyright (c) 2016, PullString, Inc. All rights reserved.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+import os
+import sys
+import time
+import socket
+import itertools
+import threading
+import unittest
+sys.path.insert(0, os.path.abspath('..'))
+import pullstring
+from pullstring.transport import ConnectionPool, HttpTransport
+from webapi_server import WebAPITestMixin, FaultProfile
+
+try:
+    import http.client as httplib
+except ImportError:
+    import httplib
+
+# the errors that a turn may raise when the connection fails
+CONNECTION_ERRORS = (socket.error, httplib.HTTPException)
+
+
+def open_sockets():
+    """
+    Return the number of sockets open in this process, or None if the
+    platform cannot tell.
+    """
+    try:
+        fds = os.listdir("/proc/self/fd")
+    except OSError:
+        return None
+    count = 0
+    for fd in fds:
+        try:
+            if os.readlink(os.path.join("/proc/self/fd", fd)).startswith("socket:"):
+                count += 1
+        except OSError:
+            pass
+    return count
+
+class FaultRun(object):
+    """
+    The outcome of a number of turns under a fault profile.
+    """
+    def __init__(self):
+        self.ok = 0
+        self.statuses = []
+        self.errors = []
+        self.elapsed = 0.0
+        self.lock = threading.Lock()
+
+    @property
+    def turns(self):
+        return self.ok + len(self.statuses) + len(self.errors)
+
+    @property
+    def throughput(self):
+        return self.ok / self.elapsed if self.elapsed else 0.0
+
+class TestFaults(WebAPITestMixin, unittest.TestCase):
+    """
+    Check throughput, error handling, and resource use of conversations
+    while the server injects faults.
+    """
+
+    def setUp(self):
+        self.server = self.start_server(self.handler)
+
+        # measure from a quiet state, before any client connections exist
+        self.threads = threading.active_count()
+        self.sockets = open_sockets()
+        self.pool = ConnectionPool()
+        self.config = pullstring.ClientConfig(pool=self.pool)
+
+    def tearDown(self):
+        self.pool.close()
+
+    def handler(self, request):
+        return 200, {"conversation": "conv-1", "participant": "participant-1",
+                     "outputs": [{"type": "text", "id": "1", "text": "hi"}]}
+
+    def run_turns(self, profile, turns=40, workers=4, send=None, timeout=None):
+        """
+        Run turns with conversations on several threads, with the server
+        injecting the faults of the profile, and check that no sockets or
+        threads are left behind once the pool is closed.
+        """
+        send = send or (lambda conv: conv.send_text("hello", timeout=timeout))
+        conversations = []
+        for x in range(workers):
+            conv = pullstring.Conversation(self.config)
+            self.assertTrue(conv.start("project", pullstring.Request(api_key="key")).status.success)
+            conversations.append(conv)
+
+        run = FaultRun()
+        self.server.faults = profile
+        def work(conv, count):
+            for x in range(count):
+                try:
+                    response = send(conv)
+                except CONNECTION_ERRORS as e:
+                    with run.lock:
+                        run.errors.append(e)
+                    continue
+                with run.lock:
+                    if response.status.success:
+                        run.ok += 1
+                    else:
+                        run.statuses.append(response.status)
+
+        start = time.time()
+        threads = [threading.Thread(target=work, args=(conv, turns // workers)) for conv in conversations]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        run.elapsed = time.time() - start
+        self.server.faults = None
+        self.assertEqual(run.turns, turns)
+
+        # every error status is a readable message, not raw bytes
+        for status in run.statuses:
+            self.assertTrue(isinstance(status.error_message, type(u"")), status.error_message)
+
+        self.pool.close()
+        self.assertNoLeaks()
+        return run
+
+    def assertNoLeaks(self):
+        # the server's connection threads exit once the client closes its side
+        deadline = time.time() + 5.0
+        while time.time() < deadline:
+            sockets = open_sockets()
+            if threading.active_count() <= self.threads and (sockets is None or sockets <= self.sockets):
+                return
+            time.sleep(0.05)
+        self.fail("%d threads and %s sockets left open, from %d and %s" %
+                  (threading.active_count(), open_sockets(), self.threads, self.sockets))
+
+    def test_no_faults(self):
+        run = self.run_turns(FaultProfile())
+        self.assertEqual(run.ok, 40)
+        self.assertTrue(run.throughput > 0)
+
+    def test_slow_responses(self):
+        profile = FaultProfile(latency=FaultProfile.lognormal(0.005, 1.0), seed=1)
+        run = self.run_turns(profile)
+        self.assertEqual(run.ok, 40)
+
+        # with a deadline, the slowest turns give up rather than wait
+        profile = FaultProfile(latency=lambda rand: 0.5 if rand.random() < 0.25 else 0.0, seed=2)
+        start = time.time()
+        run = self.run_turns(profile, timeout=0.1)
+        self.assertTrue(time.time() - start < 3.0)
+        self.assertTrue(run.statuses)
+        self.assertTrue(all(status.deadline_exceeded for status in run.statuses))
+        self.assertEqual(run.ok + len(run.statuses), 40)
+
+    def test_dropped_connections(self):
+        profile = FaultProfile(drop_rate=0.2, seed=3)
+        turns = itertools.count()
+        run = self.run_turns(profile, send=lambda conv: conv.send_text("turn %d" % next(turns)))
+        self.assertTrue(profile.faults["drop"] > 0)
+        self.assertTrue(run.ok > 0)
+        self.assertEqual(run.statuses, [])
+
+        # the server may have acted on a dropped turn, so it is not sent again
+        self.assertEqual(len(run.errors), profile.faults["drop"])
+        for error in run.errors:
+            self.assertTrue(isinstance(error, CONNECTION_ERRORS), error)
+        texts = [request.json.get("text") for request in self.server.requests if request.json.get("text")]
+        self.assertEqual(len(texts), run.ok)
+        self.assertEqual(len(set(texts)), len(texts))
+
+    def test_truncated_uploads(self):
+        profile = FaultProfile(truncate_rate=0.5, seed=4)
+        run = self.run_turns(profile, turns=20, send=lambda conv: conv.send_audio(b"\0" * 32000))
+        self.assertTrue(profile.faults["truncate"] > 0)
+        self.assertEqual(len(run.errors), profile.faults["truncate"])
+        self.assertEqual(run.ok, 20 - profile.faults["truncate"])
+
+    def test_client_cuts_upload_short(self):
+        transport = HttpTransport(self.pool)
+        exchange = transport.open(self.server.base_url + "/conversation/conv-1/audio", {},
+                                  {"Transfer-Encoding": "chunked", "Content-Type": "audio/l16; rate=16000"})
+        exchange.send(b"\0" * 3200)
+        exchange.cancel()
+
+        # the server notices, and keeps answering other requests
+        deadline = time.time() + 2.0
+        while self.server.truncated_uploads == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.server.truncated_uploads, 1)
+        self.assertEqual(self.run_turns(FaultProfile(), turns=4).ok, 4)
+
+    def test_malformed_json(self):
+        profile = FaultProfile(malformed_rate=0.3, seed=5)
+        stderr = sys.stderr
+        sys.stderr = open(os.devnull, "w")
+        try:
+            run = self.run_turns(profile)
+        finally:
+            sys.stderr.close()
+            sys.stderr = stderr
+        self.assertEqual(len(run.statuses), profile.faults["malformed"])
+        self.assertEqual(run.ok + len(run.statuses), 40)
+        for status in run.statuses:
+            self.assertTrue(status.error_message.startswith('{"conversation"'))
+
+    def test_error_bursts(self):
+        profile = FaultProfile(error_rate=0.1, error_burst=3, error_statuses=(429, 503), seed=6)
+        run = self.run_turns(profile)
+        self.assertEqual(len(run.statuses), profile.faults["error"])
+        self.assertEqual(run.ok + len(run.statuses), 40)
+        self.assertEqual(run.errors, [])
+        for status in run.statuses:
+            self.assertTrue(status.status_code in (429, 503))
+            self.assertEqual(status.error_message, "Injected error")
+
+    def test_mixed_faults(self):
+        profile = FaultProfile(latency=FaultProfile.lognormal(0.002, 1.0), drop_rate=0.05, malformed_rate=0.05,
+                               error_rate=0.05, error_burst=2, seed=7)
+        stderr = sys.stderr
+        sys.stderr = open(os.devnull, "w")
+        try:
+            run = self.run_turns(profile, turns=80, workers=8)
+        finally:
+            sys.stderr.close()
+            sys.stderr = stderr
+        self.assertTrue(run.ok > 40)
+        self.assertTrue(run.throughput > 0)
+
+    def test_profile_is_repeatable(self):
+        first = FaultProfile(drop_rate=0.2, malformed_rate=0.2, error_rate=0.2, seed=8)
+        second = FaultProfile(drop_rate=0.2, malformed_rate=0.2, error_rate=0.2, seed=8)
+        self.assertEqual([first.choose(False) for x in range(50)], [second.choose(False) for x in range(50)])
+
+if __name__ == '__main__':
+    unittest.main()
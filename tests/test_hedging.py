@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+#
+# Tests for hedged read-only requests, run against a local Web API stand-in
+#
+# Copyright (c) 2016, PullString, Inc. All rights reserved.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+import os
+import sys
+import time
+import threading
+import unittest
+sys.path.insert(0, os.path.abspath('..'))
+import pullstring
+from pullstring.transport import ConnectionPool, HttpTransport
+from webapi_server import WebAPITestMixin
+
+class LingeringTransport(object):
+    """
+    A transport whose first exchange holds on to its result for a while
+    after reading it, so that it loses to its hedge, and is cancelled
+    after its connection has gone back to the pool.
+    """
+    def __init__(self, transport):
+        self.transport = transport
+        self.opened = 0
+
+    def open(self, url, query_params, headers, deadline=None):
+        exchange = self.transport.open(url, query_params, headers)
+        self.opened += 1
+        return LingeringExchange(exchange) if self.opened == 1 else exchange
+
+class LingeringExchange(object):
+    def __init__(self, exchange):
+        self.url = exchange.url
+        self.chunked = exchange.chunked
+        self.exchange = exchange
+
+    def send(self, data):
+        self.exchange.send(data)
+
+    def finish(self, on_data=None):
+        result = self.exchange.finish(on_data)
+        time.sleep(0.3)
+        return result
+
+    def cancel(self):
+        self.exchange.cancel()
+
+class TestRequestHedger(unittest.TestCase):
+    """
+    Check the hedging delay and budget.
+    """
+
+    def test_delay_follows_percentile(self):
+        hedger = pullstring.RequestHedger(percentile=90, initial_delay=0.2, min_samples=10, min_delay=0.001)
+        self.assertEqual(hedger.delay(), 0.2)
+        for x in range(100):
+            hedger.record((x + 1) / 1000.0)
+        self.assertAlmostEqual(hedger.delay(), 0.091)
+
+    def test_budget(self):
+        hedger = pullstring.RequestHedger(budget=0.5, max_burst=2)
+        self.assertEqual([hedger.allow() for x in range(3)], [True, True, False])
+        hedger.record(0.01)
+        self.assertFalse(hedger.allow())
+        hedger.record(0.01)
+        self.assertTrue(hedger.allow())
+        self.assertEqual(hedger.hedged, 3)
+
+class TestHedgedRequests(WebAPITestMixin, unittest.TestCase):
+    """
+    Check that a slow read-only request is answered by its hedge.
+    """
+
+    def setUp(self):
+        self.slow = set()
+        self.count = 0
+        self.lock = threading.Lock()
+        self.server = self.start_server(self.handler)
+
+        self.conv = pullstring.Conversation()
+        self.conv.start("project", pullstring.Request(api_key="key"))
+        self.conv.hedger = pullstring.RequestHedger(initial_delay=0.05)
+
+    def handler(self, request):
+        # the requests numbered in self.slow take half a second
+        with self.lock:
+            self.count += 1
+            number = self.count
+        if number in self.slow:
+            time.sleep(0.5)
+        return 200, {"conversation": "conv-1", "participant": "participant-1", "outputs": [],
+                     "entities": {"NAME": "Jill"}, "timed_response_interval": 1}
+
+    def test_slow_request_is_hedged(self):
+        self.slow.add(2)
+        start = time.time()
+        response = self.conv.get_entities([pullstring.Label("NAME")])
+        self.assertTrue(time.time() - start < 0.3)
+        self.assertEqual(response.get_entity("NAME").value, "Jill")
+        self.assertEqual((self.conv.hedger.hedged, self.conv.hedger.hedge_wins), (1, 1))
+
+        # the hedge went out on a different connection
+        requests = self.server.requests[1:]
+        self.assertEqual(len(requests), 2)
+        self.assertEqual(requests[0].body, requests[1].body)
+        self.assertNotEqual(requests[0].client_address, requests[1].client_address)
+
+    def test_fast_request_is_not_hedged(self):
+        self.conv.get_entities([pullstring.Label("NAME")])
+        self.assertTrue(self.conv.check_for_timed_responses().status.success)
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual((self.conv.hedger.requests, self.conv.hedger.hedged), (2, 0))
+
+    def test_turns_are_not_hedged(self):
+        self.slow.add(2)
+        start = time.time()
+        self.conv.send_text("hello")
+        self.assertTrue(time.time() - start >= 0.5)
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_cancel_finished_loser(self):
+        pool = ConnectionPool()
+        self.conv.transport = LingeringTransport(HttpTransport(pool))
+        response = self.conv.get_entities([pullstring.Label("NAME")])
+        self.assertEqual(response.get_entity("NAME").value, "Jill")
+        self.assertEqual(self.conv.hedger.hedge_wins, 1)
+
+        # the loser put its connection back before the hedge took it, and
+        # cancelling the loser afterwards leaves it open for the next turns
+        time.sleep(0.4)
+        self.assertEqual(pool.idle_count(self.server.base_url), 1)
+        self.conv.transport = HttpTransport(pool)
+        self.assertTrue(self.conv.send_text("hello").status.success)
+        self.assertTrue(self.conv.send_text("hello").status.success)
+        pool.close()
+
+    def test_budget_limits_hedges(self):
+        self.conv.hedger = pullstring.RequestHedger(initial_delay=0.05, max_burst=1, budget=0)
+        self.slow.update([2, 4])
+        self.conv.get_entities([pullstring.Label("NAME")])
+        start = time.time()
+        self.conv.get_entities([pullstring.Label("NAME")])
+        self.assertTrue(time.time() - start >= 0.5)
+        self.assertEqual(self.conv.hedger.hedged, 1)
+
+if __name__ == '__main__':
+    unittest.main()
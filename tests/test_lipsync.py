@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+#
+# Tests for the phoneme timeline used for lip sync playback
+#
+# Copyright (c) 2016, PullString, Inc. All rights reserved.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+import os
+import sys
+import unittest
+sys.path.insert(0, os.path.abspath('..'))
+import pullstring
+
+class TestPhonemeTimeline(unittest.TestCase):
+    """
+    Look up the active phoneme for a dialog output at a playback time.
+    """
+
+    def make_output(self):
+        output = pullstring.DialogOutput()
+        output.duration = 1.0
+        for name, seconds in [("m", 0.1), ("aa", 0.25), ("b", 0.5), ("aa", 0.7)]:
+            output.phonemes.append(pullstring.Phoneme(name, seconds))
+        return output
+
+    def test_viseme_at(self):
+        timeline = self.make_output().timeline
+        self.assertEqual(len(timeline), 4)
+        self.assertIsNone(timeline.viseme_at(0.0))
+        self.assertEqual(timeline.viseme_at(0.1), "m")
+        self.assertEqual(timeline.viseme_at(0.3), "aa")
+        self.assertEqual(timeline.viseme_at(5.0), "aa")
+        self.assertEqual(timeline.visemes, ["m", "aa", "b"])
+
+    def test_viseme_mapping(self):
+        output = self.make_output()
+        timeline = pullstring.PhonemeTimeline(output.phonemes, output.duration,
+                                              visemes={"m": "MBP", "b": "MBP", "aa": "AI"})
+        self.assertEqual(timeline.visemes, ["MBP", "AI"])
+        self.assertEqual(timeline.viseme_at(0.55), "MBP")
+
+    def test_cursor_matches_random_access(self):
+        timeline = self.make_output().timeline
+        cursor = timeline.cursor()
+        for seconds in [0.0, 0.1, 0.2, 0.6, 0.9, 0.3, 0.05, 0.75]:
+            self.assertEqual(cursor.seek(seconds), timeline.viseme_at(seconds))
+
+    def test_sample(self):
+        timeline = self.make_output().timeline
+        frames = timeline.sample(10)
+        self.assertEqual(len(frames), 11)
+        self.assertEqual(frames, [timeline.viseme_at(x / 10.0) for x in range(11)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+#
+# Tests for the sharded conversation manager, run against a local Web API stand-in
+#
+# Copyright (c) 2016, PullString, Inc. All rights reserved.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+import os
+import sys
+import json
+import time
+import threading
+import unittest
+sys.path.insert(0, os.path.abspath('..'))
+import pullstring
+from webapi_server import WebAPITestMixin
+
+class TestConversationManager(WebAPITestMixin, unittest.TestCase):
+    """
+    Check routing, eviction, and hand-off of conversations between managers.
+    """
+
+    def setUp(self):
+        self.server = self.start_server(self.handler)
+
+    def handler(self, request):
+        participant = request.json.get("participant", request.path.split("/")[-1])
+        return 200, {"conversation": "conv-" + participant, "participant": participant, "outputs": []}
+
+    def start(self, manager, participant_id):
+        conv = manager.get(participant_id)
+        if not conv.get_conversation_id():
+            request = pullstring.Request(api_key="key", participant_id=participant_id)
+            request.language = "fr-FR"
+            conv.start("project", request)
+        return conv
+
+    def test_shards_are_stable(self):
+        manager = pullstring.ConversationManager(shard_count=8)
+        shards = [manager.shard_for("participant-%d" % x) for x in range(1000)]
+        self.assertEqual(set(shards), set(range(8)))
+        self.assertEqual(manager.shard_for(u"joëlle"), manager.shard_for(u"joëlle"))
+
+        other = pullstring.ConversationManager(shard_count=8, shards=[manager.shard_for("alice")])
+        self.assertTrue(other.owns("alice"))
+        self.assertRaises(ValueError, other.get, [p for p in ["bob", "carol", "dave", "erin"]
+                                                  if not other.owns(p)][0])
+
+    def test_live_conversation_reused(self):
+        manager = pullstring.ConversationManager()
+        conv = self.start(manager, "alice")
+        self.assertTrue(manager.get("alice") is conv)
+        self.assertEqual(len(manager), 1)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_lru_eviction_restores_state(self):
+        store = {}
+        manager = pullstring.ConversationManager(shard_count=1, max_per_shard=2, store=store)
+        first = self.start(manager, "alice")
+        self.start(manager, "bob")
+        self.start(manager, "carol")
+        self.assertEqual(len(manager), 2)
+        self.assertEqual(list(store.keys()), ["alice"])
+
+        # the restored conversation continues without starting again
+        conv = manager.get("alice")
+        self.assertFalse(conv is first)
+        self.assertEqual(conv.get_conversation_id(), "conv-alice")
+        conv.send_text("hello")
+        request = self.server.requests[-1]
+        self.assertEqual(len(self.server.requests), 4)
+        self.assertEqual(request.path, "/v1/conversation/conv-alice")
+        self.assertEqual(request.query["language"], "fr-FR")
+        self.assertEqual(request.headers["Authorization"], "Bearer key")
+
+    def test_idle_eviction(self):
+        manager = pullstring.ConversationManager(idle_timeout=0.05)
+        self.start(manager, "alice")
+        self.start(manager, "bob")
+        self.assertEqual(manager.evict_idle(), 0)
+        time.sleep(0.1)
+        manager.get("bob")
+        self.assertEqual(manager.evict_idle(), 1)
+        self.assertEqual(len(manager), 1)
+        self.assertEqual(sorted(manager.store.keys()), ["alice"])
+
+    def test_hand_off(self):
+        source = pullstring.ConversationManager()
+        self.start(source, "alice")
+        state = source.release("alice")
+        self.assertEqual(len(source), 0)
+        self.assertEqual(json.loads(state)["conversation_id"], "conv-alice")
+
+        target = pullstring.ConversationManager()
+        target.adopt("alice", state)
+        conv = target.get("alice")
+        self.assertEqual(conv.get_conversation_id(), "conv-alice")
+        self.assertEqual(conv.get_participant_id(), "alice")
+        self.assertEqual(conv.get_state(), json.loads(state))
+        self.assertEqual(source.release("nobody"), None)
+
+    def test_flush_outside_shard_lock(self):
+        manager = pullstring.ConversationManager(shard_count=1)
+        conv = self.start(manager, "alice")
+        self.start(manager, "bob")
+        conv.coalesce = True
+        conv.set_entities([pullstring.Label("NAME", "Jill")])
+
+        # bob is served while alice's queued values are still being sent
+        sending = threading.Event()
+        proceed = threading.Event()
+
+        def handler(request):
+            sending.set()
+            proceed.wait(5)
+            return 200, {"conversation": "conv-alice", "participant": "alice"}
+        self.server.handler = handler
+        releaser = threading.Thread(target=manager.release, args=("alice",))
+        releaser.start()
+        self.assertTrue(sending.wait(5))
+        manager.get("bob")
+        self.assertTrue(releaser.is_alive())
+        proceed.set()
+        releaser.join()
+        self.assertEqual(self.server.requests[-1].json, {"set_entities": {"NAME": "Jill"}})
+        self.assertEqual(json.loads(manager.store["alice"])["conversation_id"], "conv-alice")
+
+    def test_save_errors(self):
+        class FailingStore(dict):
+            def __setitem__(self, participant_id, state):
+                if participant_id == "bob":
+                    raise IOError("disk full")
+                dict.__setitem__(self, participant_id, state)
+
+        class FailingFlush(pullstring.Conversation):
+            def flush(self, request=None):
+                if self.get_participant_id() == "alice":
+                    raise IOError("network down")
+                return pullstring.Conversation.flush(self, request)
+
+        manager = pullstring.ConversationManager(shard_count=1, store=FailingStore(), factory=FailingFlush)
+        for participant in ["alice", "bob", "carol"]:
+            self.start(manager, participant)
+
+        # every conversation is saved or dropped, despite the errors
+        manager.close()
+        self.assertEqual(len(manager), 0)
+        self.assertEqual(sorted(manager.store.keys()), ["alice", "carol"])
+        self.assertEqual(manager.save_errors, 2)
+        self.assertEqual(manager.last_error[0], "bob")
+        self.assertFalse(manager.get("bob").get_conversation_id())
+
+    def test_default_store_is_bounded(self):
+        manager = pullstring.ConversationManager(shard_count=1, max_per_shard=1, max_stored=2)
+        for participant in ["alice", "bob", "carol", "dave"]:
+            self.start(manager, participant)
+        self.assertEqual(sorted(manager.store.keys()), ["bob", "carol"])
+        self.assertEqual(manager.get("carol").get_conversation_id(), "conv-carol")
+
+if __name__ == '__main__':
+    unittest.main()
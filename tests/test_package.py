@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+#
+# Tests for the layout of the pullstring package
+#
+# Copyright (c) 2016, PullString, Inc. All rights reserved.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+import os
+import sys
+import subprocess
+import unittest
+sys.path.insert(0, os.path.abspath('..'))
+import pullstring
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class TestPackage(unittest.TestCase):
+    """
+    Check that the public names are available and load their dependencies lazily.
+    """
+
+    def test_public_names(self):
+        for name in ["Conversation", "Request", "Response", "EntityCache", "AudioPrefetcher",
+                     "PhonemeTimeline", "OUTPUT_DIALOG", "BUILD_STAGING"]:
+            self.assertTrue(hasattr(pullstring, name), name)
+            self.assertIn(name, dir(pullstring))
+        self.assertRaises(AttributeError, getattr, pullstring, "NoSuchName")
+
+        # a star import has the same names, but no modules
+        names = {}
+        exec("from pullstring import *", names)
+        for name in ["Conversation", "Request", "Response", "ConnectionPool", "RequestCancelled",
+                     "OUTPUT_DIALOG", "STATUS_PENDING"]:
+            self.assertIn(name, names)
+        self.assertNotIn("sys", names)
+        self.assertNotIn("models", names)
+
+    @unittest.skipIf(sys.version_info < (3, 7), "requires module __getattr__")
+    def test_import_is_lazy(self):
+        script = ("import sys, pullstring; "
+                  "print(' '.join(m for m in ['json', 'ssl', 'http.client', 'pullstring.conversation'] "
+                  "if m in sys.modules))")
+        output = subprocess.check_output([sys.executable, "-c", script], cwd=ROOT)
+        self.assertEqual(output.decode("utf-8").strip(), "")
+
+if __name__ == '__main__':
+    unittest.main()
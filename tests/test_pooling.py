@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+#
+# Tests for reusing Response objects from a ResponsePool
+#
+# Copyright (c) 2016, PullString, Inc. All rights reserved.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+import os
+import sys
+import threading
+import unittest
+sys.path.insert(0, os.path.abspath('..'))
+import pullstring
+from pullstring import codec
+from webapi_server import WebAPITestMixin
+
+BODY = {
+    "conversation": "conv-1",
+    "participant": "participant-1",
+    "outputs": [
+        {"type": "dialog", "id": "line-1", "text": "Hello", "duration": 1.5,
+         "phonemes": [{"name": "h", "seconds_since_start": 0.0}, {"name": "e", "seconds_since_start": 0.2}]},
+        {"type": "behavior", "behavior": "wave", "parameters": {"hand": "left"}},
+    ],
+    "entities": {"NAME": "Jill", "Player Score": 7, "Ready": True},
+}
+
+class TestResponsePool(unittest.TestCase):
+    """
+    Check that released responses are reset, reused, and guarded against use.
+    """
+
+    def test_reuse(self):
+        pool = pullstring.ResponsePool()
+        first = codec.json_to_response(BODY, pool=pool)
+        line = first.outputs[0]
+        phoneme = line.phonemes[0]
+        self.assertEqual(pool.created, 8)
+        pool.release(first)
+
+        second = codec.json_to_response({"outputs": [{"type": "dialog", "text": "Bye"}],
+                                         "entities": {"Player Score": 8}}, pool=pool)
+        self.assertTrue(second is first)
+        self.assertTrue(second.outputs[0] is line)
+        self.assertEqual(pool.created, 8)
+        self.assertEqual(pool.reused, 3)
+
+        # nothing from the previous response is left over
+        self.assertEqual(second.dialog_text, "Bye")
+        self.assertEqual(second.outputs[0].phonemes, [])
+        self.assertEqual(second.outputs[0].duration, 0.0)
+        self.assertEqual(second.conversation_id, "")
+        self.assertEqual([(e.name, e.value) for e in second.entities], [("Player Score", 8)])
+        self.assertTrue(second.status.success)
+
+        # phonemes are reused for the next dialog output that has them
+        pool.release(second)
+        third = codec.json_to_response(BODY, pool=pool)
+        self.assertTrue(phoneme in third.outputs[0].phonemes)
+        self.assertEqual([p.name for p in third.outputs[0].phonemes], ["h", "e"])
+        self.assertEqual(pool.created, 8)
+
+    def test_use_after_release(self):
+        pool = pullstring.ResponsePool(debug=True)
+        response = codec.json_to_response(BODY, pool=pool)
+        output = response.outputs[1]
+        entity = response.get_entity("NAME")
+        pool.release(response)
+
+        self.assertRaises(RuntimeError, getattr, response, "outputs")
+        self.assertRaises(RuntimeError, lambda: response.dialog_text)
+        self.assertRaises(RuntimeError, setattr, response, "etag", "x")
+        self.assertRaises(RuntimeError, str, output)
+        self.assertRaises(RuntimeError, getattr, entity, "value")
+        self.assertTrue(isinstance(response, pullstring.Response))
+        self.assertRaises(RuntimeError, pool.release, response)
+
+        # reused objects work normally again
+        response = codec.json_to_response(BODY, pool=pool)
+        self.assertEqual(response.get_entity("NAME").value, "Jill")
+        self.assertEqual(len(response.outputs[0].phonemes), 2)
+
+    def test_debug_shows_release(self):
+        pool = pullstring.ResponsePool(debug=True)
+        response = codec.json_to_response(BODY, pool=pool)
+        pool.release(response)
+        try:
+            response.etag
+            self.fail("expected a RuntimeError")
+        except RuntimeError as e:
+            self.assertIn("released at", str(e))
+            self.assertIn("test_debug_shows_release", str(e))
+        self.assertFalse("_released_at" in codec.json_to_response({}, pool=pool).__dict__)
+
+    def test_max_size(self):
+        pool = pullstring.ResponsePool(max_size=1)
+        responses = [codec.json_to_response(BODY, pool=pool) for x in range(3)]
+        for response in responses:
+            pool.release(response)
+        [codec.json_to_response(BODY, pool=pool) for x in range(3)]
+
+        # one free object of each of the 7 pooled types was kept
+        self.assertEqual(pool.reused, 7)
+
+    def test_threads(self):
+        pool = pullstring.ResponsePool()
+
+        def work():
+            for x in range(200):
+                pool.release(codec.json_to_response(BODY, pool=pool))
+        threads = [threading.Thread(target=work) for x in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # every object was counted once, and at most one response per thread was created
+        self.assertEqual(pool.created + pool.reused, 4 * 200 * 8)
+        self.assertTrue(pool.created <= 4 * 8, pool.created)
+
+class TestConversationResponsePool(WebAPITestMixin, unittest.TestCase):
+    """
+    Check that a Conversation builds responses from its pool.
+    """
+
+    def setUp(self):
+        self.server = self.start_server(lambda request: (200, BODY))
+
+    def test_turns(self):
+        pool = pullstring.ResponsePool()
+        conv = pullstring.Conversation()
+        conv.response_pool = pool
+        conv.entity_cache = pullstring.EntityCache()
+
+        response = conv.start("project", pullstring.Request(api_key="key"))
+        self.assertTrue(response.status.success)
+        pool.release(response)
+
+        # the conversation keeps working after its responses are released
+        self.assertEqual(conv.get_conversation_id(), "conv-1")
+        response = conv.send_text("hello")
+        self.assertEqual(response.dialog_text, "Hello")
+        self.assertEqual(pool.created, 8)
+        pool.release(response)
+
+        self.assertEqual(conv.get_entities([pullstring.Label("NAME")]).get_entity("NAME").value, "Jill")
+        self.assertEqual(self.server.requests[-1].path, "/v1/conversation/conv-1")
+
+if __name__ == '__main__':
+    unittest.main()
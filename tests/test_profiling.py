@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+#
+# Tests for per-turn profiling, run against a local Web API stand-in
+#
+# Copyright (c) 2016, PullString, Inc. All rights reserved.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+import os
+import sys
+import time
+import pstats
+import shutil
+import tempfile
+import unittest
+sys.path.insert(0, os.path.abspath('..'))
+import pullstring
+from webapi_server import WebAPITestMixin
+
+if sys.version_info >= (3, 0):
+    from io import StringIO
+else:
+    from StringIO import StringIO
+
+class TestTurnProfiler(WebAPITestMixin, unittest.TestCase):
+    """
+    Check that sampled turns are profiled and their stats aggregated.
+    """
+
+    def setUp(self):
+        self.delay = 0
+        self.server = self.start_server(self.handler)
+
+        self.conv = pullstring.Conversation()
+        self.conv.start("project", pullstring.Request(api_key="key"))
+
+    def handler(self, request):
+        time.sleep(self.delay)
+        return 200, {"conversation": "conv-1", "participant": "participant-1",
+                     "outputs": [{"type": "text", "id": "1", "text": "hi"}]}
+
+    def test_turns_are_aggregated(self):
+        profiler = pullstring.TurnProfiler()
+        self.conv.profiler = profiler
+        for x in range(3):
+            self.assertTrue(self.conv.send_text("hello").status.success)
+        self.assertEqual((profiler.turns, profiler.profiled, profiler.slow), (3, 3, 0))
+
+        names = [entry[0] for entry in profiler.functions(limit=1000)]
+        self.assertTrue([name for name in names if "__json_to_response" in name])
+        for name, calls, tottime, cumtime in profiler.functions(limit=1000):
+            if "__json_to_response" in name:
+                self.assertEqual(calls, 3)
+
+        output = StringIO()
+        profiler.dump(output)
+        self.assertTrue("3 of 3 turns profiled" in output.getvalue())
+
+    def test_unsampled_turns_are_not_profiled(self):
+        profiler = pullstring.TurnProfiler(sample_rate=0)
+        self.conv.profiler = profiler
+        self.conv.send_text("hello")
+        self.assertEqual((profiler.turns, profiler.profiled), (1, 0))
+        self.assertEqual(profiler.stats(), None)
+        self.assertEqual(profiler.functions(), [])
+
+    def test_slow_turns_are_reported(self):
+        output = StringIO()
+        profiler = pullstring.TurnProfiler(threshold=0.1, output=output)
+        self.conv.profiler = profiler
+        self.conv.send_text("hello")
+        self.assertEqual(output.getvalue(), "")
+
+        self.delay = 0.2
+        self.conv.send_text("hello")
+        self.assertEqual(profiler.slow, 1)
+        self.assertTrue("pullstring profile: slow turn took" in output.getvalue())
+
+    def test_audio_turns_are_profiled(self):
+        profiler = pullstring.TurnProfiler()
+        self.conv.profiler = profiler
+        self.conv.start_audio()
+        self.conv.add_audio(b"\0" * 3200)
+        self.assertTrue(self.conv.end_audio().status.success)
+        self.assertEqual(profiler.profiled, 1)
+
+    def test_dump_to_file_and_reset(self):
+        profiler = pullstring.TurnProfiler()
+        self.conv.profiler = profiler
+        self.conv.send_text("hello")
+
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "turns.prof")
+            profiler.dump(path=path)
+            self.assertTrue(pstats.Stats(path).total_calls > 0)
+        finally:
+            shutil.rmtree(directory)
+
+        profiler.reset()
+        self.assertEqual((profiler.turns, profiler.profiled, profiler.stats()), (0, 0, None))
+
+if __name__ == '__main__':
+    unittest.main()
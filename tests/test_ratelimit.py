@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+#
+# Tests for client-side rate limiting per API key
+#
+# Copyright (c) 2016, PullString, Inc. All rights reserved.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+import os
+import sys
+import time
+import threading
+import unittest
+sys.path.insert(0, os.path.abspath('..'))
+import pullstring
+from webapi_server import WebAPITestMixin
+
+class TestRateLimiter(unittest.TestCase):
+    """
+    Check the token bucket, fair queuing, and the different ways to acquire.
+    """
+
+    def test_burst_then_non_blocking(self):
+        limiter = pullstring.RateLimiter(rate=1, burst=3)
+        self.assertEqual([limiter.acquire("key", blocking=False) for x in range(4)], [True, True, True, False])
+        self.assertTrue(limiter.acquire("other", blocking=False))
+        stats = limiter.stats("key")
+        self.assertEqual((stats.acquired, stats.rejected), (3, 1))
+
+    def test_blocking_rate(self):
+        limiter = pullstring.RateLimiter(rate=50, burst=1)
+        start = time.time()
+        for x in range(6):
+            self.assertTrue(limiter.acquire("key"))
+        elapsed = time.time() - start
+        self.assertTrue(elapsed >= 0.09, elapsed)
+        self.assertTrue(limiter.stats("key").max_wait > 0)
+        self.assertEqual(limiter.stats("key").queued, 0)
+
+    def test_timeout(self):
+        limiter = pullstring.RateLimiter(rate=0.5, burst=1)
+        self.assertTrue(limiter.acquire("key"))
+        self.assertFalse(limiter.acquire("key", timeout=0.05))
+        self.assertEqual(limiter.stats("key").queued, 0)
+
+    def test_set_quota(self):
+        limiter = pullstring.RateLimiter(rate=100)
+        limiter.set_quota("key", rate=1, burst=2)
+        self.assertEqual([limiter.acquire("key", blocking=False) for x in range(3)], [True, True, False])
+
+    def test_fair_queuing(self):
+        limiter = pullstring.RateLimiter(rate=100, burst=1)
+        limiter.acquire("key")
+        order = []
+        lock = threading.Lock()
+
+        def run(owner, count):
+            for x in range(count):
+                limiter.acquire("key", owner=owner)
+                with lock:
+                    order.append(owner)
+
+        # a busy owner queues many requests before a quiet one arrives
+        busy = threading.Thread(target=run, args=("busy", 10))
+        busy.start()
+        time.sleep(0.005)
+        quiet = threading.Thread(target=run, args=("quiet", 2))
+        quiet.start()
+        busy.join()
+        quiet.join()
+        self.assertTrue(order.index("quiet") < 4, order)
+        self.assertEqual(limiter.stats("key").acquired, 13)
+
+    @unittest.skipIf(sys.version_info < (3, 5), "requires asyncio")
+    def test_acquire_async(self):
+        import asyncio
+        limiter = pullstring.RateLimiter(rate=50, burst=1)
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            start = time.time()
+            for x in range(3):
+                self.assertTrue(loop.run_until_complete(limiter.acquire_async("key")))
+            self.assertTrue(time.time() - start >= 0.03)
+
+            # a cancelled request leaves the queue
+            future = limiter.acquire_async("key")
+            future.cancel()
+            loop.run_until_complete(asyncio.sleep(0))
+            self.assertEqual(limiter.stats("key").queued, 0)
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+class TestConversationRateLimit(WebAPITestMixin, unittest.TestCase):
+    """
+    Check that conversations sharing an API key share its rate limit.
+    """
+
+    def setUp(self):
+        self.server = self.start_server()
+
+    def test_shared_limit(self):
+        limiter = pullstring.RateLimiter(rate=40, burst=2)
+        convs = [pullstring.Conversation() for x in range(3)]
+        start = time.time()
+        for conv in convs:
+            conv.rate_limiter = limiter
+            conv.start("project", pullstring.Request(api_key="key"))
+            conv.send_text("hello")
+        elapsed = time.time() - start
+        self.assertTrue(elapsed >= 0.09, elapsed)
+        self.assertEqual(limiter.stats("key").acquired, 6)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+#
+# Tests for recording Web API exchanges and replaying them offline
+#
+# Copyright (c) 2016, PullString, Inc. All rights reserved.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import unittest
+sys.path.insert(0, os.path.abspath('..'))
+import pullstring
+from pullstring.transport import ConnectionPool, HttpTransport
+from webapi_server import WebAPIServer, WebAPITestMixin
+
+class TestRecording(WebAPITestMixin, unittest.TestCase):
+    """
+    Check that a recorded session replays identically without the server.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "exchanges.jsonl")
+        self.audio_dir = os.path.join(self.directory, "audio")
+
+        # record a session against the local server, which is then stopped
+        server = WebAPIServer(self.handler).start()
+        self.use_server(server)
+        pool = ConnectionPool()
+        try:
+            conv = pullstring.Conversation()
+            conv.transport = pullstring.RecordingTransport(self.path, transport=HttpTransport(pool),
+                                                           audio_dir=self.audio_dir)
+            self.recorded = self.play(conv)
+        finally:
+            pool.close()
+            server.stop()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def handler(self, request):
+        time.sleep(0.02)
+        if request.headers.get("Content-Type", "").startswith("audio/"):
+            text = "heard %d bytes" % len(request.body)
+        else:
+            text = "said %s" % request.json.get("text", "hello")
+        return 200, {"conversation": "conv-1", "participant": "participant-1",
+                     "outputs": [{"type": "dialog", "id": "line", "text": text}]}
+
+    def play(self, conv):
+        responses = [conv.start("project", pullstring.Request(api_key="secret-key"))]
+        responses.append(conv.send_text("yes"))
+        responses.append(conv.send_audio(b"\x01\x02" * 800))
+        responses.append(conv.send_text("no"))
+        return [response.dialog_text for response in responses]
+
+    def test_recording_file(self):
+        with open(self.path) as f:
+            text = f.read()
+        records = [json.loads(line) for line in text.splitlines()]
+        self.assertEqual(len(records), 4)
+        self.assertEqual(records[1]["path"], "/v1/conversation/conv-1?language=en-US")
+        self.assertEqual(json.loads(records[1]["body"]), {"text": "yes"})
+        self.assertTrue(records[1]["latency"] >= 0.02)
+        self.assertEqual(records[2]["body_file"], os.listdir(self.audio_dir)[0])
+        self.assertNotIn("secret-key", text)
+
+    def test_replay(self):
+        conv = pullstring.Conversation()
+        conv.transport = pullstring.ReplayTransport(self.path, latency_scale=0)
+        self.assertEqual(self.play(conv), self.recorded)
+        self.assertEqual(self.recorded[2], "heard 1600 bytes")
+
+        # every exchange has been used up
+        self.assertRaises(LookupError, conv.send_text, "yes")
+
+    def test_replay_latency_scale(self):
+        # each turn was recorded with at least 20 ms of latency, so only a
+        # replay without the latency meets a 10 ms deadline
+        for latency_scale, exceeded in [(0, False), (1, True)]:
+            conv = pullstring.Conversation()
+            conv.transport = pullstring.ReplayTransport(self.path, latency_scale=latency_scale)
+            conv.start("project", pullstring.Request(api_key="key"))
+            response = conv.send_text("yes", timeout=0.01)
+            self.assertEqual(response.status.deadline_exceeded, exceeded)
+
+    def test_replay_latency_and_loop(self):
+        transport = pullstring.ReplayTransport(self.path, latency_scale=2, loop=True)
+        start = time.time()
+        for x in range(2):
+            conv = pullstring.Conversation()
+            conv.transport = transport
+            self.assertEqual(self.play(conv), self.recorded)
+        self.assertTrue(time.time() - start >= 8 * 0.04)
+
+    def test_replay_unknown_request(self):
+        conv = pullstring.Conversation()
+        conv.transport = pullstring.ReplayTransport(self.path)
+        conv.start("project", pullstring.Request(api_key="key"))
+        self.assertRaises(LookupError, conv.send_text, "something else")
+
+if __name__ == '__main__':
+    unittest.main()
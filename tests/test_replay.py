@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+#
+# Tests for the session replay example, run against a local Web API stand-in
+#
+# Copyright (c) 2016, PullString, Inc. All rights reserved.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+import io
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+sys.path.insert(0, os.path.abspath('..'))
+sys.path.insert(0, os.path.abspath(os.path.join('..', 'examples')))
+import pullstring
+import webapi_replay
+from pullstring.transport import DEFAULT_POOL
+from webapi_server import WebAPITestMixin
+
+SCRIPT = [
+    "# a session script",
+    "hello",
+    "/expect you said hello",
+    "/set list Colors red green",
+    "/get Colors",
+    "/expect something else",
+]
+
+class TestReplay(WebAPITestMixin, unittest.TestCase):
+    """
+    Check that session scripts play through and are reported per command.
+    """
+
+    def setUp(self):
+        self.colors = []
+        self.server = self.start_server(self.handler)
+
+        # the sessions use the shared pool, as in a worker process
+        self.addCleanup(DEFAULT_POOL.close)
+
+    def handler(self, request):
+        body = request.json
+        self.colors = body.get("set_entities", {}).get("Colors", self.colors)
+        outputs = []
+        if "text" in body:
+            outputs.append({"type": "dialog", "id": "1", "text": "You said " + body["text"]})
+        entities = {"Colors": self.colors} if "get_entities" in body else {}
+        return 200, {"conversation": "conv-1", "outputs": outputs, "entities": entities}
+
+    def test_run_session(self):
+        lines = [line for line in SCRIPT if not line.startswith("#")]
+        job = ("key", "project", pullstring.BUILD_PRODUCTION, "script.txt", lines)
+        results = webapi_replay.run_session(job)
+
+        self.assertEqual([r[1] for r in results], ["start", "text", "expect", "set", "get", "expect"])
+        self.assertEqual([r[1] for r in results if r[3]], ["expect"])
+        self.assertEqual(self.server.requests[2].json, {"set_entities": {"Colors": ["red", "green"]}})
+        self.assertEqual(len(self.server.requests), 4)
+
+        # the expectations are checked locally, so they are not counted as requests
+        output = io.StringIO()
+        stdout, sys.stdout = sys.stdout, output
+        try:
+            webapi_replay.report(results, 1.0)
+        finally:
+            sys.stdout = stdout
+        rows = [line.split()[0] for line in output.getvalue().splitlines()[1:5]]
+        self.assertEqual(rows, ["get", "set", "start", "text"])
+        self.assertIn("4 requests in 1.00 seconds (4.0 requests/sec), 1 errors", output.getvalue())
+
+    def count_lines(self, path):
+        with open(path) as f:
+            return len(f.readlines())
+
+    def test_record_per_worker(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.addCleanup(setattr, webapi_replay, "TRANSPORT", None)
+        record = os.path.join(directory, "session.jsonl")
+        lines = ["hello", "/set list Colors red green"]
+        job = ("key", "project", pullstring.BUILD_PRODUCTION, "script.txt", lines)
+
+        # this process stands in for one worker, and another has already finished
+        with open(record + ".1", "w") as f:
+            f.write(json.dumps({"path": "/v1/conversation", "body": "{}"}) + "\n")
+        webapi_replay.init_worker(self.server.base_url, record, "", 1.0)
+        self.assertFalse(os.path.exists(record))
+        webapi_replay.run_session(job)
+        self.assertEqual(self.count_lines("%s.%d" % (record, os.getpid())), 3)
+
+        webapi_replay.merge_recordings(record)
+        self.assertEqual(self.count_lines(record), 4)
+        self.assertEqual(sorted(os.listdir(directory)), ["session.jsonl", "session.jsonl.audio"])
+
+    def test_list_entities_decoded(self):
+        conv = pullstring.Conversation()
+        conv.start("project", pullstring.Request(api_key="key"))
+        conv.set_entities([pullstring.ListEntity("Colors", ["red"])])
+        entity = conv.get_entities([pullstring.Entity("Colors", "")]).entities[0]
+        self.assertTrue(isinstance(entity, pullstring.ListEntity))
+        self.assertEqual(entity.type, pullstring.ENTITY_LIST)
+        self.assertEqual(entity.value, ["red"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+#
+# Tests for the indexed accessors of the Response object
+#
+# Copyright (c) 2016, PullString, Inc. All rights reserved.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+import os
+import sys
+import unittest
+sys.path.insert(0, os.path.abspath('..'))
+import pullstring
+
+class TestResponse(unittest.TestCase):
+    """
+    Look up outputs and entities in a Response by type and name.
+    """
+
+    def make_response(self):
+        response = pullstring.Response()
+        for text in ["Do you want to play", "Rock, Paper, Scissors?"]:
+            output = pullstring.DialogOutput()
+            output.text = text
+            response.outputs.append(output)
+        behavior = pullstring.BehaviorOutput()
+        behavior.behavior = "wave"
+        response.outputs.append(behavior)
+        response.entities.append(pullstring.Counter("Player Score", 4))
+        response.entities.append(pullstring.Label("NAME", "Jack"))
+        return response
+
+    def test_entities_by_name(self):
+        response = self.make_response()
+        self.assertEqual(response.get_entity("Player Score").value, 4)
+        self.assertEqual(response.get_entity("NAME").value, "Jack")
+        self.assertIsNone(response.get_entity("Unknown"))
+
+    def test_outputs_by_type(self):
+        response = self.make_response()
+        self.assertEqual(len(response.get_outputs(pullstring.OUTPUT_DIALOG)), 2)
+        self.assertEqual(len(response.get_outputs(pullstring.OUTPUT_BEHAVIOR)), 1)
+        self.assertEqual(response.get_behaviors("wave")[0].behavior, "wave")
+        self.assertEqual(response.get_behaviors("jump"), [])
+        self.assertEqual(response.dialog_text, "Do you want to play Rock, Paper, Scissors?")
+
+    def test_assigning_lists_resets_indexes(self):
+        response = self.make_response()
+        self.assertEqual(response.get_entity("NAME").value, "Jack")
+        response.entities = [pullstring.Label("NAME", "Jill")]
+        response.outputs = []
+        self.assertEqual(response.get_entity("NAME").value, "Jill")
+        self.assertEqual(response.dialog_text, "")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+#
+# Tests for streaming response parsing, run against a local Web API stand-in
+#
+# Copyright (c) 2016, PullString, Inc. All rights reserved.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+import os
+import sys
+import json
+import time
+import unittest
+sys.path.insert(0, os.path.abspath('..'))
+import pullstring
+from pullstring.codec import OutputStreamDecoder
+from webapi_server import WebAPITestMixin
+
+BODY = {
+    "conversation": "conv-1",
+    "participant": "participant-1",
+    "outputs": [
+        {"type": "dialog", "id": "line-1", "text": "Do you want to play \"outputs\" [again]? {yes}",
+         "uri": "https://example.com/line-1.wav", "duration": 2.5,
+         "phonemes": [{"name": "d", "seconds_since_start": 0.1}]},
+        {"type": "behavior", "behavior": "wave", "parameters": {"hand": "left", "times": [1, 2]}},
+        {"type": "dialog", "id": "line-2", "text": u"Café ☕"},
+    ],
+    "entities": {"NAME": "Jill", "Player Score": 7},
+}
+
+class TestOutputStreamDecoder(unittest.TestCase):
+    """
+    Check that outputs are decoded as soon as their bytes have arrived.
+    """
+
+    def feed(self, content, size):
+        decoder = OutputStreamDecoder()
+        counts = []
+        for offset in range(0, len(content), size):
+            decoder.feed(content[offset:offset + size])
+            counts.append(len(decoder.outputs))
+        return decoder, counts
+
+    def test_one_byte_at_a_time(self):
+        content = json.dumps(BODY).encode("utf-8")
+        decoder, counts = self.feed(content, 1)
+
+        self.assertEqual([output.type for output in decoder.outputs], ["dialog", "behavior", "dialog"])
+        self.assertEqual(decoder.outputs[0].text, BODY["outputs"][0]["text"])
+        self.assertEqual(decoder.outputs[0].phonemes[0].name, "d")
+        self.assertEqual(decoder.outputs[1].parameters, {"hand": "left", "times": [1, 2]})
+        self.assertEqual(decoder.outputs[2].text, u"Café ☕")
+
+        # the first output is available long before the end of the body
+        first = counts.index(1)
+        end_of_first = content.index(b"}]}") + 3
+        self.assertEqual(first + 1, end_of_first)
+
+    def test_block_sizes(self):
+        content = json.dumps(BODY, indent=2).encode("utf-8")
+        for size in [2, 7, 64, len(content)]:
+            decoder, counts = self.feed(content, size)
+            self.assertEqual([output.type for output in decoder.outputs], ["dialog", "behavior", "dialog"])
+
+    def test_outputs_key_in_other_values(self):
+        body = {"conversation": "outputs", "entities": {"outputs": "[{\"type\": \"dialog\"}]"},
+                "outputs": [{"type": "dialog", "text": "hi"}]}
+        decoder, counts = self.feed(json.dumps(body).encode("utf-8"), 3)
+        self.assertEqual([output.text for output in decoder.outputs], ["hi"])
+
+class TestStreaming(WebAPITestMixin, unittest.TestCase):
+    """
+    Check that Conversation.stream() yields outputs before the response has finished.
+    """
+
+    def setUp(self):
+        self.server = self.start_server(lambda request: (200, BODY))
+
+        self.conv = pullstring.Conversation()
+        self.conv.start("project", pullstring.Request(api_key="key"))
+
+    def test_stream_text(self):
+        self.server.trickle = (16, 0.01)
+        start = time.time()
+        times = []
+        items = []
+        for item in self.conv.stream(self.conv.send_text, "yes"):
+            times.append(time.time() - start)
+            items.append(item)
+
+        self.assertEqual(len(items), 4)
+        self.assertTrue(isinstance(items[0], pullstring.DialogOutput))
+        self.assertTrue(isinstance(items[1], pullstring.BehaviorOutput))
+        self.assertTrue(isinstance(items[2], pullstring.DialogOutput))
+        response = items[3]
+        self.assertTrue(isinstance(response, pullstring.Response))
+        self.assertTrue(response.status.success)
+        self.assertEqual(response.outputs, items[:3])
+        self.assertEqual(response.get_entity("NAME").value, "Jill")
+        self.assertEqual(self.server.requests[-1].json, {"text": "yes"})
+
+        # the first line arrived while the rest of the body was still trickling in
+        self.assertTrue(times[3] - times[0] > 0.05)
+
+    def test_stream_error(self):
+        self.server.handler = lambda request: (404, {"error": {"status": 404, "message": "Not found"}})
+        items = list(self.conv.stream(self.conv.send_event, "missing"))
+        self.assertEqual(len(items), 1)
+        self.assertFalse(items[0].status.success)
+        self.assertEqual(items[0].status.error_message, "Not found")
+        self.assertEqual(items[0].outputs, [])
+
+    def test_stream_exception(self):
+        def fail(*args):
+            raise ValueError("bad input")
+        with self.assertRaises(ValueError):
+            list(self.conv.stream(fail))
+
+    def test_send_without_stream(self):
+        self.server.trickle = (64, 0.001)
+        response = self.conv.send_text("yes")
+        self.assertEqual([output.type for output in response.outputs], ["dialog", "behavior", "dialog"])
+
+if __name__ == '__main__':
+    unittest.main()
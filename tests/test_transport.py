@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+#
+# Tests for the pooled HTTPS transport, run against a local Web API stand-in
+#
+# Copyright (c) 2016, PullString, Inc. All rights reserved.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+import os
+import sys
+import time
+import json
+import zlib
+import unittest
+sys.path.insert(0, os.path.abspath('..'))
+import pullstring
+from pullstring.transport import ConnectionPool, HttpTransport, urlparse
+from webapi_server import WebAPITestMixin
+
+class TestTransport(WebAPITestMixin, unittest.TestCase):
+    """
+    Check that connections are kept alive, warmed up, and resumed.
+    """
+
+    def setUp(self):
+        self.server = self.start_server()
+
+    def make_conversation(self, pool):
+        conv = pullstring.Conversation()
+        conv.transport = HttpTransport(pool)
+        return conv
+
+    def client_ports(self):
+        return set(r.client_address[1] for r in self.server.requests)
+
+    def test_keep_alive(self):
+        pool = ConnectionPool()
+        conv = self.make_conversation(pool)
+        conv.start("project", pullstring.Request(api_key="key"))
+        conv.send_text("hello")
+        self.assertEqual(len(self.client_ports()), 1)
+        self.assertEqual(pool.idle_count(self.server.base_url), 1)
+        pool.close()
+
+    def test_warm_up(self):
+        pool = ConnectionPool()
+        pool.warm_up(self.server.base_url, count=2)
+        self.assertEqual(pool.idle_count(self.server.base_url), 2)
+
+        conv = self.make_conversation(pool)
+        response = conv.start("project", pullstring.Request(api_key="key"))
+        self.assertTrue(response.status.success)
+        self.assertEqual(pool.idle_count(self.server.base_url), 2)
+        pool.close()
+
+    def test_cancel_after_finish(self):
+        pool = ConnectionPool()
+        transport = HttpTransport(pool)
+        exchange = transport.open(self.server.base_url + "/conversation", {}, {"Content-Type": "application/json"})
+        exchange.send(b"{}")
+        self.assertEqual(exchange.finish().status, 200)
+        exchange.cancel()
+
+        # the connection in the pool is still usable
+        self.assertEqual(pool.idle_count(self.server.base_url), 1)
+        conv = self.make_conversation(pool)
+        self.assertTrue(conv.start("project", pullstring.Request(api_key="key")).status.success)
+        self.assertEqual(len(self.client_ports()), 1)
+        pool.close()
+
+    def test_closed_connection_is_replaced(self):
+        self.server.keep_alive = False
+        pool = ConnectionPool()
+        conv = self.make_conversation(pool)
+        for text in ["one", "two", "three"]:
+            self.assertTrue(conv.send_text(text).status.success)
+            # let the server's close arrive, as it would for an idle connection,
+            # since a request that was sent on a closing connection is not retried
+            time.sleep(0.05)
+        self.assertEqual(len(self.client_ports()), 3)
+        pool.close()
+
+    def test_tls_session_resumption(self):
+        pool = ConnectionPool(max_idle=0)
+        conv = self.make_conversation(pool)
+        for text in ["one", "two", "three"]:
+            conv.send_text(text)
+        self.assertEqual([r.session_reused for r in self.server.requests], [False, True, True])
+
+    def test_tls_session_resumption_after_warm_up(self):
+        pool = ConnectionPool()
+        self.addCleanup(pool.close)
+        purl = urlparse.urlparse(self.server.base_url)
+        pool.warm_up(self.server.base_url, count=3)
+
+        # only the first connection needs a full handshake
+        conns = [pool.acquire(purl)[0] for x in range(3)]
+        self.assertEqual(sorted(conn.session_reused for conn in conns), [False, True, True])
+        conn, reused = pool.acquire(purl, reuse=False)
+        conn.connect()
+        self.assertTrue(conn.session_reused)
+        for conn in conns + [conn]:
+            conn.close()
+
+def lipsync_response(request):
+    # a dialog response with many phonemes, which compresses well
+    phonemes = [{"name": "aa", "secs": x * 0.05} for x in range(400)]
+    output = {"type": "dialog", "id": "out-1", "text": "hello " * 50, "duration": 20.0, "phonemes": phonemes}
+    return 200, {"conversation": "conv-1", "participant": "participant-1", "outputs": [output]}
+
+class TestCompression(WebAPITestMixin, unittest.TestCase):
+    """
+    Check response compression negotiation and compressed request bodies.
+    """
+
+    def setUp(self):
+        self.server = self.start_server(lipsync_response)
+        self.server.compress = True
+
+    def send_turn(self, transport):
+        conv = pullstring.Conversation()
+        conv.transport = transport
+        return conv.send_text("hello")
+
+    def test_compressed_response(self):
+        response = self.send_turn(HttpTransport())
+        self.assertTrue(response.status.success)
+        self.assertEqual(len(response.outputs[0].phonemes), 400)
+        self.assertEqual(self.server.requests[0].headers.get("Accept-Encoding"), "gzip, deflate")
+        compressed = self.server.bytes_sent
+
+        response = self.send_turn(HttpTransport(accept_compression=False))
+        self.assertEqual(len(response.outputs[0].phonemes), 400)
+        self.assertTrue(compressed * 5 < self.server.bytes_sent - compressed)
+
+    def test_streamed_compressed_response(self):
+        self.server.trickle = (64, 0.001)
+        conv = pullstring.Conversation()
+        items = list(conv.stream(conv.send_text, "hello"))
+        self.assertTrue(isinstance(items[0], pullstring.DialogOutput))
+        self.assertEqual(items[-1].outputs, items[:1])
+
+    def test_deflate(self):
+        from pullstring.transport import _Decompressor
+        data = json.dumps({"outputs": []}).encode("utf-8")
+        for compressed in [zlib.compress(data), zlib.compress(data)[2:-4]]:
+            decompressor = _Decompressor.for_encoding("deflate")
+            result = decompressor.decompress(compressed[:5]) + decompressor.decompress(compressed[5:])
+            self.assertEqual(result + decompressor.flush(), data)
+        self.assertIsNone(_Decompressor.for_encoding("identity"))
+
+    def test_gzip_request_threshold(self):
+        transport = HttpTransport(gzip_min_size=100)
+        self.send_turn(transport)
+        conv = pullstring.Conversation()
+        conv.transport = transport
+        conv.send_text("hello " * 50)
+        small, large = self.server.requests
+        self.assertNotIn("Content-Encoding", small.headers)
+        self.assertEqual(large.headers.get("Content-Encoding"), "gzip")
+        self.assertEqual(large.json, {"text": "hello " * 50})
+
+if __name__ == '__main__':
+    unittest.main()
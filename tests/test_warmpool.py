@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+#
+# Tests for the pool of pre-started conversations, run against a local Web API stand-in
+#
+# Copyright (c) 2016, PullString, Inc. All rights reserved.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+import os
+import sys
+import time
+import itertools
+import unittest
+sys.path.insert(0, os.path.abspath('..'))
+import pullstring
+from webapi_server import WebAPITestMixin
+
+class TestConversationPool(WebAPITestMixin, unittest.TestCase):
+    """
+    Check that conversations are started ahead of time, refilled, and expired.
+    """
+
+    def setUp(self):
+        self.counter = itertools.count(1)
+        self.status = 200
+        self.server = self.start_server(self.handler)
+        self.pool = None
+
+    def tearDown(self):
+        if self.pool is not None:
+            self.pool.close()
+
+    def handler(self, request):
+        if self.status != 200:
+            return self.status, {"error": {"status": self.status, "message": "Unavailable"}}
+        number = next(self.counter)
+        output = {"type": "dialog", "id": "greeting", "text": "Hello %d" % number}
+        return 200, {"conversation": "conv-%d" % number, "participant": "participant-%d" % number,
+                     "outputs": [output]}
+
+    def test_get_ready_conversation(self):
+        self.pool = pullstring.ConversationPool("project", pullstring.Request(api_key="key"), size=2)
+        self.assertTrue(self.pool.wait(timeout=5))
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(self.server.requests[0].json["project"], "project")
+
+        # the first conversation started is handed out without another request
+        conv, response = self.pool.get()
+        self.assertEqual(conv.get_conversation_id(), "conv-1")
+        self.assertEqual(response.outputs[0].text, "Hello 1")
+        self.assertEqual((self.pool.hits, self.pool.misses), (1, 0))
+
+        # the pool is refilled in the background, and later requests use the key
+        self.assertTrue(self.pool.wait(timeout=5))
+        self.assertEqual(len(self.server.requests), 3)
+        conv.send_text("hi")
+        self.assertEqual(self.server.requests[-1].headers["Authorization"], "Bearer key")
+
+    def test_expiry(self):
+        self.pool = pullstring.ConversationPool("project", pullstring.Request(api_key="key"), size=1, max_age=0.1)
+        self.assertTrue(self.pool.wait(timeout=5))
+        time.sleep(0.35)
+        self.assertTrue(self.pool.expired >= 2)
+        conv, response = self.pool.get()
+        self.assertNotEqual(conv.get_conversation_id(), "conv-1")
+
+    def test_miss_and_retry(self):
+        self.status = 503
+        self.pool = pullstring.ConversationPool("project", pullstring.Request(api_key="key"), size=1,
+                                                retry_delay=0.05)
+        self.assertFalse(self.pool.wait(timeout=0.2))
+        self.assertEqual(self.pool.last_error, "Unavailable")
+        self.assertEqual(len(self.pool), 0)
+
+        conv, response = self.pool.get()
+        self.assertFalse(response.status.success)
+        self.assertEqual(self.pool.misses, 1)
+
+        # the pool recovers once the Web API does
+        self.status = 200
+        self.assertTrue(self.pool.wait(timeout=5))
+
+    def test_retry_delay_after_hit(self):
+        def handler(request):
+            if len(self.server.requests) > 1:
+                return 503, {"error": {"status": 503, "message": "Unavailable"}}
+            return self.handler(request)
+        self.server.handler = handler
+        self.pool = pullstring.ConversationPool("project", pullstring.Request(api_key="key"), size=2,
+                                                retry_delay=0.5)
+        deadline = time.time() + 5
+        while self.pool.last_error is None and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(self.server.requests), 2)
+
+        # taking the ready conversation does not cut the retry delay short
+        conv, response = self.pool.get()
+        self.assertEqual((self.pool.hits, self.pool.misses), (1, 0))
+        time.sleep(0.1)
+        self.assertEqual(len(self.server.requests), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -28,13 +28,11 @@ class TestClass(unittest.TestCase):
     def does_contain(self, response, text):
         if response is None:
             return False
-        all_lines = [x.text.lower() for x in response.outputs if x.type == pullstring.OUTPUT_DIALOG]
-        return text.lower() in " ".join(all_lines)
+        return text.lower() in response.dialog_text.lower()
 
     def assert_contains(self, response, text):
         self.assertNotEqual(response, None)
-        all_lines = [x.text.lower() for x in response.outputs if x.type == pullstring.OUTPUT_DIALOG]
-        self.assertIn(text.lower(), " ".join(all_lines))
+        self.assertIn(text.lower(), response.dialog_text.lower())
 
     def read_file(self, filename):
         # return the binary contents of a file
@@ -83,8 +81,7 @@ class TestClass(unittest.TestCase):
         # query the current value of the Player Score counter (it's 4 at the start)
         response = conv.get_entities([pullstring.Counter("Player Score")])
         self.assertEqual(len(response.entities), 1)
-        self.assertEqual(response.entities[0].name, 'Player Score')
-        self.assertEqual(response.entities[0].value, 4)
+        self.assertEqual(response.get_entity('Player Score').value, 4)
 
         # let's start playing... keep choosing until we win or lose
         finished = False
@@ -0,0 +1,433 @@
+#
+# A local stand-in for the PullString Web API, used by the offline tests.
+#
+# Copyright (c) 2016, PullString, Inc.
+#
+# The following source code is licensed under the MIT license.
+# See the LICENSE file, or https://opensource.org/licenses/MIT.
+#
+
+import os
+import ssl
+import sys
+import gzip
+import json
+import math
+import time
+import random
+import socket
+import threading
+
+try:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlparse, parse_qs
+except ImportError:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlparse, parse_qs
+
+# self-signed certificate for localhost, valid for the lifetime of the tests
+CERT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "localhost.pem")
+
+
+class ReceivedRequest(object):
+    """
+    Describe a single request received by the stand-in server.
+    """
+    def __init__(self, method, path, query, headers, body, client_address=None, session_reused=False):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+        self.client_address = client_address
+        self.session_reused = session_reused
+
+    @property
+    def json(self):
+        return json.loads(self.body.decode("utf-8")) if self.body else {}
+
+
+class FaultProfile(object):
+    """
+    Scripted faults for the stand-in server, to see how the SDK copes
+    with a slow or unreliable Web API. Each POST request is answered
+    with at most one fault, drawn at the given rates:
+
+    - latency: a number of seconds to wait before every response, or a
+      function that takes a random.Random and returns one, e.g.,
+      FaultProfile.lognormal(0.01, 1.0) for a long tail
+    - drop_rate: close the connection without a response
+    - truncate_rate: close the connection part way through reading a
+      chunked upload, e.g., streamed audio
+    - malformed_rate: answer with a JSON body that is cut short
+    - error_rate: start a burst of error_burst responses with a status
+      picked from error_statuses, e.g., 429 for too many requests
+
+    The faults are drawn from a random.Random seeded with seed, so a
+    profile replays the same faults for the same requests. The faults
+    dict counts how many of each were injected.
+    """
+    def __init__(self, latency=None, drop_rate=0.0, truncate_rate=0.0, malformed_rate=0.0,
+                 error_rate=0.0, error_burst=1, error_statuses=(429, 500, 502, 503), seed=0):
+        self.latency = latency
+        self.drop_rate = drop_rate
+        self.truncate_rate = truncate_rate
+        self.malformed_rate = malformed_rate
+        self.error_rate = error_rate
+        self.error_burst = error_burst
+        self.error_statuses = error_statuses
+        self.faults = {"drop": 0, "truncate": 0, "malformed": 0, "error": 0}
+        self.__random = random.Random(seed)
+        self.__burst = 0
+        self.__burst_status = None
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def lognormal(median, sigma):
+        """
+        Return a latency function with a log-normal distribution.
+        """
+        mu = math.log(median)
+        return lambda rand: rand.lognormvariate(mu, sigma)
+
+    def delay(self):
+        """
+        Return the number of seconds to wait before the next response.
+        """
+        if self.latency is None:
+            return 0.0
+        if not callable(self.latency):
+            return self.latency
+        with self.__lock:
+            return self.latency(self.__random)
+
+    def choose(self, chunked):
+        """
+        Return the fault for the next request, as a (fault, status) tuple,
+        where fault is None if the request should be answered normally.
+        """
+        with self.__lock:
+            if self.__burst:
+                self.__burst -= 1
+                self.faults["error"] += 1
+                return "error", self.__burst_status
+
+            draw = self.__random.random()
+            for fault, rate in (("drop", self.drop_rate),
+                                ("truncate", self.truncate_rate if chunked else 0.0),
+                                ("malformed", self.malformed_rate),
+                                ("error", self.error_rate)):
+                if draw < rate:
+                    self.faults[fault] += 1
+                    if fault != "error":
+                        return fault, None
+                    self.__burst = self.error_burst - 1
+                    self.__burst_status = self.__random.choice(self.error_statuses)
+                    return fault, self.__burst_status
+                draw -= rate
+            return None, None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        # avoid delayed ACK stalls between writing the headers and the body
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        pass
+
+    def __read_body(self, truncate=False):
+        # decode a chunked request body (streaming audio), or a plain one
+        if self.headers.get("Transfer-Encoding", "") == "chunked":
+            body = b""
+            while True:
+                line = self.rfile.readline()
+                if not line:
+                    # the client gave up part way through the upload
+                    self.server.truncated_uploads += 1
+                    raise socket.error("Chunked upload was cut short")
+                size = int(line.strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return body
+                if truncate:
+                    self.rfile.read(size // 2)
+                    return None
+                body += self.rfile.read(size)
+                self.rfile.readline()
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.headers.get("Content-Encoding", "") == "gzip":
+            body = gzip.decompress(body)
+        return body
+
+    def do_POST(self):
+        fault, fault_status = None, None
+        profile = self.server.faults
+        if profile is not None:
+            fault, fault_status = profile.choose(self.headers.get("Transfer-Encoding", "") == "chunked")
+
+        body = self.__read_body(truncate=(fault == "truncate"))
+        if fault in ("drop", "truncate"):
+            # hang up without a response
+            self.close_connection = True
+            return
+
+        purl = urlparse(self.path)
+        query = dict((k, v[0]) for k, v in parse_qs(purl.query).items())
+        request = ReceivedRequest("POST", purl.path, query, dict(self.headers.items()), body,
+                                  self.client_address, getattr(self.connection, "session_reused", False))
+        self.server.requests.append(request)
+
+        if fault == "error":
+            status, content = fault_status, {"error": {"status": fault_status, "message": "Injected error"}}
+        else:
+            status, content = self.server.handler(request)
+        if not isinstance(content, bytes):
+            content = json.dumps(content).encode("utf-8")
+        if fault == "malformed":
+            content = content[:len(content) // 2]
+        if profile is not None:
+            time.sleep(profile.delay())
+
+        # compress the response for clients that accept it
+        encoding = None
+        if self.server.compress and "gzip" in self.headers.get("Accept-Encoding", ""):
+            content = gzip.compress(content)
+            encoding = "gzip"
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.end_headers()
+        self.__write_body(content)
+
+        # simulate a server that drops idle connections without telling the client
+        if not self.server.keep_alive:
+            self.close_connection = True
+
+    def do_GET(self):
+        # serve audio files, with support for range requests
+        purl = urlparse(self.path)
+        request = ReceivedRequest("GET", purl.path, {}, dict(self.headers.items()), b"",
+                                  self.client_address, getattr(self.connection, "session_reused", False))
+        self.server.requests.append(request)
+
+        content = self.server.files.get(purl.path)
+        if content is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        start = 0
+        range_header = self.headers.get("Range", "")
+        if range_header.startswith("bytes="):
+            start = int(range_header[len("bytes="):].split("-")[0])
+        self.send_response(206 if start else 200)
+        self.send_header("Content-Type", "audio/wav")
+        self.send_header("Content-Length", str(len(content) - start))
+        self.send_header("Accept-Ranges", "bytes")
+        if start:
+            self.send_header("Content-Range", "bytes %d-%d/%d" % (start, len(content) - 1, len(content)))
+        self.end_headers()
+
+        # simulate a dropped connection part way through the body, once
+        content = content[start:]
+        if self.server.drop_after is not None:
+            content = content[:self.server.drop_after]
+            self.server.drop_after = None
+            self.close_connection = True
+        self.__write_body(content)
+
+    def __write_body(self, content):
+        self.server.bytes_sent += len(content)
+        # simulate a slow network by sending the body a few bytes at a time
+        if self.server.trickle:
+            size, delay = self.server.trickle
+            for offset in range(0, len(content), size):
+                self.wfile.write(content[offset:offset + size])
+                self.wfile.flush()
+                time.sleep(delay)
+        else:
+            self.wfile.write(content)
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def handle_error(self, request, client_address):
+        # clients that hang up early, e.g., cancelled hedges, are not errors
+        if isinstance(sys.exc_info()[1], socket.error):
+            return
+        HTTPServer.handle_error(self, request, client_address)
+
+
+class WebAPIServer(object):
+    """
+    Run an HTTPS server on localhost that answers Web API requests, and
+    serves audio files from the files dict. With secure=False, it is a
+    plain HTTP server instead.
+
+    The handler is called with a ReceivedRequest for every request and
+    returns a (status, content) tuple, where content is a dict that is
+    encoded as JSON, or raw bytes that are returned as-is. All requests
+    are recorded in the requests list.
+    """
+    def __init__(self, handler=None, secure=True):
+        self.secure = secure
+        self.__server = _Server(("127.0.0.1", 0), _Handler)
+        self.__server.handler = handler or self.default_handler
+        self.__server.requests = []
+        self.__server.keep_alive = True
+        self.__server.trickle = None
+        self.__server.files = {}
+        self.__server.drop_after = None
+        self.__server.compress = False
+        self.__server.bytes_sent = 0
+        self.__server.faults = None
+        self.__server.truncated_uploads = 0
+        if secure:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(CERT_FILE)
+            self.__server.socket = context.wrap_socket(self.__server.socket, server_side=True)
+        self.__thread = None
+
+    @property
+    def port(self):
+        return self.__server.server_address[1]
+
+    @property
+    def base_url(self):
+        return "%s://localhost:%d/v1" % ("https" if self.secure else "http", self.port)
+
+    @property
+    def requests(self):
+        return self.__server.requests
+
+    @property
+    def keep_alive(self):
+        return self.__server.keep_alive
+
+    @keep_alive.setter
+    def keep_alive(self, keep_alive):
+        self.__server.keep_alive = keep_alive
+
+    @property
+    def trickle(self):
+        """
+        A (size, delay) tuple to send response bodies in blocks of size
+        bytes with a delay in seconds after each one, or None.
+        """
+        return self.__server.trickle
+
+    @trickle.setter
+    def trickle(self, trickle):
+        self.__server.trickle = trickle
+
+    @property
+    def files(self):
+        """
+        A dict of paths to the content of files that are served to GET requests.
+        """
+        return self.__server.files
+
+    @property
+    def drop_after(self):
+        """
+        A number of bytes after which the next GET response is cut off, or None.
+        """
+        return self.__server.drop_after
+
+    @drop_after.setter
+    def drop_after(self, drop_after):
+        self.__server.drop_after = drop_after
+
+    @property
+    def compress(self):
+        """
+        Whether to gzip responses for requests that accept it.
+        """
+        return self.__server.compress
+
+    @compress.setter
+    def compress(self, compress):
+        self.__server.compress = compress
+
+    @property
+    def bytes_sent(self):
+        """
+        The number of response body bytes sent so far.
+        """
+        return self.__server.bytes_sent
+
+    @property
+    def faults(self):
+        """
+        A FaultProfile that decides how POST requests fail, or None.
+        """
+        return self.__server.faults
+
+    @faults.setter
+    def faults(self, faults):
+        self.__server.faults = faults
+
+    @property
+    def truncated_uploads(self):
+        """
+        The number of chunked uploads that the client cut short.
+        """
+        return self.__server.truncated_uploads
+
+    @property
+    def handler(self):
+        return self.__server.handler
+
+    @handler.setter
+    def handler(self, handler):
+        self.__server.handler = handler
+
+    def default_handler(self, request):
+        return 200, {"conversation": "conv-1", "participant": "participant-1", "outputs": []}
+
+    def start(self):
+        self.__thread = threading.Thread(target=self.__server.serve_forever)
+        self.__thread.daemon = True
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        self.__server.shutdown()
+        self.__server.server_close()
+        self.__thread.join()
+
+class WebAPITestMixin(object):
+    """
+    A mixin for unittest.TestCase classes that talk to stand-in servers.
+
+    start_server() starts a WebAPIServer and points the SDK's default
+    base URL at it; both are undone after the test, following tearDown().
+    """
+    def start_server(self, handler=None):
+        server = WebAPIServer(handler).start()
+        self.addCleanup(server.stop)
+        self.use_server(server)
+        return server
+
+    def use_server(self, server):
+        """
+        Send the requests of conversations without a base_url of their own
+        to server, until the end of the test.
+        """
+        import pullstring
+
+        version_info = pullstring.VersionInfo()
+        self.addCleanup(setattr, version_info, "api_base_url", version_info.api_base_url)
+        version_info.api_base_url = server.base_url